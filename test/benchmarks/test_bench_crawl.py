@@ -0,0 +1,74 @@
+"""
+Throughput benchmarks against the local fake server.
+
+Run with ``pytest test/benchmarks --benchmark-only``; every benchmark records
+``items`` and ``items_per_second`` in its ``extra_info`` so runs can be
+compared with ``--benchmark-compare``.
+"""
+import io
+import itertools
+import json
+
+import pytest
+
+from truthbrush import snowball_scraper
+from truthbrush.api import Api
+
+
+def _bench(benchmark, fn, rounds=3):
+    counts = []
+    benchmark.pedantic(lambda: counts.append(fn()), rounds=rounds, iterations=1)
+    benchmark.extra_info["items"] = counts[-1]
+    if benchmark.stats:  # None under --benchmark-disable
+        benchmark.extra_info["items_per_second"] = counts[-1] / benchmark.stats.stats.mean
+    return counts[-1]
+
+
+def test_bench_search(benchmark, fake_api):
+    items = _bench(benchmark, lambda: sum(1 for _ in fake_api.search("statuses", "russia", limit=40)))
+    assert items > 0
+
+
+def test_bench_pull_statuses(benchmark, fake_api, fake_dataset):
+    expected = fake_dataset.accounts["user0"]["statuses_count"]
+    items = _bench(benchmark, lambda: sum(1 for _ in fake_api.pull_statuses("user0", replies=True)))
+    assert items == expected
+
+
+def test_bench_pull_comments(benchmark, fake_api, fake_dataset):
+    post_ids = list(itertools.islice(fake_dataset.comments, 50))
+
+    def pull():
+        return sum(1 for post_id in post_ids for _ in fake_api.pull_comments(post_id, includeall=True))
+
+    assert _bench(benchmark, pull) == sum(len(fake_dataset.comments[p]) for p in post_ids)
+
+
+@pytest.mark.parametrize("raw", [False, True], ids=["decoded", "raw"])
+def test_bench_groupposts_export(benchmark, fake_api, fake_dataset, raw):
+    """What ``truthbrush groupposts`` does per item, with and without ``--raw``."""
+    group_ids = [g["id"] for g in fake_dataset.groups]
+
+    def export():
+        out = io.StringIO()
+        for group_id in group_ids:
+            for post in fake_api.groupposts(group_id, raw=raw):
+                out.write((post if raw else json.dumps(post)) + "\n")
+        return out.getvalue().count("\n")
+
+    assert _bench(benchmark, export) == sum(len(fake_dataset.group_timelines[g]) for g in group_ids)
+
+
+def test_bench_snowball_crawl(benchmark, fake_server, monkeypatch, tmp_path_factory):
+    monkeypatch.setattr(snowball_scraper, "TARGET_POST_COUNT", 300)
+    monkeypatch.setattr(snowball_scraper, "MAX_POSTS_TO_CHECK_PER_USER", 100)
+    monkeypatch.setattr(snowball_scraper, "USER_DELAY", 0)
+
+    def crawl():
+        monkeypatch.chdir(tmp_path_factory.mktemp("snowball"))
+        api = Api(username="bench", password="bench", base_url=fake_server.url, transport="http", page_delay=None)
+        snowball_scraper.run_robust_snowball_scraper(api)
+        with open(snowball_scraper.OUTPUT_FILE) as f:
+            return sum(1 for _ in f)
+
+    assert _bench(benchmark, crawl) >= 300
@@ -0,0 +1,22 @@
+import pytest
+
+from fake_server import FakeDataset, FakeTruthSocial
+from truthbrush.api import Api
+
+
+@pytest.fixture(scope="session")
+def fake_dataset():
+    return FakeDataset()
+
+
+@pytest.fixture(scope="session")
+def fake_server(fake_dataset):
+    with FakeTruthSocial(fake_dataset) as server:
+        yield server
+
+
+@pytest.fixture
+def fake_api(fake_server):
+    api = Api(username="bench", password="bench", base_url=fake_server.url, transport="http", page_delay=None)
+    yield api
+    api.quit()
@@ -0,0 +1,358 @@
+"""
+A local stand-in for the parts of the Truth Social API that ``Api`` uses.
+
+Statuses are synthesized from the sample crawl output in ``extracted data/``
+so that payload shapes and sizes match the real thing, while IDs, timestamps,
+authors, likers and comments are generated deterministically from a seed.
+Latency and 429 responses can be injected to exercise throttling paths.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+SAMPLE_FILES = [
+    Path(__file__).resolve().parent.parent / "extracted data" / "republicans_posts.jsonl",
+    Path(__file__).resolve().parent.parent / "extracted data" / "303.jsonl",
+]
+EPOCH = datetime(2025, 8, 1, tzinfo=timezone.utc)
+TOKEN = "fake-access-token"
+TOPICS = ["Russia", "Ukraine", "election", "economy", "border"]
+
+
+def snowflake(moment: datetime, sequence: int = 0) -> str:
+    """Mastodon-style ID: milliseconds since the Unix epoch shifted left by 16 bits."""
+    return str((int(moment.timestamp() * 1000) << 16) + (sequence & 0xFFFF))
+
+
+def _read_jsonl(path: Path):
+    raw = path.read_bytes()
+    encoding = "utf-16" if raw[:2] in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig"
+    for line in raw.decode(encoding).splitlines():
+        line = line.strip()
+        if line.startswith("{"):
+            yield json.loads(line)
+
+
+def load_templates(limit: int = 200):
+    templates = []
+    for path in SAMPLE_FILES:
+        if path.exists():
+            templates.extend(post for _, post in zip(range(limit), _read_jsonl(path)))
+    if not templates:
+        templates.append({"id": "0", "created_at": EPOCH.isoformat(), "content": "<p>post</p>", "account": {"id": "0", "acct": "user"}})
+    return templates
+
+
+class FakeDataset:
+    """Deterministic accounts, statuses, likers and comments."""
+
+    def __init__(self, num_accounts: int = 20, posts_per_account: int = 200, likers_per_post: int = 30, comments_per_post: int = 10, seed: int = 0):
+        rng = random.Random(seed)
+        templates = load_templates()
+        account_template = next((t["account"] for t in templates if isinstance(t.get("account"), dict)), {})
+
+        self.accounts = {}
+        for i in range(num_accounts):
+            account = deepcopy(account_template)
+            account.update(
+                id=snowflake(EPOCH - timedelta(days=400 - i), i),
+                username=f"user{i}",
+                acct=f"user{i}",
+                display_name=f"User {i}",
+                created_at=(EPOCH - timedelta(days=400 - i)).isoformat().replace("+00:00", "Z"),
+                statuses_count=posts_per_account,
+            )
+            self.accounts[account["acct"]] = account
+        accounts = list(self.accounts.values())
+
+        self.statuses = {}
+        self.timelines = {a["id"]: [] for a in accounts}
+        sequence = 0
+        for i, account in enumerate(accounts):
+            for j in range(posts_per_account):
+                sequence += 1
+                moment = EPOCH + timedelta(minutes=37 * j + i)
+                status = dict(rng.choice(templates))
+                status.update(
+                    id=snowflake(moment, sequence),
+                    created_at=moment.isoformat().replace("+00:00", "Z"),
+                    account=account,
+                    in_reply_to_id=None,
+                    content=f"<p>{rng.choice(TOPICS)} {status.get('content', '')}</p>",
+                )
+                self.statuses[status["id"]] = status
+                self.timelines[account["id"]].append(status)
+        for timeline in self.timelines.values():
+            timeline.sort(key=lambda s: int(s["id"]), reverse=True)
+
+        self.likers = {}
+        self.comments = {}
+        for status_id in self.statuses:
+            self.likers[status_id] = rng.sample(accounts, min(likers_per_post, len(accounts)))
+            replies = []
+            for k in range(comments_per_post):
+                reply = dict(self.statuses[status_id])
+                reply.update(
+                    id=str(int(status_id) + k + 1),
+                    in_reply_to_id=status_id,
+                    account=rng.choice(accounts),
+                    content=f"<p>reply {k}</p>",
+                )
+                replies.append(reply)
+            self.comments[status_id] = replies
+
+        self.search_order = list(self.statuses.values())
+        rng.shuffle(self.search_order)  # search results come back in relevance, not date, order
+        self.search_text = [s["content"].lower() for s in self.search_order]
+        self.groups = [{"id": str(1000 + g), "display_name": f"Group {g}"} for g in range(5)]
+        self.group_timelines = {
+            g["id"]: sorted(rng.sample(list(self.statuses.values()), min(100, len(self.statuses))), key=lambda s: int(s["id"]), reverse=True)
+            for g in self.groups
+        }
+
+
+def _page_by_id(items, params, default_limit=20):
+    limit = min(int(params.get("limit", default_limit)), 40)
+    max_id = params.get("max_id")
+    since_id = params.get("since_id")
+    min_id = params.get("min_id")
+    if min_id:  # the page just above min_id, still newest first
+        return [item for item in items if int(item["id"]) > int(min_id)][-limit:]
+    selected = []
+    for item in items:
+        if max_id and int(item["id"]) >= int(max_id):
+            continue
+        if since_id and int(item["id"]) <= int(since_id):
+            break
+        selected.append(item)
+        if len(selected) >= limit:
+            break
+    return selected
+
+
+class FakeTruthSocial:
+    """
+    Serve a ``FakeDataset`` over HTTP on an ephemeral local port.
+
+    ``latency`` delays every API response; ``rate_limit_every`` answers every
+    Nth API request with 429 (0 disables it). Statuses appended to ``errors``
+    answer the next API requests, one each, and ``expire_token`` rejects the
+    current access token until the client logs in again. Each username gets
+    its own token, so requests are counted per account in ``user_requests``,
+    and accounts in ``throttled_users`` are always answered with 429. Files put in
+    ``media`` (name -> bytes) are served at ``/media/<name>`` with an ``ETag``
+    and ``Range``/``If-Range`` support.
+    """
+
+    def __init__(self, dataset: FakeDataset = None, latency: float = 0.0, rate_limit_every: int = 0):
+        self.dataset = dataset or FakeDataset()
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self.errors = []
+        self.token = TOKEN
+        self.logins = 0
+        self.user_requests = {}
+        self.throttled_users = set()
+        self.media = {}
+        self.media_requests = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        handler = self._make_handler()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def expire_token(self):
+        with self._lock:
+            self.token = f"{TOKEN}-{self.logins}"
+
+    def route(self, path: str, params: dict):
+        data = self.dataset
+        match = re.fullmatch(r"/api/v1/accounts/(\d+)/statuses", path)
+        if match:
+            timeline = data.timelines.get(match.group(1))
+            if timeline is None:
+                return 404, {"error": "Record not found"}
+            if params.get("exclude_replies") == "true":
+                timeline = [s for s in timeline if not s.get("in_reply_to_id")]
+            if params.get("pinned") == "true":
+                return 200, []
+            return 200, _page_by_id(timeline, params)
+
+        match = re.fullmatch(r"/api/v1/statuses/(\d+)/favourited_by", path)
+        if match:
+            likers = sorted(data.likers.get(match.group(1), []), key=lambda a: int(a["id"]), reverse=True)
+            return 200, _page_by_id(likers, params, default_limit=40)
+
+        match = re.fullmatch(r"/api/v1/statuses/(\d+)/context/descendants", path)
+        if match:
+            replies = sorted(data.comments.get(match.group(1), []), key=lambda s: int(s["id"]), reverse=True)
+            return 200, _page_by_id(replies, params)
+
+        match = re.fullmatch(r"/api/v1/timelines/group/(\d+)", path)
+        if match:
+            return 200, _page_by_id(data.group_timelines.get(match.group(1), []), params)
+
+        if path == "/api/v1/accounts/lookup":
+            account = data.accounts.get(params.get("acct", ""))
+            return (200, account) if account else (404, {"error": "Record not found"})
+
+        if path == "/api/v2/search":
+            query = params.get("q", "").lower().lstrip("#@")
+            offset = int(params.get("offset", 0))
+            limit = min(int(params.get("limit", 20)), 40)
+            result = {"accounts": [], "statuses": [], "hashtags": [], "groups": []}
+            searchtype = params.get("type", "statuses")
+            if searchtype == "statuses":
+                matches = [s for s, text in zip(data.search_order, data.search_text) if query in text]
+                matches = [s for s in matches if not params.get("max_id") or int(s["id"]) < int(params["max_id"])]
+                matches = [s for s in matches if not params.get("min_id") or int(s["id"]) > int(params["min_id"])]
+                result["statuses"] = matches[offset:offset + limit]
+            elif searchtype == "accounts":
+                matches = [a for a in data.accounts.values() if query in a["acct"].lower()]
+                result["accounts"] = matches[offset:offset + limit]
+            return 200, result
+
+        statuses = list(data.statuses.values())
+        simple = {
+            "/api/v1/trends": [{"name": t.lower(), "history": []} for t in TOPICS],
+            "/api/v1/truth/trending/truths": statuses[:20],
+            "/api/v2/suggestions": [{"source": "global", "account": a} for a in list(data.accounts.values())[:10]],
+            "/api/v3/truth/ads": [],
+            "/api/v1/groups/tags": [{"id": str(i), "name": t.lower()} for i, t in enumerate(TOPICS)],
+            "/api/v1/truth/trends/groups": data.groups[:3],
+            "/api/v1/truth/suggestions/groups": data.groups[2:],
+        }
+        if path in simple:
+            return 200, simple[path]
+        return 404, {"error": "Not found"}
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            wbufsize = -1  # send headers and body together
+
+            def _send(self, status, body, content_type="application/json", etag=None):
+                payload = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                if urlparse(self.path).path == "/oauth/token":
+                    username = json.loads(body or b"{}").get("username", "")
+                    with fake._lock:
+                        fake.logins += 1
+                    self._send(200, {"access_token": f"{fake.token}.{username}", "token_type": "Bearer", "scope": "read"})
+                else:
+                    self._send(404, {"error": "Not found"})
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+                if parsed.path.startswith("/media/"):
+                    self._send_media(parsed.path[len("/media/"):])
+                    return
+                if parsed.path.startswith("/api/"):
+                    token, _, username = (self.headers.get("Authorization") or "").partition(".")
+                    if token != f"Bearer {fake.token}":
+                        self._send(401, {"error": "The access token is invalid"})
+                        return
+                    if username in fake.throttled_users:
+                        self._send(429, {"error": "Too many requests"})
+                        return
+                    with fake._lock:
+                        fake.request_count += 1
+                        fake.user_requests[username] = fake.user_requests.get(username, 0) + 1
+                        throttled = fake.rate_limit_every and fake.request_count % fake.rate_limit_every == 0
+                        if throttled:
+                            fake.rate_limited_count += 1
+                        error = fake.errors.pop(0) if fake.errors else None
+                    if error:
+                        self._send(error, {"error": "Injected error"})
+                        return
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    if throttled:
+                        self._send(429, {"error": "Too many requests"})
+                        return
+                status, body = fake.route(parsed.path, params)
+                if status != 200:
+                    self._send(status, body)
+                    return
+                payload = json.dumps(body).encode("utf-8")
+                etag = '"' + hashlib.sha1(payload).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, b"", etag=etag)
+                else:
+                    self._send(200, payload, etag=etag)
+
+            def _send_media(self, name):
+                content = fake.media.get(name)
+                match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range") or "")
+                with fake._lock:
+                    fake.media_requests.append((name, self.headers.get("Range")))
+                if content is None:
+                    self._send(404, b"", content_type="text/plain")
+                    return
+                etag = '"%s"' % hashlib.sha1(content).hexdigest()
+                if match and self.headers.get("If-Range") not in (None, etag):
+                    match = None  # changed since the partial download: send it all
+                start = int(match.group(1)) if match else 0
+                if start >= len(content) and match:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{len(content)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206 if match else 200)
+                if match:
+                    self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+                self.send_header("Content-Type", "image/png")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(content) - start))
+                self.end_headers()
+                self.wfile.write(content[start:])
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
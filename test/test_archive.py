@@ -0,0 +1,111 @@
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from truthbrush.api import Api
+from truthbrush.archive import Archive, ArchiveCache
+from truthbrush.cli import cli
+from truthbrush.retry import RetryPolicy
+
+SAMPLE = Path(__file__).resolve().parent.parent / "extracted data" / "303.jsonl"
+
+
+def _status(status_id, acct, content, created_at, **extra):
+    return dict(id=str(status_id), account={"id": "1", "acct": acct}, content=content, created_at=created_at, **extra)
+
+
+def test_add_dedupes_and_indexes(tmp_path):
+    with Archive(str(tmp_path / "a.db")) as archive:
+        first = _status(1, "alice", "<p>Sanctions on &amp; Russia</p>", "2025-08-01T10:00:00.000Z", tags=[{"name": "Economy"}])
+        second = _status(2, "bob", "<p>Border news #Election</p>", "2025-08-02T10:00:00.000Z", in_reply_to_id="1")
+        assert archive.add([first, second, {"not": "a status"}]) == 2
+        first["content"] = "<p>Sanctions on Ukraine</p>"
+        assert archive.add([dict(first, _target="alice")]) == 0
+        assert len(archive) == 2
+
+        assert archive.query("russia") == []
+        [hit] = archive.query("sanction*")
+        assert hit["content"] == "<p>Sanctions on Ukraine</p>" and "_target" not in hit
+        assert [s["id"] for s in archive.query(acct="@ALICE")] == ["1"]
+        assert [s["id"] for s in archive.query(tag="#economy")] == ["1"]
+        assert [s["id"] for s in archive.query(tag="election")] == ["2"]
+        assert [s["id"] for s in archive.query(replies=False)] == ["1"]
+        after = datetime(2025, 8, 2, tzinfo=timezone.utc)
+        assert [s["id"] for s in archive.query(created_after=after)] == ["2"]
+        assert [s["id"] for s in archive.query(created_before=after)] == ["1"]
+        assert json.loads(archive.query(acct="bob", raw=True)[0])["id"] == "2"
+
+
+def test_ingest_handles_utf16_files(tmp_path):
+    utf16 = tmp_path / "powershell.jsonl"
+    utf16.write_text(SAMPLE.read_text(encoding="utf-8"), encoding="utf-16")
+    with Archive(str(tmp_path / "a.db")) as archive:
+        read, added = archive.ingest_file(str(SAMPLE))
+        assert read == added > 0
+        assert archive.ingest_file(str(utf16)) == (read, 0)
+
+
+def test_cache_answers_repeated_pulls_locally(fake_api, fake_server, tmp_path):
+    with Archive(str(tmp_path / "a.db")) as archive:
+        api = ArchiveCache(fake_api, archive, max_age=3600)
+        live = list(api.pull_statuses("user7", replies=True))
+        requests = fake_server.request_count
+        cached = list(api.pull_statuses("user7", replies=True))
+        assert fake_server.request_count == requests
+        assert cached == live
+
+        cutoff = datetime.fromisoformat(live[20]["created_at"].replace("Z", "+00:00"))
+        assert list(api.pull_statuses("user7", replies=False, created_after=cutoff)) == live[:21]
+        assert [json.loads(p) for p in api.pull_statuses("user7", replies=True, fields=["content"], raw=True)][0] == {
+            "id": live[0]["id"], "created_at": live[0]["created_at"], "content": live[0]["content"]
+        }
+
+        hits = list(api.search("statuses", "border", limit=40))
+        requests = fake_server.request_count
+        assert list(api.search("statuses", "border", limit=40)) == hits
+        assert fake_server.request_count == requests
+
+        assert len(list(api.search("statuses", "border", limit=40, max_items=3))) == 3  # from the archive
+
+
+def test_capped_searches_do_not_answer_bigger_ones(fake_api, tmp_path):
+    with Archive(str(tmp_path / "a.db")) as archive:
+        api = ArchiveCache(fake_api, archive, max_age=3600)
+        assert len(list(api.search("statuses", "border", limit=40, max_items=5))) == 5
+        assert len(list(api.search("statuses", "border", limit=40, max_items=5))) == 5
+        assert len(list(api.search("statuses", "border", limit=40, max_items=200))) > 5
+
+
+def test_partial_pulls_are_not_marked_complete(fake_api, fake_server, tmp_path):
+    with Archive(str(tmp_path / "a.db")) as archive:
+        api = ArchiveCache(fake_api, archive, max_age=3600)
+        next(iter(api.pull_statuses("user8", replies=True)))
+        requests = fake_server.request_count
+        list(api.pull_statuses("user8", replies=True))
+        assert fake_server.request_count > requests
+
+
+def test_pulls_cut_short_by_errors_are_not_marked_complete(fake_server, fake_dataset, tmp_path):
+    api = Api(username="u", password="p", base_url=fake_server.url, transport="http", page_delay=None, retry_policy=RetryPolicy(attempts=1))
+    with Archive(str(tmp_path / "a.db")) as archive:
+        cache = ArchiveCache(api, archive, max_age=3600)
+        fake_server.errors = [0, 0, 500]  # lookup and first page, then a failure
+        partial = list(cache.pull_statuses("user7", replies=True))
+        assert 0 < len(partial) < fake_dataset.accounts["user7"]["statuses_count"]
+        assert len(list(cache.pull_statuses("user7", replies=True))) == fake_dataset.accounts["user7"]["statuses_count"]
+    api.quit()
+
+
+def test_archive_and_query_commands(tmp_path):
+    db = str(tmp_path / "a.db")
+    runner = CliRunner()
+    result = runner.invoke(cli, ["--no-daemon", "--archive", db, "archive", str(SAMPLE)])
+    assert result.exit_code == 0, result.output
+    acct = json.loads(SAMPLE.read_text(encoding="utf-8").splitlines()[0])["account"]["acct"]
+    result = runner.invoke(cli, ["--no-daemon", "--archive", db, "query", "--account", acct, "--limit", "5"])
+    assert result.exit_code == 0, result.output
+    lines = result.stdout.splitlines()
+    assert lines and all(json.loads(line)["account"]["acct"] == acct for line in lines)
+    assert runner.invoke(cli, ["--no-daemon", "--archive", db, "query", '"unbalanced']).exit_code == 2
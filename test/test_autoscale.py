@@ -0,0 +1,49 @@
+import threading
+import time
+
+from truthbrush.autoscale import ConcurrencyController
+from truthbrush.metrics import CONCURRENCY_LIMIT
+
+
+def test_additive_increase_multiplicative_decrease(monkeypatch):
+    monkeypatch.setattr("truthbrush.autoscale.memory_available", lambda: 0.5)
+    controller = ConcurrencyController(name="test", initial=2, maximum=5, watch_metrics=False)
+    for _ in range(5):
+        controller.observe(requests=10, latency=1.0)
+        controller.mark_saturated()
+        controller.update(force=True)
+    assert controller.limit == 5 and CONCURRENCY_LIMIT.value(name="test") == 5
+
+    controller.observe(requests=10, latency=1.0)
+    assert controller.update(force=True) == 5  # healthy but not saturated: no growth
+    controller.observe(requests=10, throttled=1, latency=1.0)
+    assert controller.update(force=True) == 2
+    controller.observe(requests=10, errors=3, latency=1.0)
+    assert controller.update(force=True) == 1
+    controller.observe(requests=10, latency=10.0)
+    controller.mark_saturated()
+    assert controller.update(force=True) == 1  # a latency spike is not healthy either
+
+    monkeypatch.setattr("truthbrush.autoscale.memory_available", lambda: 0.05)
+    controller = ConcurrencyController(name="test", initial=4, watch_metrics=False)
+    assert controller.update(force=True) == 2
+
+
+def test_slots_wait_for_the_limit(fake_api, monkeypatch):
+    monkeypatch.setattr("truthbrush.autoscale.memory_available", lambda: 0.5)
+    controller = ConcurrencyController(name="test-slots", initial=2, maximum=4, interval=0.05)
+    peak, lock = [0], threading.Lock()
+
+    def work():
+        fake_api.lookup("user1")
+        with lock:
+            peak[0] = max(peak[0], controller.in_flight)
+        time.sleep(0.02)
+
+    threads = [threading.Thread(target=controller.run, args=(work,)) for _ in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] <= 4 and controller.in_flight == 0
+    assert controller.limit > 2  # requests to the fake server are fast and never fail
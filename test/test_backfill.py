@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from truthbrush.api import Api
+from truthbrush.backfill import backfill_statuses, split_range
+from truthbrush.retry import ApiError
+
+
+def test_split_range_is_adjacent_and_newest_first():
+    ranges = split_range(0, 100, 3)
+    assert ranges == [[66, 100], [33, 66], [0, 33]]
+    assert split_range(0, 2, 5) == [[1, 2], [0, 1]]
+
+
+def test_backfill_matches_serial_pull(fake_server, fake_dataset):
+    sessions = [Api(username="u", password="p", base_url=fake_server.url, transport="http", page_delay=None) for _ in range(3)]
+    try:
+        account = fake_dataset.accounts["user7"]
+        timeline = [s["id"] for s in fake_dataset.timelines[account["id"]]]
+        merged = [p["id"] for p in backfill_statuses(sessions, "user7", ranges_per_session=3)]
+        assert merged == timeline
+
+        raw = [json.loads(p)["id"] for p in backfill_statuses(sessions, "user7", ranges_per_session=2, raw=True)]
+        assert raw == timeline
+    finally:
+        for api in sessions:
+            api.quit()
+
+
+class InclusiveBoundsSession:
+    """Treats since_id as inclusive, so adjacent ranges overlap by one status."""
+
+    ids = list(range(1000, 0, -7))
+
+    def timeline_span(self, username, replies=True):
+        return [0, 1000]
+
+    def pull_statuses(self, username, replies, since_id, max_id, **kwargs):
+        return ({"id": str(i)} for i in self.ids if int(since_id) <= i < int(max_id))
+
+
+def test_backfill_dedups_range_boundaries():
+    merged = [int(p["id"]) for p in backfill_statuses([InclusiveBoundsSession()] * 2, "x", ranges_per_session=50)]
+    assert merged == InclusiveBoundsSession.ids
+
+
+class FailingRangeSession(InclusiveBoundsSession):
+    """Stops partway through the range below 500, as a paginator does on a 502."""
+
+    def pull_statuses(self, username, replies, since_id, max_id, **kwargs):
+        for i in self.ids:
+            if int(since_id) < i < int(max_id):
+                if i <= 400 < int(max_id):
+                    return ApiError("HTTP error! status: 502", 502)
+                yield {"id": str(i)}
+
+
+def test_a_range_that_fails_partway_is_raised():
+    merged = []
+    with pytest.raises(RuntimeError, match="502"):
+        for status in backfill_statuses([FailingRangeSession()] * 2, "x", ranges_per_session=2):
+            merged.append(int(status["id"]))
+    assert merged == [i for i in FailingRangeSession.ids if i > 500]  # nothing from the failed range or after it
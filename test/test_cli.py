@@ -0,0 +1,169 @@
+import json
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from truthbrush.cli import cli
+
+
+def test_importing_api_does_not_load_browser_stack():
+    code = (
+        "import sys, truthbrush.api; "
+        "print(','.join(m for m in ('selenium', 'undetected_chromedriver', 'curl_cffi') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_help_and_usage_errors_do_not_log_in(monkeypatch):
+    monkeypatch.delenv("TRUTHSOCIAL_USERNAME", raising=False)
+    monkeypatch.delenv("TRUTHSOCIAL_PASSWORD", raising=False)
+    runner = CliRunner()
+    assert runner.invoke(cli, ["--help"]).exit_code == 0
+    assert runner.invoke(cli, ["statuses", "--help"]).exit_code == 0
+    result = runner.invoke(cli, ["search", "--searchtype", "bogus", "x"])
+    assert result.exit_code == 2
+    assert "Invalid value" in result.output
+
+
+def test_commands_log_in_on_first_request(fake_server, monkeypatch):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    result = CliRunner().invoke(cli, ["--transport", "http", "--base-url", fake_server.url, "user", "user2"])
+    assert result.exit_code == 0, result.output
+    assert '"acct": "user2"' in result.output
+
+
+def test_fields_option(fake_server, monkeypatch):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    post_id = next(iter(fake_server.dataset.likers))
+    args = ["--transport", "http", "--base-url", fake_server.url, "--no-daemon", "likes", post_id, "--fields", "acct, display_name"]
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0, result.output
+    likers = [json.loads(line) for line in result.output.splitlines()]
+    assert len(likers) == len(fake_server.dataset.likers[post_id])
+    assert all(set(liker) == {"id", "acct", "display_name"} for liker in likers)
+
+
+def test_raw_option(fake_server, monkeypatch):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    post_id = next(iter(fake_server.dataset.likers))
+    args = ["--transport", "http", "--base-url", fake_server.url, "--no-daemon", "likes", post_id, "--raw"]
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line) for line in result.output.splitlines()] == sorted(
+        fake_server.dataset.likers[post_id], key=lambda a: int(a["id"]), reverse=True
+    )
+
+
+def test_batch_from_stdin(fake_server, monkeypatch):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    post_ids = list(fake_server.dataset.likers)[:6]
+    stdin = "\n".join(post_ids + ["# comment", "", "999"]) + "\n"
+    args = ["--transport", "http", "--base-url", fake_server.url, "--no-daemon", "--rate", "1000", "likes", "--from-file", "-", "--workers", "3", "--raw"]
+    result = CliRunner().invoke(cli, args, input=stdin)
+    assert result.exit_code == 0, result.output
+    likers = [json.loads(line) for line in result.stdout.splitlines()]
+    assert len(likers) == sum(len(fake_server.dataset.likers[p]) for p in post_ids)
+    assert {l["_target"] for l in likers} == set(post_ids)
+    assert all(l["acct"] in fake_server.dataset.accounts for l in likers)
+
+
+def test_batch_needs_exactly_one_source_of_targets(monkeypatch):
+    monkeypatch.delenv("TRUTHSOCIAL_USERNAME", raising=False)
+    assert CliRunner().invoke(cli, ["--no-daemon", "statuses"]).exit_code == 2
+    assert CliRunner().invoke(cli, ["--no-daemon", "statuses", "user1", "--from-file", "-"], input="user2\n").exit_code == 2
+
+
+def test_groups_crawl_with_watermarks(fake_server, monkeypatch, tmp_path):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    state = tmp_path / "groups.json"
+    args = ["--transport", "http", "--base-url", fake_server.url, "--no-daemon", "groups-crawl", "--no-suggested", "--limit", "40", "--fields", "id", "--state", str(state)]
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0, result.output
+    posts = [json.loads(line) for line in result.stdout.splitlines()]
+    timelines = fake_server.dataset.group_timelines
+    trending = [g["id"] for g in fake_server.dataset.groups[:3]]
+    assert {p["_target"] for p in posts} == set(trending)
+    assert len(posts) == sum(len(timelines[g]) for g in trending)
+    marks = json.loads(state.read_text())
+    assert marks == {g: timelines[g][0]["id"] for g in trending}
+
+    marks[trending[0]] = timelines[trending[0]][5]["id"]
+    state.write_text(json.dumps(marks))
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line)["id"] for line in result.stdout.splitlines()] == [s["id"] for s in timelines[trending[0]][:5]]
+    assert json.loads(state.read_text())[trending[0]] == timelines[trending[0]][0]["id"]
+
+
+def test_groups_crawl_keeps_the_mark_of_a_truncated_group(fake_server, monkeypatch, tmp_path):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    state = tmp_path / "groups.json"
+    group = fake_server.dataset.groups[0]["id"]
+    fake_server.errors = [0, 502]  # the first page comes through, the second fails
+    args = ["--transport", "http", "--base-url", fake_server.url, "--no-daemon", "--retries", "0", "groups-crawl", "--no-trending", "--no-suggested", "--group", group, "--limit", "5", "--state", str(state)]
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 1
+    assert len(result.stdout.splitlines()) == 5
+    assert "1 of 1 groups failed" in result.stderr
+    assert not state.exists() or group not in json.loads(state.read_text())
+
+
+def test_snapshot_commands(fake_server, monkeypatch, tmp_path):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    db = str(tmp_path / "snapshots.db")
+    base = ["--transport", "http", "--base-url", fake_server.url, "--no-daemon"]
+    result = CliRunner().invoke(cli, base + ["snapshot", "--db", db, "--rounds", "2", "--interval", "0", "--endpoints", "trending_groups,ads"])
+    assert result.exit_code == 0, result.output
+    result = CliRunner().invoke(cli, ["snapshot-history", "trending_groups", "--db", db])
+    assert [json.loads(line) for line in result.stdout.splitlines()] == fake_server.dataset.groups[:3]
+    result = CliRunner().invoke(cli, ["snapshot-history", "trending_groups", "--db", db, "--events"])
+    assert [json.loads(line)["kind"] for line in result.stdout.splitlines()] == ["entered"] * 3
+    assert CliRunner().invoke(cli, base + ["snapshot", "--db", db, "--endpoints", "bogus"]).exit_code == 2
+
+
+def test_media_command(fake_server, tmp_path):
+    fake_server.media.update({"cli-1.png": b"one", "cli-2.png": b"two"})
+    crawl = tmp_path / "crawl.jsonl"
+    statuses = [
+        {"id": "1", "media_attachments": [{"url": f"{fake_server.url}/media/cli-1.png"}], "account": {"avatar": f"{fake_server.url}/media/cli-2.png"}},
+        {"id": "2", "media_attachments": [], "account": {"avatar": f"{fake_server.url}/media/cli-2.png"}},
+    ]
+    crawl.write_text("".join(json.dumps(s) + "\n" for s in statuses))
+    result = CliRunner().invoke(cli, ["media", str(crawl), "--out", str(tmp_path / "media")])
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert sorted(r["size"] for r in records) == [3, 3]
+    assert all((tmp_path / "media" / r["path"]).exists() for r in records)
+
+
+def test_batch_autoscale(fake_server, monkeypatch):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    post_ids = list(fake_server.dataset.likers)[:4]
+    args = ["--transport", "http", "--base-url", fake_server.url, "--no-daemon", "likes", "--from-file", "-", "--workers", "3", "--autoscale"]
+    result = CliRunner().invoke(cli, args, input="\n".join(post_ids) + "\n")
+    assert result.exit_code == 0, result.output
+    assert len(result.stdout.splitlines()) == sum(len(fake_server.dataset.likers[p]) for p in post_ids)
+
+
+def test_targets_that_stop_early_fail(fake_server, monkeypatch):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    base = ["--transport", "http", "--base-url", fake_server.url, "--no-daemon", "--retries", "0"]
+    result = CliRunner().invoke(cli, base + ["statuses", "nosuchuser"])
+    assert result.exit_code == 1
+    assert result.stdout == "" and "Failed to pull nosuchuser" in result.stderr
+
+    result = CliRunner().invoke(cli, base + ["statuses", "--from-file", "-", "--workers", "2"], input="user1\nnosuchuser\n")
+    assert result.exit_code == 1
+    assert result.stdout and {json.loads(line)["_target"] for line in result.stdout.splitlines()} == {"user1"}
+    assert "Failed to pull nosuchuser" in result.stderr and "1 of 2 targets failed" in result.stderr
@@ -0,0 +1,71 @@
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from click.testing import CliRunner
+
+from truthbrush.api import Api, _tap
+from truthbrush.cli import cli
+from truthbrush.daemon import DaemonClient, DaemonError, SessionDaemon
+
+
+@pytest.fixture
+def daemon(fake_server, tmp_path):
+    api = Api(username="u", password="p", base_url=fake_server.url, transport="http", page_delay=None)
+    server = SessionDaemon([api], str(tmp_path / "tb.sock"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_forwards_calls_and_streams(daemon, fake_dataset):
+    client = DaemonClient(daemon.socket_path)
+    assert DaemonClient.available(daemon.socket_path)
+    assert client.lookup("user4")["acct"] == "user4"
+
+    posts = list(client.pull_statuses("user4", replies=True))
+    assert len(posts) == fake_dataset.accounts["user4"]["statuses_count"]
+
+    cutoff = datetime.fromisoformat(posts[9]["created_at"].replace("Z", "+00:00")).astimezone(timezone.utc)
+    recent = list(client.pull_statuses("user4", replies=True, created_after=cutoff))
+    assert len(recent) == 10
+
+    # Abandoning a stream returns the session to the pool.
+    next(iter(client.pull_statuses("user4", replies=True)))
+    assert client.lookup("user5")["acct"] == "user5"
+
+
+def test_streams_report_where_paging_stopped(daemon, fake_server):
+    client = DaemonClient(daemon.socket_path)
+    fake_server.errors = [0, 404]  # the lookup works, the first timeline page does not
+    posts = []
+    error = _returned(_tap(client.pull_statuses("user4", replies=True), posts.append))
+    assert posts == [] and error["status"] == 404
+    assert _returned(client.pull_statuses("user4", replies=True)) is None
+
+
+def _returned(items):
+    """Exhaust a generator and return its return value."""
+    items = iter(items)
+    while True:
+        try:
+            next(items)
+        except StopIteration as stop:
+            return stop.value
+
+
+def test_unknown_methods_are_rejected(daemon):
+    client = DaemonClient(daemon.socket_path)
+    with pytest.raises(AttributeError):
+        client.quit_everything()
+    with pytest.raises(DaemonError):
+        client._call("_get", ("/v1/trends",), {})
+
+
+def test_cli_uses_running_daemon(daemon, monkeypatch):
+    monkeypatch.delenv("TRUTHSOCIAL_USERNAME", raising=False)
+    monkeypatch.delenv("TRUTHSOCIAL_PASSWORD", raising=False)
+    result = CliRunner().invoke(cli, ["--socket", daemon.socket_path, "user", "user6"])
+    assert result.exit_code == 0, result.output
+    assert '"acct": "user6"' in result.output
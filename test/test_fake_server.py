@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+
+from dateutil import parser as date_parse
+
+from fake_server import FakeTruthSocial
+from truthbrush.api import Api, _collect
+from truthbrush.pagecache import PageCache
+from truthbrush.retry import RetryPolicy
+
+
+def test_pull_statuses_pages_through_whole_timeline(fake_api, fake_dataset):
+    account = fake_dataset.accounts["user3"]
+    posts = list(fake_api.pull_statuses("user3", replies=True))
+    assert len(posts) == account["statuses_count"]
+    assert [p["id"] for p in posts] == [s["id"] for s in fake_dataset.timelines[account["id"]]]
+
+
+def test_lookup_likes_comments_and_search(fake_api, fake_dataset):
+    assert fake_api.lookup("user1")["acct"] == "user1"
+    post_id = fake_dataset.timelines[fake_api.lookup("user1")["id"]][0]["id"]
+    assert len(list(fake_api.user_likes(post_id, limit=10))) == len(fake_dataset.likers[post_id])
+    assert len(list(fake_api.pull_comments(post_id, includeall=True))) == len(fake_dataset.comments[post_id])
+    results = list(fake_api.search("statuses", "ukraine", limit=40))
+    assert results and all("ukraine" in r["content"].lower() for r in results)
+
+
+def test_search_windows_pull_every_match_once(fake_api, fake_dataset):
+    matches = [s for s in fake_dataset.statuses.values() if "ukraine" in s["content"].lower()]
+    dates = sorted(date_parse.parse(s["created_at"]) for s in matches)
+    start, end = dates[0], dates[-1]
+    capped = list(fake_api.search("statuses", "ukraine", limit=40, max_items=10))
+    assert len(capped) == 10
+
+    results = list(fake_api.search_windows("ukraine", created_after=start, created_before=end, limit=40, windows=3, workers=2, window_cap=10))
+    ids = [r["id"] for r in results]
+    assert len(ids) == len(set(ids))
+    assert set(ids) == {s["id"] for s in matches}
+
+    middle = dates[len(dates) // 2]
+    later = list(fake_api.search("statuses", "ukraine", limit=40, created_after=middle, max_items=None))
+    assert {r["id"] for r in later} == {s["id"] for s in matches if date_parse.parse(s["created_at"]) >= middle}
+
+
+def test_search_windows_return_the_error_of_an_incomplete_window(fake_server, fake_dataset):
+    api = Api(username="u", password="p", base_url=fake_server.url, transport="http", page_delay=None, retry_policy=RetryPolicy(attempts=1))
+    dates = sorted(date_parse.parse(s["created_at"]) for s in fake_dataset.statuses.values())
+    fake_server.errors = [0, 502]  # the first window's first page comes through, then a search fails
+    results, error = _collect(api.search_windows("ukraine", created_after=dates[0], created_before=dates[-1], limit=10, windows=2, workers=1))
+    assert error and error.status == 502
+    matches = {s["id"] for s in fake_dataset.statuses.values() if "ukraine" in s["content"].lower()}
+    assert 10 <= len(results) < len(matches) and {r["id"] for r in results} <= matches
+    api.quit()
+
+
+def test_search_offset_and_page_cache(fake_server, fake_dataset, tmp_path):
+    with PageCache(str(tmp_path / "pages.db"), ttl=60) as cache:
+        api = Api(username="u", password="p", base_url=fake_server.url, transport="http", page_delay=None, page_cache=cache)
+        everything = [r["id"] for r in api.search("statuses", "ukraine", limit=40, max_items=100)]
+        requests = fake_server.request_count
+        first = [r["id"] for r in api.search("statuses", "ukraine", limit=40, max_items=40)]
+        rest = [r["id"] for r in api.search("statuses", "ukraine", limit=40, max_items=60, offset=40)]
+        assert first + rest == everything
+        assert fake_server.request_count == requests
+        assert cache.hits == 3
+        assert len(list(api.search("statuses", "ukraine", limit=40, max_items=10, offset=95))) == 10
+        assert fake_server.request_count == requests + 1
+        api.quit()
+
+
+def test_user_likes_cap_and_sample(fake_api, fake_server, fake_dataset):
+    post_id = next(iter(fake_dataset.likers))
+    everyone = {a["id"] for a in fake_dataset.likers[post_id]}
+    requests = fake_server.request_count
+    capped = [l["id"] for l in fake_api.user_likes(post_id, limit=5, max_items=12)]
+    assert len(capped) == 12 and set(capped) <= everyone
+    assert fake_server.request_count - requests == 3
+
+    requests = fake_server.request_count
+    sampled = [l["id"] for l in fake_api.user_likes(post_id, limit=5, sample_pages=2)]
+    assert len(sampled) == len(set(sampled)) >= 5 and set(sampled) <= everyone
+    assert fake_server.request_count - requests <= 1 + 2 * 2
+
+
+def test_bounded_timeline_sampling(fake_api, fake_server, fake_dataset):
+    account = fake_dataset.accounts["user4"]
+    timeline = [s["id"] for s in fake_dataset.timelines[account["id"]]]
+    assert [p["id"] for p in fake_api.pull_statuses("user4", replies=True, max_pages=2)] == timeline[:40]
+    assert [p["id"] for p in fake_api.pull_statuses("user4", replies=True, max_id=timeline[9], since_id=timeline[15])] == timeline[10:15]
+
+    exact = fake_api.sample_statuses("user4", 30, max_pages=10)
+    assert len({p["id"] for p in exact}) == 30 and {p["id"] for p in exact} <= set(timeline)
+
+    requests = fake_server.request_count
+    spread = fake_api.sample_statuses("user4", 30, max_pages=4)
+    assert fake_server.request_count - requests <= 1 + 4
+    assert 0 < len({p["id"] for p in spread}) == len(spread) <= 30 and {p["id"] for p in spread} <= set(timeline)
+
+
+def test_rate_limit_injection(fake_dataset):
+    with FakeTruthSocial(fake_dataset, rate_limit_every=2) as server:
+        api = Api(username="u", password="p", base_url=server.url, transport="http", page_delay=None, retry_policy=RetryPolicy(attempts=1))
+        assert "error" not in api.lookup("user0")
+        assert api.lookup("user0")["status"] == 429
+        assert server.rate_limited_count == 1
+
+
+def test_field_projection(fake_api, fake_dataset):
+    posts = list(fake_api.pull_statuses("user2", replies=True, fields=["content", "account.acct"]))
+    assert len(posts) == fake_dataset.accounts["user2"]["statuses_count"]
+    assert set(posts[0]) == {"id", "created_at", "content", "account"}
+    assert posts[0]["account"] == {"acct": "user2"}
+
+    results = list(fake_api.search("statuses", "ukraine", limit=40, fields=["account.acct"]))
+    assert results and all(set(r) == {"id", "created_at", "account"} for r in results)
+    assert [set(l) for l in fake_api.user_likes(posts[0]["id"], fields=["acct"])][0] == {"id", "acct"}
+
+
+def test_raw_mode_yields_server_json(fake_api, fake_dataset):
+    group_id = fake_dataset.groups[0]["id"]
+    raw = list(fake_api.groupposts(group_id, raw=True))
+    assert all(isinstance(post, str) for post in raw)
+    assert [json.loads(post) for post in raw] == list(fake_api.groupposts(group_id))
+
+    post_id = fake_dataset.group_timelines[group_id][0]["id"]
+    assert [json.loads(c) for c in fake_api.pull_comments(post_id, includeall=True, raw=True)] == list(fake_api.pull_comments(post_id, includeall=True))
+    projected = [json.loads(l) for l in fake_api.user_likes(post_id, fields=["acct"], raw=True)]
+    assert projected == [{"id": l["id"], "acct": l["acct"]} for l in fake_api.user_likes(post_id)]
+
+
+def test_browser_scripts_run_one_at_a_time(fake_api):
+    class Driver:
+        running = overlaps = 0
+
+        def execute_async_script(self, script, tree):
+            Driver.running += 1
+            Driver.overlaps += Driver.running > 1
+            time.sleep(0.02)
+            Driver.running -= 1
+            return '{"ok": true}'
+
+    fake_api.transport, fake_api.driver = "browser", Driver()
+    threads = [threading.Thread(target=fake_api._get, args=("/v1/instance",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    fake_api.transport, fake_api.driver = "http", None
+    assert Driver.overlaps == 0
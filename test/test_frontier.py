@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from truthbrush.frontier import FrontierScheduler
+
+
+def test_fifo_preserves_discovery_order():
+    frontier = FrontierScheduler(mode="fifo")
+    frontier.extend(["a", "b", "c"])
+    frontier.add("a")  # re-discovery does not move a user
+    assert list(frontier) == ["a", "b", "c"]
+    assert [frontier.pop() for _ in range(3)] == ["a", "b", "c"]
+    assert not frontier
+
+
+def test_yield_prefers_users_from_productive_referrers():
+    frontier = FrontierScheduler(mode="yield", epsilon=0.0)
+    frontier.add("from_dud", referrer="dud")
+    frontier.add("from_star", referrer="star")
+    frontier.record("dud", hits=0, checked=500)
+    frontier.record("star", hits=50, checked=100)
+    assert frontier.pop() == "from_star"
+
+
+def test_yield_prefers_users_who_liked_more_relevant_posts():
+    frontier = FrontierScheduler(mode="yield", epsilon=0.0)
+    frontier.add("once", referrer="seed")
+    for _ in range(5):
+        frontier.add("often", referrer="seed")
+    assert frontier.pop() == "often"
+
+
+def test_unbiased_pops_every_user_exactly_once():
+    frontier = FrontierScheduler(mode="unbiased", rng=random.Random(7))
+    users = [f"user{i}" for i in range(100)]
+    frontier.extend(users)
+    popped = [frontier.pop() for _ in range(100)]
+    assert sorted(popped) == sorted(users)
+    assert popped != users
+    with pytest.raises(IndexError):
+        frontier.pop()
+
+
+def test_state_round_trip():
+    frontier = FrontierScheduler(mode="yield", epsilon=0.0)
+    frontier.record("star", hits=10, checked=20)
+    frontier.add("x", referrer="star")
+    frontier.add("y")
+    restored = FrontierScheduler.from_state(frontier.to_state(), epsilon=0.0)
+    assert sorted(restored) == ["x", "y"]
+    assert restored.score("x") == pytest.approx(frontier.score("x"))
@@ -0,0 +1,46 @@
+from truthbrush.graph import EngagementGraph, EngagementGraphWriter
+
+
+def test_round_trip_degrees_and_neighbors(tmp_path):
+    with EngagementGraphWriter(str(tmp_path), chunk_size=2) as writer:
+        writer.add_like("100", liker="bob", author="alice")
+        writer.add_like("100", liker="carol", author="alice")
+        writer.add_like("200", liker="bob", author="dave")
+        writer.add_like("100", liker="bob", author="alice")  # duplicate
+
+    graph = EngagementGraph.load(str(tmp_path))
+    assert graph.num_edges == 5
+    assert graph.degree(graph.user("bob"), "out", kind="liked") == 2
+    assert graph.degree(graph.user("alice"), "out", kind="authored") == 1
+    assert graph.degree(graph.post("100"), "in") == 3
+    assert sorted(graph.likers("100")) == ["bob", "carol"]
+    posts = {graph.node_name(n) for n in graph.neighbors(graph.user("bob"))}
+    assert posts == {"p:100", "p:200"}
+
+
+def test_resume_and_csr_cache(tmp_path):
+    with EngagementGraphWriter(str(tmp_path)) as writer:
+        writer.add_like("1", liker="a", author="b")
+    first = EngagementGraph.load(str(tmp_path))
+    assert (tmp_path / "csr.json").exists()
+
+    with EngagementGraphWriter(str(tmp_path)) as writer:
+        writer.add_like("1", liker="a", author="b")  # repeated across runs
+        writer.add_like("1", liker="c")
+    second = EngagementGraph.load(str(tmp_path))
+    assert len(second) == len(first) + 1
+    assert sorted(second.likers("1")) == ["a", "c"]
+
+    cached = EngagementGraph.load(str(tmp_path))
+    assert cached.degree(cached.post("1"), "in") == 3
+
+
+def test_chunks_cut_short_by_a_crash_still_load(tmp_path):
+    with EngagementGraphWriter(str(tmp_path)) as writer:
+        writer.add_like("1", liker="a", author="b")
+        writer.add_like("2", liker="c")
+    chunk = next(tmp_path.glob("edges-*.u32"))
+    chunk.write_bytes(chunk.read_bytes()[:-6])  # the last edge loses a value and a half
+    graph = EngagementGraph.load(str(tmp_path), cache=False)
+    assert graph.num_edges == 2
+    assert graph.likers("1") == ["a"] and graph.likers("2") == []
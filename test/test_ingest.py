@@ -0,0 +1,60 @@
+import json
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from truthbrush.ingest import chunk_bounds, detect_encoding, read_jsonl
+
+QUERY_DATA = Path(__file__).resolve().parent.parent / "Query Data" / "russia_300_posts.jsonl"
+
+RECORDS = [{"id": str(i), "content": f"post {i}   ünïcode", "tags": ["a"] * (i % 7)} for i in range(300)]
+
+
+@pytest.fixture(params=["utf-8", "utf-8-sig", "utf-16", "utf-16-le", "utf-16-be"])
+def dump(request, tmp_path):
+    path = tmp_path / "dump.jsonl"
+    lines = [json.dumps(r, ensure_ascii=False) for r in RECORDS]
+    lines.insert(100, "{not json")
+    lines.insert(200, "")
+    path.write_text("\n".join(lines) + "\n", encoding=request.param)
+    return str(path)
+
+
+def test_detect_encoding(dump):
+    encoding, bom = detect_encoding(dump)
+    assert encoding in ("utf-8", "utf-16-le", "utf-16-be")
+    assert Path(dump).read_bytes()[bom:].decode(encoding).startswith('{"id": "0"')
+
+
+def test_chunks_end_on_newlines(dump):
+    encoding, bounds = chunk_bounds(dump, chunk_size=1000)
+    assert len(bounds) > 5
+    data = Path(dump).read_bytes()
+    assert all(a_end == b_start for (_, a_end), (b_start, _) in zip(bounds, bounds[1:]))
+    assert bounds[-1][1] == len(data)
+    assert all(data[start:end].decode(encoding).endswith("\n") for start, end in bounds)
+
+
+def test_parallel_read_matches_sequential(dump):
+    assert list(read_jsonl(dump, workers=1)) == RECORDS
+    assert list(read_jsonl(dump, workers=3, chunk_size=1000)) == RECORDS
+    unordered = read_jsonl(dump, workers=3, chunk_size=1000, ordered=False)
+    assert Counter(r["id"] for r in unordered) == Counter(r["id"] for r in RECORDS)
+
+
+def _ids_only(value):
+    return value["id"] if int(value["id"]) % 2 else None
+
+
+def test_transform_runs_in_workers(dump):
+    assert list(read_jsonl(dump, workers=2, chunk_size=1000, transform=_ids_only)) == [r["id"] for r in RECORDS if int(r["id"]) % 2]
+
+
+def test_empty_file_and_powershell_sample(tmp_path):
+    empty = tmp_path / "empty.jsonl"
+    empty.write_bytes(b"")
+    assert list(read_jsonl(str(empty))) == []
+    assert detect_encoding(str(QUERY_DATA)) == ("utf-16-le", 2)
+    posts = list(read_jsonl(str(QUERY_DATA), workers=2, chunk_size=256 * 1024))
+    assert len(posts) > 100 and all("id" in post for post in posts)
@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+from truthbrush.jsonio import dumps, iter_array
+
+
+def test_iter_array_keeps_source_text():
+    text = ' [ {"a": [1, {"b": "]},"}]} ,\n {"c": "x\\"y"}, 3 ] '
+    items = list(iter_array(text))
+    assert [item for item, _ in items] == [{"a": [1, {"b": "]},"}]}, {"c": 'x"y'}, 3]
+    assert [source for _, source in items] == ['{"a": [1, {"b": "]},"}]}', '{"c": "x\\"y"}', "3"]
+    assert list(iter_array("[]")) == []
+
+
+def test_iter_array_reencodes_multiline_items():
+    [(item, source)] = iter_array('[\n  {\n    "a": "é"\n  }\n]')
+    assert "\n" not in source and json.loads(source) == item == {"a": "é"}
+    assert json.loads(dumps(item)) == item
+
+
+def test_iter_array_rejects_objects():
+    with pytest.raises(ValueError):
+        list(iter_array('{"error": "nope"}'))
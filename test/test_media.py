@@ -0,0 +1,70 @@
+import hashlib
+import os
+
+from fake_server import FakeTruthSocial
+from truthbrush.media import MediaDownloader, MediaStore, media_urls, unique_media_urls
+
+
+def test_media_urls_cover_attachments_accounts_and_reblogs():
+    status = {
+        "media_attachments": [{"url": "https://x/a.jpg", "preview_url": "https://x/a_small.jpg"}],
+        "account": {"avatar": "https://x/avatar.png", "avatar_static": "https://x/avatar.png"},
+        "reblog": {"card": {"image": "https://x/card.jpg"}, "account": {"header": "https://x/header.jpg"}},
+    }
+    assert list(unique_media_urls([status, status])) == ["https://x/a.jpg", "https://x/avatar.png", "https://x/card.jpg", "https://x/header.jpg"]
+    assert len(list(media_urls(status))) == 5
+
+
+def test_downloads_are_deduplicated_and_resumed(tmp_path):
+    image = os.urandom(300_000)
+    with FakeTruthSocial() as server, MediaStore(str(tmp_path)) as store:
+        server.media.update({"a.png": image, "b.png": image, "c.png": b"other"})
+        urls = [f"{server.url}/media/{name}" for name in ("a.png", "b.png", "c.png", "missing.png")]
+        with open(store.partial_path(urls[0]), "wb") as f:
+            f.write(image[:1000])  # left over from an interrupted run
+        with open(store.partial_path(urls[0]) + ".validator", "w") as f:
+            f.write(_etag(image))
+
+        results = dict(MediaDownloader(store, workers=3).download_all(urls))
+        assert isinstance(results[urls[3]], IOError)
+        assert results[urls[0]]["sha256"] == results[urls[1]]["sha256"]
+        assert len(store) == 2  # the same bytes under two URLs are stored once
+        with open(tmp_path / results[urls[0]]["path"], "rb") as f:
+            assert f.read() == image
+        assert ("a.png", "bytes=1000-") in server.media_requests
+
+        requests = len(server.media_requests)
+        again = dict(MediaDownloader(store).download_all(urls[:3]))
+        assert all(record["cached"] for record in again.values())
+        assert len(server.media_requests) == requests
+
+
+def _etag(content: bytes) -> str:
+    return '"%s"' % hashlib.sha1(content).hexdigest()
+
+
+def _leave_partial(store, url, content: bytes, validator: str = None):
+    with open(store.partial_path(url), "wb") as f:
+        f.write(content)
+    if validator:
+        with open(store.partial_path(url) + ".validator", "w") as f:
+            f.write(validator)
+
+
+def test_partial_downloads_of_changed_files_start_over(tmp_path):
+    image, old = os.urandom(50_000), os.urandom(50_000)
+    with FakeTruthSocial() as server, MediaStore(str(tmp_path)) as store:
+        server.media.update({"changed.png": image, "done.png": image, "stale.png": image, "bare.png": image})
+        url = lambda name: f"{server.url}/media/{name}"
+        _leave_partial(store, url("changed.png"), old[:1000], _etag(old))  # the file was replaced since
+        _leave_partial(store, url("done.png"), image, _etag(image))  # finished but not committed: 416
+        _leave_partial(store, url("stale.png"), old[:60_000] + old, _etag(image))  # longer than the file: 416
+        _leave_partial(store, url("bare.png"), old[:1000])  # no validator: can't tell, so start over
+
+        downloader = MediaDownloader(store)
+        for name in ("changed.png", "done.png", "stale.png", "bare.png"):
+            record = downloader.download(url(name))
+            with open(tmp_path / record["path"], "rb") as f:
+                assert f.read() == image, name
+        assert ("bare.png", None) in server.media_requests
+        assert not os.listdir(store.partial_dir)
@@ -0,0 +1,53 @@
+import urllib.request
+
+from truthbrush.metrics import ITEMS, PAGES, Registry, endpoint_label
+
+
+def test_endpoint_label_collapses_ids():
+    assert endpoint_label("/v1/accounts/107780257626128497/statuses") == "/v1/accounts/:id/statuses"
+    assert endpoint_label("/v1/statuses/1/context/descendants?sort=oldest") == "/v1/statuses/:id/context/descendants"
+    assert endpoint_label("/v2/search") == "/v2/search"
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("t_requests_total", "Requests.", ["endpoint", "status"])
+    latency = registry.histogram("t_latency_seconds", "Latency.", ["endpoint"], buckets=(0.1, 1.0))
+    requests.inc(endpoint="/v2/search", status=200)
+    requests.inc(endpoint="/v2/search", status=200)
+    latency.observe(0.05, endpoint="/v2/search")
+    latency.observe(0.5, endpoint="/v2/search")
+
+    text = registry.render()
+    assert "# TYPE t_requests_total counter" in text
+    assert 't_requests_total{endpoint="/v2/search",status="200"} 2' in text
+    assert 't_latency_seconds_bucket{endpoint="/v2/search",le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{endpoint="/v2/search",le="+Inf"} 2' in text
+    assert 't_latency_seconds_count{endpoint="/v2/search"} 2' in text
+
+
+def test_textfile_and_http_endpoint(tmp_path):
+    registry = Registry()
+    registry.gauge("t_queue_depth", "Queue depth.", ["queue"]).set(7, queue="frontier")
+
+    path = tmp_path / "metrics.prom"
+    registry.write_textfile(str(path))
+    assert 't_queue_depth{queue="frontier"} 7' in path.read_text()
+
+    server = registry.serve(0)
+    try:
+        port = server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+        assert 't_queue_depth{queue="frontier"} 7' in body
+    finally:
+        server.shutdown()
+
+
+def test_raw_pages_are_counted(fake_api, fake_dataset):
+    endpoint = "/v1/accounts/:id/statuses"
+    statuses = fake_dataset.accounts["user4"]["statuses_count"]
+    for raw, fields in ((False, None), (True, None), (True, ["content"])):
+        pages, items = PAGES.value(endpoint=endpoint), ITEMS.value(endpoint=endpoint)
+        assert len(list(fake_api.pull_statuses("user4", replies=True, raw=raw, fields=fields))) == statuses
+        assert ITEMS.value(endpoint=endpoint) - items == statuses
+        assert PAGES.value(endpoint=endpoint) - pages >= 1
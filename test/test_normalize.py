@@ -0,0 +1,48 @@
+import json
+
+from click.testing import CliRunner
+
+from truthbrush.cli import cli
+from truthbrush.normalize import AccountNormalizer
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_accounts_are_written_once_until_they_change(tmp_path):
+    path = tmp_path / "accounts.jsonl"
+    alice = {"id": "1", "acct": "alice", "followers_count": 10}
+    with AccountNormalizer.open(str(path)) as accounts:
+        first = accounts.normalize({"id": "10", "content": "a", "account": alice})
+        accounts.normalize({"id": "11", "content": "b", "account": dict(alice)})
+        reblog = accounts.normalize({"id": "12", "account": {"id": "2", "acct": "bob"}, "reblog": {"id": "10", "account": alice}})
+        assert accounts.normalize({"id": "13"}) == {"id": "13"}
+
+    assert first == {"id": "10", "content": "a", "account_id": "1"}
+    assert reblog == {"id": "12", "account_id": "2", "reblog": {"id": "10", "account_id": "1"}}
+    assert [a["acct"] for a in _lines(path)] == ["alice", "bob"]
+
+    with AccountNormalizer.open(str(path)) as accounts:
+        accounts.normalize({"id": "14", "account": alice})
+        accounts.normalize({"id": "15", "account": dict(alice, followers_count=11)})
+    assert [a.get("followers_count") for a in _lines(path)] == [10, None, 11]
+
+
+def test_cli_accounts_file(fake_server, monkeypatch, tmp_path):
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "u")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    post_id = next(iter(fake_server.dataset.comments))
+    accounts_file = tmp_path / "accounts.jsonl"
+    args = ["--transport", "http", "--base-url", fake_server.url, "--no-daemon", "comments", post_id, "--includeall", "--accounts-file", str(accounts_file)]
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0, result.output
+
+    comments = [json.loads(line) for line in result.stdout.splitlines()]
+    accounts = {a["id"]: a for a in _lines(accounts_file)}
+    assert len(comments) == len(fake_server.dataset.comments[post_id])
+    assert all("account" not in c and c["account_id"] in accounts for c in comments)
+    assert len(accounts) == len(_lines(accounts_file))  # nothing written twice
+
+    result = CliRunner().invoke(cli, args + ["--raw"])
+    assert result.exit_code == 2
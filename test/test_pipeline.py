@@ -0,0 +1,123 @@
+import functools
+import json
+import os
+import threading
+import time
+
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+
+from truthbrush.pipeline import Pipeline, match_statuses
+
+STATUSES = [
+    {"id": "1", "content": "<p>Support for <b>Ukraine</b></p>"},
+    {"id": "2", "content": '<p><a href="https://ukraine.example">link</a> nothing here</p>'},
+    {"id": "3", "content": "<p>Kyiv &amp; UKRAINE today</p>"},
+]
+
+
+def test_match_statuses_strips_html():
+    checked, matches = match_statuses(["Ukraine"], "user", [json.dumps(s) for s in STATUSES])
+    assert checked == 3
+    assert [s["id"] for s in matches] == ["1", "3"]  # the link target is markup, not text
+
+
+def _timeline(target):
+    return [{"id": f"{target}-{i}", "content": "ukraine" if i % 2 else "other"} for i in range(5)]
+
+
+@pytest.mark.parametrize("cpu_workers", [0, 2])
+def test_follow_up_targets_and_done(cpu_workers):
+    written, finished = [], []
+
+    def fetch(target):
+        if target.startswith("likers:"):
+            return [{"id": target, "content": "likers"}]
+        return _timeline(target)
+
+    def write(target, result):
+        checked, matches = result
+        written.extend(s["id"] for s in matches)
+        if target.startswith("likers:"):
+            return []
+        return [f"likers:{s['id']}" for s in matches]
+
+    pipeline = Pipeline(fetch, functools.partial(match_statuses, ["ukraine", "likers"]), write, finished.append, io_workers=2, cpu_workers=cpu_workers, chunk_size=2)
+    stats = pipeline.run(["a", "b"])
+
+    assert sorted(finished) == sorted(["a", "b", "likers:a-1", "likers:a-3", "likers:b-1", "likers:b-3"])
+    assert sorted(written) == sorted(["a-1", "a-3", "b-1", "b-3", "likers:a-1", "likers:a-3", "likers:b-1", "likers:b-3"])
+    assert stats == dict(targets=6, items=14, chunks=10, failed=0, restarts=0)
+
+
+def test_failures_are_counted_and_skipped():
+    def fetch(target):
+        if target == "bad":
+            raise RuntimeError("boom")
+        yield from _timeline(target)
+
+    def process(target, chunk):
+        if target == "worse":
+            raise ValueError("bad chunk")
+        return len(chunk)
+
+    done, items = [], []
+    stats = Pipeline(fetch, process, lambda target, n: items.append(n), done.append, cpu_workers=0).run(["good", "bad", "worse"])
+    assert stats["failed"] == 2 and sum(items) == 5
+    assert done == ["good"]  # failed targets get no done()
+
+
+def test_slow_writer_holds_fetching_back():
+    fetched = []
+    lock = threading.Lock()
+
+    def fetch(target):
+        for i in range(50):
+            with lock:
+                fetched.append(i)
+            yield i
+
+    def write(target, result):
+        time.sleep(0.02)
+        with lock:
+            # only the chunks in the bounded queue and one per fetch thread can run ahead of the writer
+            assert len(fetched) - written[0] <= 2 * 3 + 1
+        written[0] += 1
+
+    written = [0]
+    stats = Pipeline(fetch, lambda target, chunk: chunk, write, io_workers=1, cpu_workers=0, queue_size=2, chunk_size=1).run(["t"])
+    assert stats["chunks"] == written[0] == 50
+
+
+def test_callable_source_is_polled_until_exhausted():
+    source = iter(range(10))
+    seen = []
+    stats = Pipeline(lambda t: [t], lambda t, chunk: chunk, lambda t, r: seen.extend(r), cpu_workers=0).run(lambda: next(source, None))
+    assert sorted(seen) == list(range(10)) and stats["targets"] == 10
+
+
+def _crash_on_bad(target, chunk):
+    if target == "bad":
+        os._exit(1)  # as if the worker were killed for memory
+    return len(chunk)
+
+
+def _slow_unless_bad(target):
+    if target != "bad":
+        time.sleep(0.5)  # the pool breaks before these chunks arrive
+    return _timeline(target)
+
+
+def test_a_dead_worker_fails_its_chunks_and_the_pool_is_replaced():
+    done, written = [], []
+    pipeline = Pipeline(_slow_unless_bad, _crash_on_bad, lambda t, n: written.append(n), done.append, io_workers=4, cpu_workers=2)
+    stats = pipeline.run(["bad", "a", "b", "c"])
+    assert stats["restarts"] == 1 and stats["failed"] == 1
+    assert sorted(done) == ["a", "b", "c"]  # no done() for the target whose chunk was lost
+    assert sum(written) == 15
+
+
+def test_a_pool_that_keeps_breaking_stops_the_run():
+    pipeline = Pipeline(_slow_unless_bad, _crash_on_bad, lambda t, n: None, io_workers=2, cpu_workers=1, pool_restarts=0)
+    with pytest.raises(BrokenProcessPool):
+        pipeline.run(["bad", "a"])
@@ -0,0 +1,36 @@
+import json
+
+from fake_server import FakeDataset, FakeTruthSocial
+from truthbrush.pool import PooledApi, load_credentials
+
+
+def test_credentials_from_file_and_environment(tmp_path, monkeypatch):
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps([{"username": "a", "password": "x", "rate": 2}, {"username": "b", "password": "y"}]))
+    assert [(c.username, c.rate) for c in load_credentials(str(path))] == [("a", 2), ("b", None)]
+
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME", "main")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD", "p")
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME_10", "ten")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD_10", "p")
+    monkeypatch.setenv("TRUTHSOCIAL_RATE_10", "0.5")
+    monkeypatch.setenv("TRUTHSOCIAL_USERNAME_2", "two")
+    monkeypatch.setenv("TRUTHSOCIAL_PASSWORD_2", "p")
+    assert [(c.username, c.rate) for c in load_credentials(None)] == [("main", None), ("two", None), ("ten", 0.5)]
+
+
+def test_pool_spreads_requests_and_cools_down_throttled_accounts(tmp_path):
+    dataset = FakeDataset(num_accounts=2, posts_per_account=200, likers_per_post=1, comments_per_post=0)
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps([{"username": f"u{i}", "password": "p", "rate": 50, "burst": 2} for i in range(3)]))
+    with FakeTruthSocial(dataset) as server:
+        pool = PooledApi(load_credentials(str(path)), base_url=server.url, transport="http", page_delay=None)
+        assert len(list(pool.pull_statuses("user1", replies=True))) == 200
+        assert set(server.user_requests) == {"u0", "u1", "u2"}
+
+        server.throttled_users.add("u1")
+        assert len(list(pool.pull_statuses("user0", replies=True))) == 200
+        status = {s["account"]: s for s in pool.status()}
+        assert status["u1"]["cooling_for"] > 0 and status["u0"]["cooling_for"] == 0
+        assert sum(s["requests"] for s in status.values()) == sum(server.user_requests.values()) + 1  # the 429 is not counted by the server
+        pool.quit()
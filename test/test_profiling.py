@@ -0,0 +1,32 @@
+import json
+
+from truthbrush.profiling import PhaseTimer
+
+
+def test_disabled_timer_records_nothing():
+    timer = PhaseTimer()
+    with timer.phase("sleep"):
+        pass
+    assert timer.totals == {}
+
+
+def test_summary_and_speedscope(tmp_path):
+    timer = PhaseTimer()
+    timer.enable()
+    with timer.phase("script_roundtrip"):
+        with timer.phase("json_decode"):
+            pass
+    with timer.phase("json_decode"):
+        pass
+
+    assert timer.totals["json_decode"][1] == 2
+    summary = timer.summary()
+    assert "script_roundtrip" in summary and "wall" in summary
+
+    path = tmp_path / "run.speedscope.json"
+    timer.write_speedscope(str(path))
+    document = json.loads(path.read_text())
+    frames = [f["name"] for f in document["shared"]["frames"]]
+    events = document["profiles"][0]["events"]
+    assert sorted(frames) == ["json_decode", "script_roundtrip"]
+    assert [e["type"] for e in events] == ["O", "O", "C", "C", "O", "C"]
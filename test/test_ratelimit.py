@@ -0,0 +1,23 @@
+import threading
+import time
+
+import pytest
+
+from truthbrush.ratelimit import RateLimiter
+
+
+def test_rate_is_shared_across_threads():
+    limiter = RateLimiter(rate=50, burst=5)
+    started = time.monotonic()
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(5)]) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 15 requests: 5 from the burst, the other 10 at 50/s.
+    assert time.monotonic() - started >= 10 / 50 * 0.9
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        RateLimiter(0)
@@ -0,0 +1,91 @@
+import threading
+import time
+
+from fake_server import FakeDataset, FakeTruthSocial
+from truthbrush.api import Api
+from truthbrush.metrics import RETRIES
+from truthbrush.retry import ApiError, CircuitBreaker, RetryPolicy
+
+
+def test_backoff_is_jittered_capped_and_honours_retry_after():
+    policy = RetryPolicy(base=1.0, cap=5.0, endpoints={"/v2/search": 2})
+    delays = [policy.delay(retry) for retry in range(8) for _ in range(20)]
+    assert 0 <= min(delays) and max(delays) <= 5.0 and len(set(delays)) > 1
+    assert policy.delay(0, retry_after=3) == 3
+    assert policy.attempts_for("/v2/search") == 2 and policy.attempts_for("/v1/accounts/1/statuses") == 4
+
+
+def test_transient_errors_are_retried_and_401_logs_in_again():
+    dataset = FakeDataset(num_accounts=2, posts_per_account=45, likers_per_post=1, comments_per_post=0)
+    with FakeTruthSocial(dataset) as server:
+        api = Api(username="u", password="p", base_url=server.url, transport="http", page_delay=None, retry_policy=RetryPolicy(base=0.01))
+        retried = RETRIES.value(endpoint="/v1/accounts/lookup", status="502")
+        server.errors += [502, 502]
+        server.expire_token()
+        assert len(list(api.pull_statuses("user1", replies=True))) == 45
+        assert server.logins == 2
+        assert RETRIES.value(endpoint="/v1/accounts/lookup", status="502") == retried + 2
+
+        server.errors += [404, 503, 503]
+        error = api.lookup("user1")
+        assert isinstance(error, ApiError) and error.status == 404 and not error.retryable and error["attempts"] == 1
+        api.retry_policy = RetryPolicy(attempts=2, base=0.01)
+        error = api.lookup("user1")
+        assert error["status"] == 503 and error["attempts"] == 2
+        api.quit()
+
+
+def test_circuit_breaker_opens_on_a_spike_and_probes():
+    breaker = CircuitBreaker(threshold=3, window=10, cooldown=0.05)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == "closed"
+    breaker.record(False)
+    assert breaker.state == "open"
+    started = time.monotonic()
+    breaker.wait()
+    assert time.monotonic() - started >= 0.04 and breaker.state == "half_open"
+    breaker.record(False)  # the probe failed: open again, for longer
+    assert breaker.state == "open" and breaker._next_cooldown == 0.2
+    breaker.wait()
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record(False)
+    passed, outcome = [], threading.Event()
+
+    def request():
+        breaker.wait()
+        passed.append(threading.get_ident())
+        if len(passed) == 1:  # the probe reports once the test has checked the others wait
+            outcome.wait(timeout=5)
+            breaker.record(True)
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    assert len(passed) == 1 and breaker.state == "half_open"
+    outcome.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert len(passed) == 5 and breaker.state == "closed"
+
+
+def test_a_probe_that_logs_in_again_does_not_wait_on_itself():
+    dataset = FakeDataset(num_accounts=2, posts_per_account=1, likers_per_post=1, comments_per_post=0)
+    with FakeTruthSocial(dataset) as server:
+        breaker = CircuitBreaker(threshold=1, cooldown=0.2, probe_timeout=5)
+        api = Api(username="u", password="p", base_url=server.url, transport="http", page_delay=None, circuit_breaker=breaker)
+        assert api.lookup("user1")["acct"] == "user1"
+        breaker.record(False)
+        server.expire_token()  # the probe gets a 401 and replays after logging in
+        started = time.monotonic()
+        assert api.lookup("user1")["acct"] == "user1"
+        assert time.monotonic() - started < 2 and breaker.state == "closed"
+        assert server.logins == 2
+        api.quit()
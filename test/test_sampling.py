@@ -0,0 +1,30 @@
+import random
+from collections import Counter
+
+from truthbrush.sampling import reservoir_sample, sample_id_range
+
+
+def test_reservoir_sample_is_uniform():
+    rng = random.Random(1)
+    counts = Counter()
+    for _ in range(2000):
+        counts.update(reservoir_sample(iter(range(10)), 3, rng))
+    assert set(counts) == set(range(10))
+    assert max(counts.values()) < 1.2 * min(counts.values())
+
+
+def test_reservoir_sample_short_stream():
+    assert sorted(reservoir_sample(range(2), 5)) == [0, 1]
+
+
+def test_sample_id_range_skips_empty_time():
+    ids = list(range(100, 200)) + list(range(900, 1000))  # with a long gap between
+
+    def fetch_below(cursor):
+        return [{"id": i} for i in reversed(ids) if i < cursor][:10]
+
+    calls = []
+    items = list(sample_id_range(lambda c: calls.append(c) or fetch_below(c), 99, 1000, 8, random.Random(0)))
+    assert len(calls) <= 8
+    assert items and len({i["id"] for i in items}) == len(items)
+    assert {i["id"] // 100 for i in items} == {1, 9}
@@ -0,0 +1,30 @@
+import time
+
+from fake_server import FakeDataset, FakeTruthSocial
+from truthbrush.api import Api
+from truthbrush.snapshots import SnapshotCollector, SnapshotStore, diff
+
+
+def test_diff_reports_entered_left_and_moved():
+    events = diff([("a", {}), ("b", {}), ("c", {})], [("b", {}), ("a", {}), ("d", {"id": "d"})])
+    assert {(e["kind"], e["key"]) for e in events} == {("left", "c"), ("moved", "b"), ("moved", "a"), ("entered", "d")}
+    assert diff([("a", {})], [("a", {})]) == []
+
+
+def test_collector_stores_only_changes(tmp_path):
+    dataset = FakeDataset(num_accounts=12, posts_per_account=3, likers_per_post=1, comments_per_post=0)
+    with FakeTruthSocial(dataset) as server, SnapshotStore(str(tmp_path / "snapshots.db")) as store:
+        api = Api(username="u", password="p", base_url=server.url, transport="http", page_delay=None)
+        collector = SnapshotCollector(api, store, endpoints=["trending", "trending_groups", "suggestions"])
+        first = collector.poll_all()
+        assert first["trending_groups"] == 3 and first["trending"] > 0
+        before = time.time()
+        original = [g["id"] for g in api.trending_groups()]
+
+        assert collector.poll_all() == {"trending": 0, "trending_groups": 0, "suggestions": 0}  # all 304s
+        dataset.groups.insert(0, dataset.groups.pop(3))  # a new group enters at the top
+        assert collector.poll("trending_groups") == 4  # entered, left, and two moved down
+
+        assert [g["id"] for g in store.replay("trending_groups")] == [g["id"] for g in api.trending_groups()]
+        assert [g["id"] for g in store.replay("trending_groups", at=before)] == original
+        api.quit()
@@ -1,113 +1,454 @@
-from time import sleep
+import time
 from typing import Any, Iterator, List, Optional
 from loguru import logger
 from dateutil import parser as date_parse
-from datetime import datetime, timezone
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from datetime import datetime, timedelta, timezone
 import json
-import logging
 import os
 from dotenv import load_dotenv, find_dotenv
 import random
-
-load_dotenv(find_dotenv())
-
-logging.basicConfig(level=logging.INFO)
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlencode
+from . import jsonio
+from .metrics import QUEUE_DEPTH, RETRIES, endpoint_label, record_page, record_request, timed_sleep
+from .profiling import phase
+from .retry import ApiError, CircuitBreaker, RetryPolicy
+from .sampling import reservoir_sample, sample_id_range
 
 BASE_URL = "https://truthsocial.com"
+STATUSES_PAGE_SIZE = 20  # statuses per page of an account timeline
 API_BASE_URL = "https://truthsocial.com/api"
 
-TRUTHSOCIAL_USERNAME = os.getenv("TRUTHSOCIAL_USERNAME")
-TRUTHSOCIAL_PASSWORD = os.getenv("TRUTHSOCIAL_PASSWORD")
+# Public OAuth client credentials of the Truth Social web app, used by the HTTP transport.
+CLIENT_ID = "9X1Fdd-pxNsAgEDNi_SfhJWi8T-vLuV2WVzKIbkTCw4"
+CLIENT_SECRET = "ozF8jzI4968oTKFkEnsBC-UbLPCdrSv0MkXGQu2o_-M"
+
+def credentials_from_env():
+    """Read ``TRUTHSOCIAL_USERNAME``/``TRUTHSOCIAL_PASSWORD``, loading a ``.env`` file first if there is one."""
+    load_dotenv(find_dotenv(usecwd=True))
+    return os.getenv("TRUTHSOCIAL_USERNAME"), os.getenv("TRUTHSOCIAL_PASSWORD")
 
 class LoginErrorException(Exception):
     pass
 
+# Returned by ``Api.conditional_get`` when the server answers 304 Not Modified.
+NOT_MODIFIED = object()
+
+def _aware(moment: datetime) -> datetime:
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def snowflake_id(moment: datetime) -> int:
+    """The smallest status ID that can be created at ``moment``: milliseconds since the epoch shifted left by 16 bits."""
+    return int(_aware(moment).timestamp() * 1000) << 16
+
+# Truth Social opened for sign-ups in 2021, so no account ID is older than this.
+ACCOUNT_ID_FLOOR = int(datetime(2021, 1, 1, tzinfo=timezone.utc).timestamp() * 1000) << 16
+
+def snowflake_time(status_id) -> datetime:
+    """When a status with this ID was created, to the millisecond."""
+    return datetime.fromtimestamp((int(status_id) >> 16) / 1000, tz=timezone.utc)
+
+def _thread_session(local: threading.local):
+    """The calling thread's HTTP session, stored on ``local``; curl_cffi sessions are not thread-safe."""
+    session = getattr(local, "session", None)
+    if session is None:
+        from curl_cffi import requests as curl_requests
+
+        session = local.session = curl_requests.Session(impersonate="chrome")
+    return session
+
+
+def _tap(items, callback):
+    """
+    Yield ``items``, calling ``callback(item)`` on each first, and return what
+    their generator returned: a paginator's ``ApiError`` if it stopped early.
+    """
+    items = iter(items)
+    while True:
+        try:
+            item = next(items)
+        except StopIteration as stop:
+            return stop.value
+        callback(item)
+        yield item
+
+
+def _collect(items) -> tuple:
+    """Exhaust a paginator: ``(items, error)``, where ``error`` is the ``ApiError`` it stopped on, or ``None``."""
+    collected = []
+    items = iter(items)
+    while True:
+        try:
+            collected.append(next(items))
+        except StopIteration as stop:
+            return collected, stop.value
+
+
+def _field_tree(fields, prefix: str = None) -> dict:
+    """Turn dotted paths such as ``["id", "account.acct"]`` into ``{"id": {}, "account": {"acct": {}}}``."""
+    tree = {}
+    for field in fields:
+        node = tree
+        for part in ((prefix + "." + field) if prefix else field).split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+def project_fields(value, tree: dict):
+    """
+    Keep only the paths in ``tree`` (see ``_field_tree``). Lists are projected
+    element-wise and a leaf keeps the whole value below it. Mirrors the
+    projection the browser transport runs inside the page.
+    """
+    if isinstance(value, list):
+        return [project_fields(v, tree) for v in value]
+    if not isinstance(value, dict):
+        return value
+    return {k: (project_fields(value[k], sub) if sub else value[k]) for k, sub in tree.items() if k in value}
+
+# Same as ``project_fields``, run in the page so unwanted fields never cross the WebDriver channel.
+_PROJECT_JS = """
+function project(v, t) {
+    if (Array.isArray(v)) return v.map(x => project(x, t));
+    if (v === null || typeof v !== "object") return v;
+    var o = {};
+    for (var k in t) {
+        if (k in v) o[k] = Object.keys(t[k]).length ? project(v[k], t[k]) : v[k];
+    }
+    return o;
+}
+"""
+
 class Api:
     """
     A refactored API client that logs in only once and reuses the session.
+
+    ``transport="browser"`` (the default) logs in through a real Chrome window
+    and issues every request from inside the page. ``transport="http"`` talks
+    to the API directly over HTTP with a password-grant OAuth token; it needs
+    no browser and is what the local fake server used by the benchmarks speaks.
+    The browser stack (selenium, undetected_chromedriver) is only imported
+    when the browser transport is used.
+
+    Credentials default to the ``TRUTHSOCIAL_USERNAME``/``TRUTHSOCIAL_PASSWORD``
+    environment variables or a ``.env`` file. Pass a ``RateLimiter`` to cap
+    the request rate; one limiter can be shared by several sessions. Failed
+    requests are retried as ``retry_policy`` allows, and ``circuit_breaker``
+    pauses the session when failures spike (see ``truthbrush.retry``).
+
+    Paginators (``search``, ``pull_statuses``, ``pull_comments``,
+    ``user_likes``, ``groupposts``) stop at the first request that still
+    fails and then return its ``ApiError``, which ``error = yield from ...``
+    or ``_tap`` picks up; they return ``None`` when they reached the end.
     """
-    def __init__(self, username=TRUTHSOCIAL_USERNAME, password=TRUTHSOCIAL_PASSWORD):
+    def __init__(self, username=None, password=None, base_url: str = BASE_URL, transport: str = "browser", page_delay=(1.0, 2.0), rate_limiter=None, page_cache=None, retry_policy: RetryPolicy = None, circuit_breaker: CircuitBreaker = None):
+        if username is None or password is None:
+            env_username, env_password = credentials_from_env()
+            username = username if username is not None else env_username
+            password = password if password is not None else env_password
         self.__username = username
         self.__password = password
         self.auth_id = None
         self.driver = None
+        self.base_url = base_url.rstrip("/")
+        self.api_base_url = self.base_url + "/api"
+        self.transport = transport
+        self.page_delay = page_delay
+        self.rate_limiter = rate_limiter
+        self.page_cache = page_cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(name=username or "session")
+        self._http = threading.local()
+        self._login_lock = threading.Lock()
+        self._browser_lock = threading.Lock()  # one script at a time: the driver is not thread-safe
         
+        if transport not in ("browser", "http"):
+            raise ValueError(f"Unknown transport '{transport}'. Expected 'browser' or 'http'.")
         if not self.__username:
             raise LoginErrorException("Username is missing. Please check your .env file.")
         if not self.__password:
             raise LoginErrorException("Password is missing. Please check your .env file.")
         
-        self._browser_login()
+        if transport == "browser":
+            self._browser_login()
+        else:
+            self._http_login()
 
     def _browser_login(self):
+        import undetected_chromedriver as uc
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
         logger.info("Launching browser for a single, persistent session...")
         options = uc.ChromeOptions()
         # options.headless = True 
-        self.driver = uc.Chrome(options=options)
+        with phase("browser_launch"):
+            self.driver = uc.Chrome(options=options)
         try:
-            self.driver.get(f"{BASE_URL}/login")
-            WebDriverWait(self.driver, 20).until(EC.element_to_be_clickable((By.XPATH, "//button[normalize-space()='Sign In']"))).click()
-            WebDriverWait(self.driver, 20).until(EC.presence_of_element_located((By.NAME, "username"))).send_keys(self.__username)
-            self.driver.find_element(By.NAME, "password").send_keys(self.__password)
-            self.driver.find_element(By.XPATH, "//button[@type='submit']").click()
-            WebDriverWait(self.driver, 20).until(EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'Home')]")))
-            logger.info("Login successful! Session is now active.")
-            token_data_str = self.driver.execute_script("return localStorage.getItem('truth:auth')")
-            token_data = json.loads(token_data_str)
-            self.auth_id = next(iter(token_data.get('tokens')))
-            logger.success(f"Successfully retrieved auth token: {self.auth_id[:10]}...")
+            with phase("login"):
+                self.driver.get(f"{self.base_url}/login")
+                WebDriverWait(self.driver, 20).until(EC.element_to_be_clickable((By.XPATH, "//button[normalize-space()='Sign In']"))).click()
+                WebDriverWait(self.driver, 20).until(EC.presence_of_element_located((By.NAME, "username"))).send_keys(self.__username)
+                self.driver.find_element(By.NAME, "password").send_keys(self.__password)
+                self.driver.find_element(By.XPATH, "//button[@type='submit']").click()
+                WebDriverWait(self.driver, 20).until(EC.presence_of_element_located((By.XPATH, "//*[contains(text(), 'Home')]")))
+                logger.info("Login successful! Session is now active.")
+                token_data_str = self.driver.execute_script("return localStorage.getItem('truth:auth')")
+                token_data = json.loads(token_data_str)
+                self.auth_id = next(iter(token_data.get('tokens')))
+                logger.success(f"Successfully retrieved auth token: {self.auth_id[:10]}...")
         except Exception as e:
             logger.error(f"An error occurred during automated login: {e}")
             self.quit()
             raise
 
+    def _http_session(self):
+        return _thread_session(self._http)
+
+    def _http_login(self):
+        logger.info(f"Logging in to {self.base_url} over HTTP...")
+        payload = {
+            "client_id": CLIENT_ID,
+            "client_secret": CLIENT_SECRET,
+            "grant_type": "password",
+            "username": self.__username,
+            "password": self.__password,
+            "redirect_uri": "urn:ietf:wg:oauth:2.0:oob",
+            "scope": "read",
+        }
+        with phase("login"):
+            try:
+                response = self._http_session().post(f"{self.base_url}/oauth/token", json=payload, timeout=30)
+            except Exception as e:
+                raise LoginErrorException(f"Could not reach {self.base_url}: {e}") from e
+        if response.status_code != 200:
+            raise LoginErrorException(f"Login failed with status {response.status_code}.")
+        self.auth_id = response.json().get("access_token")
+        if not self.auth_id:
+            raise LoginErrorException("Login response did not contain an access token.")
+        logger.success(f"Successfully retrieved auth token: {self.auth_id[:10]}...")
+
     def quit(self):
         """Safely closes the browser session."""
         if self.driver:
             self.driver.quit()
             logger.info("Browser session closed.")
+        session = getattr(self._http, "session", None)
+        if session is not None:
+            session.close()
+            self._http.session = None
 
-    def _get(self, url: str, params: dict = None) -> Any:
-        if not self.driver or not self.auth_id:
-            raise LoginErrorException("Session is not active. Please re-initialize the Api object.")
+    def _pause(self):
+        """Sleep between result pages, as configured by ``page_delay``."""
+        if self.page_delay:
+            timed_sleep(random.uniform(*self.page_delay))
 
-        full_url = API_BASE_URL + url
-        if params:
-            from urllib.parse import urlencode
-            full_url += '?' + urlencode(params)
-        
-        js_script = f"""
+    def _browser_fetch(self, full_url: str, tree: dict = None):
+        js_script = _PROJECT_JS + f"""
+        var tree = arguments[0];
         var callback = arguments[arguments.length - 1];
         fetch("{full_url}", {{ headers: {{ "Authorization": "Bearer {self.auth_id}" }} }})
         .then(response => {{
             if (!response.ok) {{
-                return callback({{error: `HTTP error! status: ${{response.status}}`}});
+                return {{error: `HTTP error! status: ${{response.status}}`, status: response.status}};
             }}
-            return response.json();
+            if (!tree) return response.text();
+            return response.json().then(data => JSON.stringify(project(data, tree)));
         }})
         .then(data => callback(data))
-        .catch(error => callback({{error: error.toString()}}));
+        .catch(error => callback({{error: error.toString(), status: "network"}}));
+        """
+        with self._browser_lock, phase("script_roundtrip"):
+            return self.driver.execute_async_script(js_script, tree)
+
+    def _http_fetch(self, full_url: str, etag: str = None):
+        headers = {"Authorization": f"Bearer {self.auth_id}"}
+        if etag:
+            headers["If-None-Match"] = etag
+        with phase("http_roundtrip"):
+            try:
+                response = self._http_session().get(full_url, headers=headers, timeout=60)
+            except Exception as e:
+                return {"error": str(e), "status": "network"}
+        self._http.etag = response.headers.get("ETag")
+        if response.status_code == 304 and etag:
+            return NOT_MODIFIED
+        if response.status_code != 200:
+            error = {"error": f"HTTP error! status: {response.status_code}", "status": response.status_code}
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                error["retry_after"] = float(retry_after)
+            return error
+        return response.text
+
+    def _get(self, url: str, params: dict = None, fields: dict = None, raw: bool = False, etag: str = None) -> Any:
+        """
+        GET an API path and decode the JSON response. ``fields`` is a tree from
+        ``_field_tree``; when given, only those paths of the response are kept,
+        inside the page for the browser transport. With ``raw``, a successful
+        response is returned as JSON text instead of being decoded; errors are
+        returned as ``ApiError`` dicts. With ``etag`` (http transport only),
+        the request is conditional and ``NOT_MODIFIED`` is returned on a 304.
+
+        Transient failures are retried as ``retry_policy`` allows, every
+        request waits while ``circuit_breaker`` is open, and a 401 logs in
+        again once and replays the request.
+        """
+        if not self.auth_id or (self.transport == "browser" and not self.driver):
+            raise LoginErrorException("Session is not active. Please re-initialize the Api object.")
+
+        full_url = self.api_base_url + url
+        if params:
+            full_url += '?' + urlencode(params)
+
+        attempts = self.retry_policy.attempts_for(url)
+        attempt, relogged = 0, False
+        while True:
+            attempt += 1
+            self.circuit_breaker.wait()
+            token = self.auth_id
+            result, status = self._request(url, full_url, fields, raw, etag)
+            if status == 401 and not relogged:
+                relogged = True
+                attempt -= 1  # the replay does not count as a retry
+                self.circuit_breaker.release()  # a probe would otherwise wait on itself to replay
+                self._relogin(token)
+                continue
+            error = ApiError.from_result(result, url) if status not in (200, 304) else None
+            self.circuit_breaker.record(error is None or not error.retryable)
+            if error is None:
+                return result
+            error["attempts"] = attempt
+            if not error.retryable or attempt >= attempts:
+                return error
+            delay = self.retry_policy.delay(attempt - 1, error.get("retry_after"))
+            RETRIES.inc(endpoint=endpoint_label(url), status=error.status)
+            logger.warning(f"{url} failed ({error['error']}); retry {attempt} of {attempts - 1} in {delay:.1f}s")
+            timed_sleep(delay, reason="retry")
+
+    def _request(self, url: str, full_url: str, fields: dict, raw: bool, etag: str):
+        """One attempt of ``_get``. Returns ``(result, status)``."""
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        started = time.perf_counter()
+        if self.transport == "browser":
+            result = self._browser_fetch(full_url, fields)
+        else:
+            result = self._http_fetch(full_url, etag)
+        if result is NOT_MODIFIED:
+            record_request(url, time.perf_counter() - started, 304)
+            return result, 304
+        project_here = fields and self.transport != "browser"
+        if raw and isinstance(result, str) and not project_here:
+            record_request(url, time.perf_counter() - started, 200)
+            return result, 200
+        if isinstance(result, str):
+            with phase("json_decode"):
+                result = json.loads(result) if result else None
+            if project_here:
+                result = project_fields(result, fields)
+        status = result.get("status", "error") if isinstance(result, dict) and "error" in result else 200
+        record_request(url, time.perf_counter() - started, status, None if raw else result)  # raw pages are counted by _items
+        if raw and status == 200:
+            return jsonio.dumps(result), status
+        return result, status
+
+    def _relogin(self, stale_token: str):
+        """Log in again after ``stale_token`` was rejected, unless another thread already has."""
+        with self._login_lock:
+            if self.auth_id != stale_token:
+                return
+            logger.warning("Access token was rejected; logging in again")
+            if self.transport == "browser":
+                with self._browser_lock:
+                    self.quit()
+                    self._browser_login()
+            else:
+                self._http_login()
+
+    def conditional_get(self, url: str, etag: str = None):
+        """
+        GET an API path unless it is unchanged since the response that
+        carried ``etag``. Returns ``(result, etag)``, where ``result`` is
+        ``NOT_MODIFIED`` after a 304. Only the http transport sends
+        conditional requests; the browser always fetches and returns no ETag.
+        """
+        if self.transport == "browser":
+            return self._get(url), None
+        result = self._get(url, etag=etag)
+        return result, getattr(self._http, "etag", None)
+
+    def _cached_get(self, url: str, params: dict = None, fields: dict = None):
+        """``_get`` through ``page_cache``. Returns ``(result, cached)``; only successful pages are stored."""
+        if self.page_cache is None:
+            return self._get(url, params, fields=fields), False
+        key = self.page_cache.key(self.api_base_url + url, params, fields)
+        body = self.page_cache.get(key)
+        if body is not None:
+            with phase("json_decode"):
+                return jsonio.loads(body), True
+        result = self._get(url, params, fields=fields, raw=True)
+        if not isinstance(result, str):
+            return result, False
+        self.page_cache.put(key, result)
+        with phase("json_decode"):
+            return jsonio.loads(result), False
+
+    @staticmethod
+    def _items(page, raw: bool, url: str) -> list:
         """
-        return self.driver.execute_async_script(js_script)
+        ``(item, output)`` pairs for a page of results from ``url``; in raw mode
+        ``output`` is the item's JSON text, and the page is counted here since
+        ``_request`` did not split it.
+        """
+        if raw:
+            with phase("json_decode"):
+                items = list(jsonio.iter_array(page))
+            record_page(url, len(items))
+            return items
+        return [(item, item) for item in page]
+
+    def search(self, searchtype: str, query: str, limit: int, created_after: datetime = None, created_before: datetime = None, resolve: bool = False, include_comments: bool = False, comment_limit: int = 50, fields: List[str] = None, max_items: Optional[int] = 1000, offset: int = 0, **kwargs):
+        """
+        Search for ``searchtype`` results matching ``query``, stopping after
+        ``max_items`` results (``None`` for no cap).
+
+        Results are yielded in the server's order, starting ``offset`` results
+        in, so a search stopped after ``n`` results continues from
+        ``offset + n`` (exactly so when no date range is given). Pages come from ``page_cache`` when the Api has one.
+
+        Status searches pass the date range to the server as snowflake
+        ``min_id``/``max_id`` bounds, and results outside it are also dropped
+        here. Results come back in relevance order, so an old result does not
+        mean the rest are older too; see ``search_windows`` to pull large date
+        ranges completely.
 
-    def search(self, searchtype: str, query: str, limit: int, created_after: datetime = None, created_before: datetime = None, resolve: bool = False, include_comments: bool = False, comment_limit: int = 50, **kwargs):
-        params = dict(q=query, limit=limit, type=searchtype, offset=0, resolve=resolve)
-        MAX_ITEMS = 1000
+        ``fields`` (dotted paths such as ``["id", "content", "account.acct"]``)
+        limits each result to those fields; ``id`` and ``created_at`` are
+        always kept because paging and date filtering need them.
+        """
+        params = dict(q=query, limit=limit, type=searchtype, offset=offset, resolve=resolve)
+        if searchtype == "statuses":
+            if created_after:
+                params["min_id"] = snowflake_id(created_after) - 1
+            if created_before:
+                params["max_id"] = snowflake_id(created_before + timedelta(milliseconds=1))
+        tree = _field_tree(list(fields) + ["id", "created_at"], prefix=searchtype) if fields else None
         total_fetched = 0
         
         logger.info(f"Starting search for '{query}' with type '{searchtype}'...")
 
-        while total_fetched < MAX_ITEMS:
-            page = self._get("/v2/search", params)
+        while max_items is None or total_fetched < max_items:
+            page, cached = self._cached_get("/v2/search", params, fields=tree)
             
             logger.debug(f"API response for search page: {page}")
 
-            if not page or (isinstance(page, dict) and 'error' in page):
-                logger.error(f"Received an error or empty page from API: {page}")
+            if isinstance(page, dict) and 'error' in page:
+                logger.error(f"Stopped searching for '{query}': {page['error']}")
+                return page
+            if not page:
+                logger.error(f"Received an empty page from API: {page}")
                 break
             
             if not isinstance(page.get(searchtype), list) or not page.get(searchtype):
@@ -117,15 +458,13 @@ class Api:
                     logger.info("Search finished as no more results were found.")
                 break
             
-            items = sorted(page[searchtype], key=lambda p: p.get("created_at", ""), reverse=True)
+            items = page[searchtype]
             
             for item in items:
-                if 'created_at' in item: 
-                    post_at = date_parse.parse(item["created_at"]).replace(tzinfo=timezone.utc)
-                    if created_after and post_at < created_after:
-                        total_fetched = MAX_ITEMS
-                        break
-                    if created_before and post_at > created_before:
+                if 'created_at' in item and (created_after or created_before):
+                    with phase("date_filter"):
+                        post_at = date_parse.parse(item["created_at"]).replace(tzinfo=timezone.utc)
+                    if (created_after and post_at < created_after) or (created_before and post_at > created_before):
                         continue
                 
                 if searchtype == 'statuses' and include_comments:
@@ -137,37 +476,159 @@ class Api:
 
                 yield item
                 total_fetched += 1
-                if total_fetched >= MAX_ITEMS: break
-            
-            if total_fetched >= MAX_ITEMS:
-                logger.warning(f"Reached search limit of {MAX_ITEMS}. Stopping.")
-                break
+                if max_items is not None and total_fetched >= max_items:
+                    logger.warning(f"Reached search limit of {max_items}. Stopping.")
+                    return
 
             params['offset'] += len(items)
-            sleep(random.uniform(1.0, 2.0))
+            if not cached:
+                self._pause()
+
+    def search_windows(self, query: str, created_after: datetime, created_before: datetime = None, limit: int = 40, windows: int = 8, workers: int = 4, window_cap: int = 1000, min_window: timedelta = timedelta(minutes=1), **kwargs) -> Iterator[dict]:
+        """
+        Pull every status matching ``query`` between two dates.
 
-    def pull_statuses(self, username: str, replies: bool, created_after: datetime = None, created_before: datetime = None, pinned: bool = False):
+        The range is split into ``windows`` equal date windows that are
+        searched concurrently on ``workers`` threads. A window that still hits
+        ``window_cap`` results is split in half and searched again (down to
+        ``min_window``), so a large topic is not cut off at the per-search
+        cap. Statuses are yielded as each window completes, without
+        duplicates and in no particular order. Other keyword arguments go to
+        ``search``. A window whose search fails is logged and the others still
+        run; the first such ``ApiError`` is returned once they are done.
+        """
+        created_after = _aware(created_after)
+        created_before = _aware(created_before) if created_before else datetime.now(timezone.utc)
+        span = (created_before - created_after) / max(1, windows)
+        seen = set()
+        failed = None
+
+        def run(window):
+            return _collect(self.search("statuses", query, limit, created_after=window[0], created_before=window[1], max_items=window_cap, **kwargs))
+
+        executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="truthbrush-search")
+        try:
+            futures = {}
+            for i in range(max(1, windows)):
+                window = (created_after + span * i, created_after + span * (i + 1))
+                futures[executor.submit(run, window)] = window
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, end = futures.pop(future)
+                    items, error = future.result()
+                    QUEUE_DEPTH.set(len(futures), queue="search_windows")
+                    if error:
+                        logger.error(f"Window {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M} is incomplete after {len(items)} results: {error.get('error')}")
+                        failed = failed or error
+                    elif len(items) >= window_cap and end - start > min_window:
+                        middle = start + (end - start) / 2
+                        logger.info(f"Window {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M} hit the cap of {window_cap}; splitting it")
+                        for half in ((start, middle), (middle, end)):
+                            futures[executor.submit(run, half)] = half
+                    elif len(items) >= window_cap:
+                        logger.warning(f"Window {start} to {end} is still capped at {window_cap} results; some may be missing")
+                    for item in items:
+                        if item.get("id") not in seen:  # adjacent windows share their boundary instant
+                            seen.add(item.get("id"))
+                            yield item
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return failed
+
+    def pull_statuses(self, username: str, replies: bool, created_after: datetime = None, created_before: datetime = None, pinned: bool = False, fields: List[str] = None, raw: bool = False, max_id: str = None, since_id: str = None, max_pages: int = None):
+        """
+        Pull a user's statuses, newest first. ``fields`` limits each status to
+        those dotted paths (``id`` and ``created_at`` are always kept). With
+        ``raw``, statuses are yielded as JSON text as the server sent them.
+        ``max_id`` and ``since_id`` bound the status IDs pulled (both
+        exclusive) and ``max_pages`` caps the number of pages fetched.
+        """
+        tree = _field_tree(list(fields) + ["id", "created_at"]) if fields else None
         lookup_result = self.lookup(username)
-        if not lookup_result or "id" not in lookup_result: return
-        user_id = lookup_result["id"]
+        if not lookup_result or "id" not in lookup_result:
+            if isinstance(lookup_result, dict) and "error" in lookup_result:
+                return lookup_result
+            return ApiError(f"Could not look up {username}", "lookup", "/v1/accounts/lookup")
+        return (yield from self._account_statuses(lookup_result["id"], replies, created_after, created_before, pinned, tree, raw, max_id, since_id, max_pages))
+
+    def _account_statuses(self, user_id: str, replies: bool, created_after: datetime = None, created_before: datetime = None, pinned: bool = False, tree: dict = None, raw: bool = False, max_id: str = None, since_id: str = None, max_pages: int = None, min_id: str = None):
+        """Page down a timeline by account ID. ``min_id`` asks for the page just above it instead, so use it with ``max_pages=1``."""
         params = {}
+        if min_id: params['min_id'] = min_id
         if not replies: params['exclude_replies'] = 'true'
         if pinned: params['pinned'] = 'true'
-        max_id = None
+        if since_id: params['since_id'] = since_id
+        pages = 0
         while True:
             if max_id: params['max_id'] = max_id
-            result = self._get(f"/v1/accounts/{user_id}/statuses", params=params)
-            if not result or (isinstance(result, dict) and 'error' in result): break
-            posts = sorted(result, key=lambda k: k.get("created_at", ""), reverse=True)
+            url = f"/v1/accounts/{user_id}/statuses"
+            result = self._get(url, params=params, fields=tree, raw=raw)
+            pages += 1
+            if isinstance(result, dict) and 'error' in result:
+                logger.error(f"Stopped paging the timeline of account {user_id}: {result['error']}")
+                return result
+            if not result: break
+            posts = sorted(self._items(result, raw, url), key=lambda k: k[0].get("created_at", ""), reverse=True)
             if not posts: break
-            max_id = posts[-1]["id"]
-            for post in posts:
-                post_at = date_parse.parse(post["created_at"]).replace(tzinfo=timezone.utc)
-                if created_after and post_at < created_after: return
-                if created_before and post_at > created_before: continue
-                yield post
-            if pinned: break
-            sleep(random.uniform(1.0, 2.0))
+            max_id = posts[-1][0]["id"]
+            for post, output in posts:
+                if created_after or created_before:
+                    with phase("date_filter"):
+                        post_at = date_parse.parse(post["created_at"]).replace(tzinfo=timezone.utc)
+                    if created_after and post_at < created_after: return
+                    if created_before and post_at > created_before: continue
+                yield output
+            if pinned or (max_pages is not None and pages >= max_pages): break
+            self._pause()
+
+    def timeline_span(self, username: str, replies: bool = True) -> Optional[List[int]]:
+        """
+        ``[low, high]`` such that every status of the user has ``low < id <= high``,
+        or ``None`` if the user doesn't exist. Costs a lookup and one page.
+        """
+        account = self.lookup(username)
+        if not account or "id" not in account:
+            return None
+        return list(self._timeline_span(account, replies))
+
+    def _timeline_span(self, account: dict, replies: bool):
+        low = snowflake_id(date_parse.parse(account["created_at"])) if account.get("created_at") else ACCOUNT_ID_FLOOR
+        last = date_parse.parse(account["last_status_at"]) + timedelta(days=1) if account.get("last_status_at") else datetime.now(timezone.utc)
+        high = snowflake_id(min(_aware(last), datetime.now(timezone.utc)))
+        # Many accounts sat idle long after sign-up; start the range at their oldest status.
+        oldest = list(self._account_statuses(account["id"], replies, tree=_field_tree(["id"]), min_id=low, max_pages=1))
+        if oldest:
+            low = min(int(post["id"]) for post in oldest) - 1
+        return low, high
+
+    def sample_statuses(self, username: str, k: int, replies: bool = True, max_pages: int = 10, fields: List[str] = None, rng: random.Random = None) -> List[dict]:
+        """
+        A random sample of ``k`` of a user's statuses, in random order,
+        fetching at most ``max_pages`` pages whatever the account's size.
+
+        When the whole timeline fits in ``max_pages`` pages it is pulled and
+        sampled uniformly. Otherwise one page locates the oldest status, the
+        span from there to the last one is cut into ``max_pages - 1`` ID
+        ranges, and one page is read from a random point in each (see
+        ``sample_id_range``). The sample is then spread evenly over time
+        rather than over the timeline, so bursts of posting are
+        under-represented.
+        """
+        tree = _field_tree(list(fields) + ["id", "created_at"]) if fields else None
+        account = self.lookup(username)
+        if not account or "id" not in account:
+            return []
+        if (account.get("statuses_count") or 0) <= max_pages * STATUSES_PAGE_SIZE:
+            return reservoir_sample(self._account_statuses(account["id"], replies, tree=tree, max_pages=max_pages), k, rng)
+
+        low, high = self._timeline_span(account, replies)
+
+        def page_below(cursor):
+            self._pause()
+            return list(self._account_statuses(account["id"], replies, tree=tree, max_id=cursor, max_pages=1))
+
+        return reservoir_sample(sample_id_range(page_below, low, high, max_pages - 1, rng), k, rng)
 
     def lookup(self, user_handle: str = None):
         return self._get("/v1/accounts/lookup", params=dict(acct=user_handle))
@@ -182,9 +643,12 @@ class Api:
         onlyfirst: bool = False,
         top_num: int = 40,
         sort: str = "oldest",
+        fields: List[str] = None,
+        raw: bool = False,
     ):
-        """Pull comments for a given post."""
+        """Pull comments for a given post, optionally limited to ``fields`` or as raw JSON text."""
         
+        tree = _field_tree(list(fields) + ["id", "in_reply_to_id"]) if fields else None
         max_id = None
         params = {"sort": sort}
         total_fetched = 0
@@ -193,25 +657,31 @@ class Api:
             if max_id:
                 params['max_id'] = max_id
 
-            comments = self._get(f"/v1/statuses/{post}/context/descendants", params=params)
+            url = f"/v1/statuses/{post}/context/descendants"
+            comments = self._get(url, params=params, fields=tree, raw=raw)
 
-            if not comments or (isinstance(comments, dict) and 'error' in comments):
+            if isinstance(comments, dict) and 'error' in comments:
+                logger.error(f"Stopped paging the comments of post {post}: {comments['error']}")
+                return comments
+
+            if not comments:
                 if total_fetched == 0:
                     logger.warning(f"Could not find comments for post {post}, or the post has no comments.")
                 break
 
-            if not isinstance(comments, list):
+            if not isinstance(comments, (list, str)):
                 logger.error(f"Unexpected API response for comments: {comments}")
                 break
-                
+
+            comments = self._items(comments, raw, url)
             if onlyfirst:
-                comments = [comment for comment in comments if comment.get("in_reply_to_id") == post]
+                comments = [(comment, output) for comment, output in comments if comment.get("in_reply_to_id") == post]
 
             if not comments:
                 break
 
-            for comment in comments:
-                yield comment
+            for comment, output in comments:
+                yield output
                 total_fetched += 1
                 if not includeall and total_fetched >= top_num:
                     return
@@ -219,11 +689,11 @@ class Api:
             if not includeall and total_fetched >= top_num:
                 return
 
-            max_id = comments[-1].get("id")
+            max_id = comments[-1][0].get("id")
             if not max_id:
                 break
 
-            sleep(random.uniform(1.0, 2.0))
+            self._pause()
     
     def suggestions(self):
         return self._get("/v2/suggestions")
@@ -231,39 +701,98 @@ class Api:
     def ads(self):
         return self._get("/v3/truth/ads")
         
-    def user_likes(self, post_id: str, limit: int = 40):
-        max_id = None
-        while True:
+    def user_likes(self, post_id: str, limit: int = 40, fields: List[str] = None, raw: bool = False, max_items: Optional[int] = None, sample_pages: int = 0):
+        """
+        Pull the accounts that liked a post, optionally limited to ``fields``
+        (``id`` is always kept) or as raw JSON text.
+
+        ``limit`` is the page size; ``max_items`` caps the total. With
+        ``sample_pages``, the whole list is not paged through: after the
+        first page, at most that many more pages are read from random points
+        of the list, so a post with 100k likes costs a handful of requests.
+        Pages are located by account ID, so sampled likers are spread over
+        account age rather than over the list itself.
+        """
+        tree = _field_tree(list(fields) + ["id"]) if fields else None
+        seen = set()
+        errors = []
+
+        def page(max_id=None):
             params = {"limit": limit}
             if max_id:
                 params['max_id'] = max_id
-            
-            likers = self._get(f"/v1/statuses/{post_id}/favourited_by", params=params)
-            if not likers or (isinstance(likers, dict) and 'error' in likers): break
-            
-            for liker in likers:
-                yield liker
-            
-            if len(likers) < limit: break
-            max_id = likers[-1]['id']
-            sleep(random.uniform(1.0, 2.0))
+            url = f"/v1/statuses/{post_id}/favourited_by"
+            likers = self._get(url, params=params, fields=tree, raw=raw)
+            if isinstance(likers, dict) and 'error' in likers:
+                logger.error(f"Stopped paging the likers of post {post_id}: {likers['error']}")
+                errors.append(likers)
+                return None
+            if likers is None:
+                return None
+            return self._items(likers, raw, url)
 
-    def groupposts(self, group_id: str, limit: int = 40):
+        def sample(high):
+            pages, low = [], ACCOUNT_ID_FLOOR
+            for _ in range(2 * sample_pages):
+                if len(pages) >= sample_pages or low >= high:
+                    break
+                self._pause()
+                cursor = random.randint(low + 1, high)
+                likers = page(cursor)
+                if likers is None:
+                    break
+                if likers:
+                    pages.append(likers)
+                else:
+                    low = cursor  # every remaining liker is newer than the cursor
+            return pages
+
+        likers = page()
+        while likers:
+            pages = [likers]
+            if sample_pages and len(likers) == limit and (max_items is None or max_items > limit):
+                pages += sample(int(likers[-1][0]['id']))
+            for liker, output in (item for items in pages for item in items):
+                if liker['id'] in seen:
+                    continue
+                seen.add(liker['id'])
+                yield output
+                if max_items is not None and len(seen) >= max_items:
+                    return
+            if sample_pages or len(likers) < limit: break
+            self._pause()
+            likers = page(likers[-1][0]['id'])
+        return errors[0] if errors else None
+
+    def groupposts(self, group_id: str, limit: int = 40, fields: List[str] = None, raw: bool = False, since_id: str = None):
+        """
+        Pull posts from a group's timeline, newest first, optionally limited
+        to ``fields`` (``id`` is always kept) or as raw JSON text. With
+        ``since_id``, only posts newer than it are pulled.
+        """
+        tree = _field_tree(list(fields) + ["id"]) if fields else None
         max_id = None
         while True:
             params = {"limit": limit}
             if max_id:
                 params['max_id'] = max_id
+            if since_id:
+                params['since_id'] = since_id
             
-            posts = self._get(f"/v1/timelines/group/{group_id}", params=params)
+            url = f"/v1/timelines/group/{group_id}"
+            posts = self._get(url, params=params, fields=tree, raw=raw)
+            if isinstance(posts, dict) and 'error' in posts:
+                logger.error(f"Stopped paging group {group_id}: {posts['error']}")
+                return posts
             if not posts: break
+            posts = self._items(posts, raw, url)
             
-            for post in posts:
-                yield post
+            for post, output in posts:
+                yield output
             
             if len(posts) < limit: break
-            max_id = posts[-1]['id']
-            sleep(random.uniform(1.0, 2.0))
+            max_id = posts[-1][0]['id']
+            self._pause()
             
     def trending_truths(self):
         return self._get("/v1/truth/trending/truths")
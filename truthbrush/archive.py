@@ -0,0 +1,332 @@
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional
+
+from loguru import logger
+
+from . import jsonio
+from .api import _field_tree, _tap, project_fields
+from .ingest import read_jsonl
+
+DEFAULT_ARCHIVE = os.getenv("TRUTHBRUSH_ARCHIVE") or os.path.join(os.path.expanduser("~"), ".truthbrush", "archive.db")
+
+_TAG = re.compile(r"<[^>]+>")
+_HASHTAG = re.compile(r"#(\w+)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statuses (
+    id INTEGER PRIMARY KEY,
+    account_id TEXT,
+    acct TEXT COLLATE NOCASE,
+    created_at TEXT,
+    in_reply_to_id TEXT,
+    json TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS statuses_acct ON statuses (acct, id);
+CREATE INDEX IF NOT EXISTS statuses_created_at ON statuses (created_at);
+CREATE TABLE IF NOT EXISTS status_tags (
+    tag TEXT COLLATE NOCASE NOT NULL,
+    status_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, status_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS statuses_fts USING fts5(text, tokenize = 'unicode61 remove_diacritics 2');
+CREATE TABLE IF NOT EXISTS crawls (
+    key TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    covers_from TEXT
+);
+CREATE TABLE IF NOT EXISTS search_hits (
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status_id INTEGER NOT NULL,
+    PRIMARY KEY (key, position)
+) WITHOUT ROWID;
+"""
+
+
+def status_text(status: dict) -> str:
+    """Plain text of a status: its HTML content with tags stripped and entities decoded."""
+    content = status.get("content") or status.get("text") or ""
+    return html.unescape(_TAG.sub(" ", content)).strip()
+
+
+def _hashtags(status: dict, text: str) -> set:
+    tags = {t["name"].lower() for t in status.get("tags") or [] if isinstance(t, dict) and t.get("name")}
+    return tags | {t.lower() for t in _HASHTAG.findall(text)}
+
+
+def _iso(moment: Optional[datetime]) -> Optional[str]:
+    """Format a bound like Truth Social's ``created_at`` (``2025-08-01T12:00:00.000Z``) so the strings compare in time order."""
+    if moment is None:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%f")[:23] + "Z"
+
+
+def _statuses_in(value):
+    """Ingest transform: the dicts on one line, which may hold a single item or a JSON array of them."""
+    items = [item for item in (value if isinstance(value, list) else [value]) if isinstance(item, dict)]
+    return items or None
+
+
+def iter_jsonl(path: str, workers: int = None) -> Iterator[dict]:
+    """
+    Yield the statuses in a crawl output file, parsed in parallel. Handles
+    UTF-16 files from PowerShell redirection and lines holding a JSON array.
+    """
+    for items in read_jsonl(path, workers=workers, transform=_statuses_in):
+        yield from items
+
+
+class Archive:
+    """
+    Local SQLite store of statuses with an FTS5 index over their text.
+
+    Statuses are deduplicated by ID (the latest copy wins) and indexed by
+    account, ``created_at`` and hashtag. ``crawls`` and ``search_hits``
+    remember when a timeline or search was last pulled in full, which is what
+    ``ArchiveCache`` uses to answer requests locally. Safe to share between
+    threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_ARCHIVE):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM statuses").fetchone()[0]
+
+    def add(self, statuses: Iterable[dict]) -> int:
+        """Insert or refresh statuses. Returns how many were not in the archive before."""
+        now = time.time()
+        added = 0
+        with self._lock, self._db:
+            for status in statuses:
+                if not isinstance(status, dict) or "id" not in status or "created_at" not in status:
+                    continue
+                status = {k: v for k, v in status.items() if not k.startswith("_")}
+                status_id = int(status["id"])
+                account = status.get("account") or {}
+                text = status_text(status)
+                if self._db.execute("SELECT 1 FROM statuses WHERE id = ?", (status_id,)).fetchone():
+                    self._db.execute("DELETE FROM statuses_fts WHERE rowid = ?", (status_id,))
+                    self._db.execute("DELETE FROM status_tags WHERE status_id = ?", (status_id,))
+                else:
+                    added += 1
+                self._db.execute(
+                    "INSERT OR REPLACE INTO statuses (id, account_id, acct, created_at, in_reply_to_id, json, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (status_id, account.get("id"), account.get("acct"), status["created_at"], status.get("in_reply_to_id"), json.dumps(status), now),
+                )
+                self._db.execute("INSERT INTO statuses_fts (rowid, text) VALUES (?, ?)", (status_id, text))
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO status_tags (tag, status_id) VALUES (?, ?)", [(tag, status_id) for tag in _hashtags(status, text)]
+                )
+        return added
+
+    def ingest_file(self, path: str, batch_size: int = 1000, workers: int = None):
+        """Add every status in a crawl output file. Returns ``(read, added)``."""
+        read = added = 0
+        batch = []
+        for item in iter_jsonl(path, workers=workers):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                read, added = read + len(batch), added + self.add(batch)
+                batch = []
+        read, added = read + len(batch), added + self.add(batch)
+        return read, added
+
+    def query(
+        self,
+        text: str = None,
+        acct: str = None,
+        tag: str = None,
+        created_after: datetime = None,
+        created_before: datetime = None,
+        replies: bool = True,
+        limit: int = None,
+        raw: bool = False,
+    ) -> List:
+        """
+        Stored statuses matching every given filter, newest first. ``text`` is
+        an FTS5 query (words, ``"phrases"``, ``OR``, ``prefix*``). With
+        ``raw``, statuses are returned as JSON text.
+        """
+        where, args = [], []
+        if text:
+            where.append("s.id IN (SELECT rowid FROM statuses_fts WHERE statuses_fts MATCH ?)")
+            args.append(text)
+        if acct:
+            where.append("s.acct = ?")
+            args.append(acct.lstrip("@"))
+        if tag:
+            where.append("s.id IN (SELECT status_id FROM status_tags WHERE tag = ?)")
+            args.append(tag.lstrip("#"))
+        if created_after:
+            where.append("s.created_at >= ?")
+            args.append(_iso(created_after))
+        if created_before:
+            where.append("s.created_at <= ?")
+            args.append(_iso(created_before))
+        if not replies:
+            where.append("s.in_reply_to_id IS NULL")
+        sql = "SELECT s.json FROM statuses s"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            try:
+                rows = self._db.execute(sql, args).fetchall()
+            except sqlite3.OperationalError as e:
+                raise ValueError(f"Invalid full-text query {text!r}: {e}") from e
+        return [row[0] if raw else json.loads(row[0]) for row in rows]
+
+    def mark_crawled(self, key: str, covers_from: datetime = None, status_ids: List = None):
+        """Record that ``key`` was just pulled in full (back to ``covers_from``), optionally with its ordered search hits."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO crawls (key, fetched_at, covers_from) VALUES (?, ?, ?)", (key, time.time(), _iso(covers_from))
+            )
+            if status_ids is not None:
+                self._db.execute("DELETE FROM search_hits WHERE key = ?", (key,))
+                self._db.executemany(
+                    "INSERT INTO search_hits (key, position, status_id) VALUES (?, ?, ?)",
+                    [(key, i, int(status_id)) for i, status_id in enumerate(status_ids)],
+                )
+
+    def crawled(self, key: str, max_age: float, covers_from: datetime = None) -> bool:
+        """Whether ``key`` was pulled in full within ``max_age`` seconds, reaching back to at least ``covers_from``."""
+        with self._lock:
+            row = self._db.execute("SELECT fetched_at, covers_from FROM crawls WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[0] > max_age:
+            return False
+        return row[1] is None or (covers_from is not None and _iso(covers_from) >= row[1])
+
+    def search_hits(self, key: str, raw: bool = False) -> List:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT s.json FROM search_hits h JOIN statuses s ON s.id = h.status_id WHERE h.key = ? ORDER BY h.position", (key,)
+            ).fetchall()
+        return [row[0] if raw else json.loads(row[0]) for row in rows]
+
+
+class ArchiveCache:
+    """
+    Read-through cache in front of an ``Api`` (or anything with the same
+    methods). ``pull_statuses`` and status ``search`` are answered from the
+    archive when the same timeline or query was pulled in full within
+    ``max_age`` seconds; otherwise they go to the API and what comes back is
+    stored as it streams past. Everything else is passed straight through.
+    """
+
+    def __init__(self, api, archive: Archive, max_age: float):
+        self._api = api
+        self.archive = archive
+        self.max_age = max_age
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)
+
+    def quit(self):
+        self._api.quit()
+
+    @staticmethod
+    def _output(items, fields, raw):
+        """Shape archived statuses like the API would: projected to ``fields`` (plus ``id`` and ``created_at``), or as JSON text."""
+        tree = _field_tree(list(fields) + ["id", "created_at"]) if fields else None
+        for item in items:
+            if tree:
+                item = project_fields(item if isinstance(item, dict) else json.loads(item), tree)
+            yield jsonio.dumps(item) if raw and isinstance(item, dict) else item
+
+    def _store_through(self, items, raw: bool, on_complete):
+        """
+        Yield ``items`` unchanged while storing them. If every item was consumed
+        and the pull did not stop on an error, call ``on_complete(ids)``; the
+        error, if any, is returned like the paginator returned it.
+        """
+        ids, pending = [], []
+
+        def store(item):
+            pending.append(json.loads(item) if raw else item)
+            if len(pending) >= 500:
+                self.archive.add(pending)
+                ids.extend(p["id"] for p in pending)
+                pending.clear()
+
+        try:
+            error = yield from _tap(items, store)
+        finally:
+            self.archive.add(pending)
+        ids.extend(p["id"] for p in pending)
+        if error:
+            logger.warning(f"Not marking an incomplete pull as crawled: {error.get('error')}")
+            return error
+        on_complete(ids)
+
+    def pull_statuses(self, username: str, replies: bool, created_after: datetime = None, created_before: datetime = None, pinned: bool = False, fields: List[str] = None, raw: bool = False, **bounds):
+        key = f"statuses:{username.lstrip('@').lower()}"
+        if any(bounds.values()):
+            # ID bounds and page caps (max_id, since_id, max_pages) select part of a timeline.
+            return self._api.pull_statuses(username, replies=replies, created_after=created_after, created_before=created_before, pinned=pinned, fields=fields, raw=raw, **bounds)
+        if not pinned and self.archive.crawled(key, self.max_age, created_after):
+            logger.info(f"Answering @{username}'s statuses from the archive")
+            items = self.archive.query(acct=username, created_after=created_after, created_before=created_before, replies=replies, raw=raw and not fields)
+            return self._output(items, fields, raw)
+        if pinned or fields or created_before:
+            # Incomplete or projected pulls can't be cached; pass them through.
+            return self._api.pull_statuses(username, replies=replies, created_after=created_after, created_before=created_before, pinned=pinned, fields=fields, raw=raw)
+
+        def complete(ids):
+            if replies:
+                self.archive.mark_crawled(key, covers_from=created_after)
+
+        items = self._api.pull_statuses(username, replies=replies, created_after=created_after, raw=raw)
+        return self._store_through(items, raw, complete)
+
+    def search(self, searchtype: str, query: str, limit: int, created_after: datetime = None, created_before: datetime = None, include_comments: bool = False, fields: List[str] = None, max_items: Optional[int] = 1000, **kwargs):
+        # The page size (limit) does not change the hits, so it is not part of the key.
+        key = f"search:{query.lower()}" + (":resolve" if kwargs.get("resolve") else "")
+        capped_key = f"{key}:max={max_items}"  # a search stopped by max_items holds only its first hits
+        cacheable = searchtype == "statuses" and not include_comments and not kwargs.get("offset")
+        cached = cacheable and next((k for k in (key, capped_key) if self.archive.crawled(k, self.max_age)), None)
+        if cached:
+            logger.info(f"Answering search for '{query}' from the archive")
+            items = self.archive.search_hits(cached)
+            items = [s for s in items if (not created_after or s["created_at"] >= _iso(created_after)) and (not created_before or s["created_at"] <= _iso(created_before))]
+            return self._output(items[:max_items], fields, False)
+        items = self._api.search(searchtype, query, limit, created_after=created_after, created_before=created_before, include_comments=include_comments, fields=fields, max_items=max_items, **kwargs)
+        if not cacheable or fields or created_after or created_before:
+            return items
+
+        def complete(ids):
+            capped = max_items is not None and len(ids) >= max_items
+            self.archive.mark_crawled(capped_key if capped else key, status_ids=ids)
+
+        return self._store_through(items, False, complete)
@@ -0,0 +1,178 @@
+"""
+Runtime tuning of how much crawl work runs at once.
+
+``ConcurrencyController`` is an AIMD (additive increase, multiplicative
+decrease) limit on work in flight, as in TCP congestion control: while
+requests stay fast and error-free it allows one more worker per interval,
+and on throttling, errors, slow responses or memory pressure it halves.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from loguru import logger
+
+from .metrics import CONCURRENCY_IN_FLIGHT, CONCURRENCY_LIMIT, request_totals
+
+
+def memory_available() -> Optional[float]:
+    """Fraction of physical memory that is available, or ``None`` where the OS does not say."""
+    try:
+        with open("/proc/meminfo", "r") as f:  # counts reclaimable cache, unlike the free page count
+            info = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[1:]}
+        return info["MemAvailable"] / info["MemTotal"]
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") / os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class ConcurrencyController:
+    """
+    An adaptive limit on work in flight. Wrap each work item in ``slot()``,
+    which waits while ``limit`` items are already running, or read ``limit``
+    to size the next batch and call ``update()`` after it.
+
+    Every ``interval`` seconds the requests made since the last check are
+    judged. The limit is multiplied by ``backoff`` if any was throttled
+    (429), if more than ``error_rate`` of them failed (5xx, network), if
+    their mean latency exceeded ``latency_target`` (by default, twice the
+    best mean seen so far and at least half a second over it), or if less
+    than ``memory_floor`` of memory is available. Otherwise, if the limit was reached during the interval, it
+    grows by one. It stays between ``minimum`` and ``maximum``.
+
+    By default requests are read from this process's metrics. Work done in
+    other processes can be reported with ``observe`` instead
+    (``watch_metrics=False``). Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        name: str = "crawl",
+        initial: int = 2,
+        minimum: int = 1,
+        maximum: int = 16,
+        interval: float = 10.0,
+        latency_target: float = None,
+        error_rate: float = 0.05,
+        memory_floor: float = 0.1,
+        backoff: float = 0.5,
+        watch_metrics: bool = True,
+    ):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.interval = interval
+        self.latency_target = latency_target
+        self.error_rate = error_rate
+        self.memory_floor = memory_floor
+        self.backoff = backoff
+        self.watch_metrics = watch_metrics
+        self.best_latency = None
+        self._limit = min(self.maximum, max(self.minimum, initial))
+        self._in_flight = 0
+        self._saturated = False
+        self._window = dict(requests=0.0, throttled=0.0, errors=0.0, latency=0.0)
+        self._last = request_totals() if watch_metrics else None
+        self._checked = time.monotonic()
+        self._cond = threading.Condition()
+        CONCURRENCY_LIMIT.set(self._limit, name=name)
+
+    @property
+    def limit(self) -> int:
+        with self._cond:
+            return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        with self._cond:
+            return self._in_flight
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the ``limit`` slots while the block runs."""
+        self.update()
+        with self._cond:
+            while self._in_flight >= self._limit:
+                self._saturated = True
+                self._cond.wait(timeout=self.interval)
+                self._update_locked()
+            self._in_flight += 1
+            self._saturated = self._saturated or self._in_flight >= self._limit
+            CONCURRENCY_IN_FLIGHT.set(self._in_flight, name=self.name)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                CONCURRENCY_IN_FLIGHT.set(self._in_flight, name=self.name)
+                self._cond.notify()
+
+    def run(self, fn, *args, **kwargs):
+        """``fn(*args, **kwargs)`` in a slot; pass it to ``executor.submit``."""
+        with self.slot():
+            return fn(*args, **kwargs)
+
+    def mark_saturated(self):
+        """Record that the current limit was fully used, for callers that size batches with ``limit``."""
+        with self._cond:
+            self._saturated = True
+
+    def observe(self, requests: float = 0, throttled: float = 0, errors: float = 0, latency: float = 0):
+        """Report requests made outside this process's metrics; ``latency`` is their total seconds."""
+        with self._cond:
+            for key, value in dict(requests=requests, throttled=throttled, errors=errors, latency=latency).items():
+                self._window[key] += value
+
+    def update(self, force: bool = False) -> int:
+        """Adjust the limit if ``interval`` has passed (or ``force``). Returns the limit."""
+        with self._cond:
+            self._update_locked(force)
+            return self._limit
+
+    def _update_locked(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked < self.interval:
+            return
+        self._checked = now
+        window = self._window
+        if self.watch_metrics:
+            totals = request_totals()
+            window = {key: window[key] + totals[key] - self._last[key] for key in window}
+            self._last = totals
+        self._window = dict.fromkeys(self._window, 0.0)
+        saturated, self._saturated = self._saturated, False
+        reason = self._overloaded(window)
+        if reason:
+            limit = max(self.minimum, math.floor(self._limit * self.backoff))
+            if limit != self._limit:
+                logger.info(f"Concurrency of {self.name} cut to {limit}: {reason}")
+        elif saturated and window["requests"]:
+            limit = min(self.maximum, self._limit + 1)
+        else:
+            return
+        self._limit = limit
+        CONCURRENCY_LIMIT.set(limit, name=self.name)
+        self._cond.notify_all()
+
+    def _overloaded(self, window: Dict[str, float]) -> Optional[str]:
+        available = memory_available()
+        if available is not None and available < self.memory_floor:
+            return f"only {available:.0%} of memory available"
+        if not window["requests"]:
+            return None
+        if window["throttled"]:
+            return f"{window['throttled']:.0f} requests throttled"
+        if window["errors"] / window["requests"] > self.error_rate:
+            return f"{window['errors']:.0f} of {window['requests']:.0f} requests failed"
+        latency = window["latency"] / window["requests"]
+        self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+        target = self.latency_target or max(2 * self.best_latency, self.best_latency + 0.5)
+        if latency > target:
+            return f"mean latency {latency:.2f}s is over {target:.2f}s"
+        return None
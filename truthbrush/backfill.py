@@ -0,0 +1,110 @@
+"""
+Full-history pulls of high-volume accounts, split across sessions.
+
+``pull_statuses`` walks a timeline as one serial ``max_id`` chain. Here the
+account's ID span is cut into ranges that are pulled concurrently, one
+session per thread, and merged back into newest-first order.
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Iterator, List, Sequence
+
+from loguru import logger
+
+from . import jsonio
+from .api import _collect, snowflake_id
+from .metrics import QUEUE_DEPTH
+
+
+def split_range(low: int, high: int, parts: int) -> List[List[int]]:
+    """Cut ``(low, high]`` into up to ``parts`` adjacent ``[low, high]`` ranges, newest first."""
+    parts = max(1, min(parts, high - low))
+    bounds = [low + (high - low) * i // parts for i in range(parts + 1)]
+    return [[bounds[i], bounds[i + 1]] for i in reversed(range(parts)) if bounds[i + 1] > bounds[i]]
+
+
+def _status_id(item) -> int:
+    return int((jsonio.loads(item) if isinstance(item, str) else item)["id"])
+
+
+def backfill_statuses(
+    sessions: Sequence,
+    username: str,
+    replies: bool = True,
+    created_after: datetime = None,
+    created_before: datetime = None,
+    ranges_per_session: int = 8,
+    fields: List[str] = None,
+    raw: bool = False,
+) -> Iterator:
+    """
+    Pull a user's statuses newest first, like ``pull_statuses``, with the
+    timeline split into ``ranges_per_session`` ID ranges per session.
+
+    Each session (an ``Api``, ``DaemonClient`` or anything with the same
+    ``pull_statuses``) runs on its own thread and takes the next range when
+    it finishes one, so uneven ranges balance out. A range is yielded once
+    every newer range has been, and a status the server returns on both
+    sides of a boundary is yielded once. An error in any range stops the
+    others and is raised when that range is reached.
+    """
+    if not sessions:
+        raise ValueError("backfill_statuses needs at least one session")
+    span = sessions[0].timeline_span(username, replies=replies)
+    if not span:
+        return
+    low, high = span
+    if created_after:
+        low = max(low, snowflake_id(created_after) - 1)
+    if created_before:
+        high = min(high, snowflake_id(created_before + timedelta(milliseconds=1)) - 1)
+    if high <= low:
+        return
+    ranges = split_range(low, high, len(sessions) * ranges_per_session)
+    logger.info(f"Backfilling @{username} in {len(ranges)} ranges on {len(sessions)} sessions")
+
+    results = {}
+    next_range = iter(range(len(ranges)))
+    done = threading.Condition()
+    stop = threading.Event()
+
+    def work(api):
+        while not stop.is_set():
+            with done:
+                index = next(next_range, None)
+            if index is None:
+                return
+            since_id, max_id = ranges[index]
+            try:
+                result, error = _collect(api.pull_statuses(username, replies=replies, fields=fields, raw=raw, since_id=str(since_id), max_id=str(max_id + 1)))
+                if error:
+                    raise RuntimeError(f"Range {since_id}-{max_id} of @{username} stopped after {len(result)} statuses: {error.get('error')}")
+            except Exception as e:
+                stop.set()
+                result = e
+            with done:
+                results[index] = result
+                done.notify_all()
+
+    threads = [threading.Thread(target=work, args=(api,), name=f"truthbrush-backfill-{i}", daemon=True) for i, api in enumerate(sessions)]
+    for thread in threads:
+        thread.start()
+    try:
+        previous = None
+        for index in range(len(ranges)):
+            with done:
+                QUEUE_DEPTH.set(len(ranges) - index, queue="backfill")
+                while index not in results:
+                    done.wait()
+                items = results.pop(index)
+            if isinstance(items, Exception):
+                raise items
+            start = 0
+            while start < len(items) and previous is not None and _status_id(items[start]) >= previous:
+                start += 1  # already yielded from the newer range
+            if start < len(items):
+                previous = _status_id(items[-1])
+            yield from items[start:]
+    finally:
+        stop.set()
+        QUEUE_DEPTH.set(0, queue="backfill")
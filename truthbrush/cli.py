@@ -1,26 +1,488 @@
+import cProfile
 import json
+import logging
+import queue
+import signal
+import sys
+import threading
 import click
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timezone
-from .api import Api
+from .api import BASE_URL, Api, _tap
+from .archive import DEFAULT_ARCHIVE, Archive, ArchiveCache, iter_jsonl
+from .autoscale import ConcurrencyController
+from .backfill import backfill_statuses
+from .daemon import DEFAULT_SOCKET, DaemonClient, SessionDaemon
+from .media import DEFAULT_MEDIA_DIR, MediaDownloader, MediaStore, unique_media_urls
+from .metrics import QUEUE_DEPTH, REGISTRY
+from .normalize import AccountNormalizer
+from .pagecache import DEFAULT_PAGE_CACHE, PageCache
+from .pool import PooledApi, load_credentials
+from .profiling import PROFILER, phase
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .snapshots import DEFAULT_SNAPSHOTS, ENDPOINTS, SnapshotCollector, SnapshotStore
+from .watermarks import Watermarks
+
+
+def _emit(item):
+    """Write one JSON document per line to stdout. Strings come from ``--raw`` and are already JSON."""
+    with phase("output"):
+        click.echo(item if isinstance(item, str) else json.dumps(item))
+
+
+def _split_fields(ctx, param, value):
+    return [f.strip() for f in value.split(",") if f.strip()] if value else None
+
+
+fields_option = click.option(
+    "--fields",
+    callback=_split_fields,
+    help="Comma-separated fields to keep, e.g. id,created_at,content,account.acct. Unlisted fields are dropped before they are downloaded.",
+)
+
+raw_option = click.option(
+    "--raw",
+    is_flag=True,
+    help="Write items as the server sent them (compact JSON) instead of decoding and re-encoding each one.",
+)
+
+accounts_option = click.option(
+    "--accounts-file",
+    type=click.Path(dir_okay=False),
+    help="Write each distinct account once to FILE (appending, and again only when it changes) and replace the account embedded in every status with its account_id.",
+)
+
+
+def _remember_autoscale(ctx, param, value):
+    ctx.meta["autoscale"] = value
+
+
+autoscale_option = click.option(
+    "--autoscale",
+    is_flag=True,
+    expose_value=False,
+    callback=_remember_autoscale,
+    help="Treat --workers as a ceiling: start with 2 and add workers while requests stay fast and error-free, halving on throttling, errors or memory pressure.",
+)
+
+
+def batch_options(f):
+    f = autoscale_option(f)
+    f = click.option("--workers", default=4, show_default=True, help="With --from-file, number of targets to pull concurrently.")(f)
+    f = click.option(
+        "--from-file",
+        type=click.File("r"),
+        help="Read one target per line from FILE ('-' for stdin) instead of the argument. Items are tagged with the `_target` they came from.",
+    )(f)
+    return f
+
+
+def _tag(item, target: str):
+    """Prefix an item with ``_target``; raw items are JSON object text and are spliced without decoding."""
+    if isinstance(item, str):
+        body = item[1:].lstrip()
+        return '{"_target": ' + json.dumps(target) + ("" if body.startswith("}") else ", ") + body
+    return {"_target": target, **item}
+
+
+_DONE = object()
+
+
+def _checked(items):
+    """Yield ``items``, raising if their paginator returned an ``ApiError`` because it stopped early."""
+    error = yield from items
+    if error:
+        raise RuntimeError(f"stopped early: {error.get('error')}")
+
+
+def _run_batch(targets, fetch, workers: int) -> int:
+    """
+    Pull ``fetch(target)`` for every target on a thread pool and write items
+    as they arrive, tagged with their target. Returns the number of targets
+    that failed; the others still run to completion. With --autoscale,
+    ``workers`` is the ceiling of a ``ConcurrencyController``.
+    """
+    controller = ConcurrencyController(name="batch", maximum=workers) if click.get_current_context().meta.get("autoscale") else None
+    results = queue.Queue(maxsize=max(1, workers) * 64)
+    stop = threading.Event()
+
+    def put(message):
+        while not stop.is_set():
+            try:
+                results.put(message, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def pull(target):
+        try:
+            for item in _checked(fetch(target)):
+                if not put((target, item)):
+                    return
+        except Exception as e:
+            put((target, e))
+        finally:
+            put((target, _DONE))
+
+    def work(target):
+        if controller is None:
+            return pull(target)
+        with controller.slot():
+            pull(target)
+
+    failures = 0
+    remaining = len(targets)
+    QUEUE_DEPTH.set(remaining, queue="batch")
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="truthbrush-batch")
+    try:
+        for target in targets:
+            executor.submit(work, target)
+        while remaining:
+            target, item = results.get()
+            if item is _DONE:
+                remaining -= 1
+                QUEUE_DEPTH.set(remaining, queue="batch")
+            elif isinstance(item, Exception):
+                failures += 1
+                click.echo(f"Failed to pull {target}: {item}", err=True)
+            else:
+                _emit(_tag(item, target))
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+    return failures
+
+
+def _normalized(ctx, fetch, accounts_file: str, raw: bool = False):
+    """Wrap ``fetch`` so the statuses it yields are normalized against ``accounts_file``."""
+    if not accounts_file:
+        return fetch
+    if raw:
+        raise click.UsageError("--accounts-file can't be combined with --raw.")
+    normalizer = AccountNormalizer.open(accounts_file)
+    ctx.call_on_close(normalizer.close)
+    return lambda target: (normalizer.normalize(item) for item in _checked(fetch(target)))
+
+
+def _run(ctx, target, from_file, workers: int, fetch):
+    """Emit ``fetch(target)``, or run it for every target listed in ``from_file``."""
+    if from_file is None:
+        if target is None:
+            raise click.UsageError("Missing argument: pass a target or --from-file.")
+        try:
+            for item in _checked(fetch(target)):
+                _emit(item)
+        except RuntimeError as e:
+            click.echo(f"Failed to pull {target}: {e}", err=True)
+            ctx.exit(1)
+        return
+    if target is not None:
+        raise click.UsageError("Pass either a target argument or --from-file, not both.")
+    targets = [line.strip() for line in from_file if line.strip() and not line.lstrip().startswith("#")]
+    failures = _run_batch(targets, fetch, workers)
+    if failures:
+        click.echo(f"{failures} of {len(targets)} targets failed.", err=True)
+        ctx.exit(1)
+
+
+def _start_profiling(ctx, profile_output: str):
+    PROFILER.enable()
+    profiler = None
+    if profile_output and not profile_output.endswith(".speedscope.json"):
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def report():
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_output)
+        elif profile_output:
+            PROFILER.write_speedscope(profile_output, name=ctx.invoked_subcommand or "truthbrush")
+        click.echo(PROFILER.summary(), err=True)
+        if profile_output:
+            click.echo(f"Profile written to {profile_output}", err=True)
+
+    ctx.call_on_close(report)
+
+
+class LazyApi:
+    """
+    Stands in for ``Api`` and only logs in when a command first makes a
+    request, so ``--help``, usage errors and local-only commands never launch
+    a browser.
+    """
+
+    def __init__(self, credentials_path: str = None, **kwargs):
+        self._credentials_path = credentials_path
+        self._kwargs = kwargs
+        self._api = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._api is None:
+            with self._lock:  # batch workers may all make their first request at once
+                if self._api is None:
+                    credentials = _pooled_credentials(self._credentials_path)
+                    self._api = PooledApi(credentials, **self._kwargs) if credentials else Api(**self._kwargs)
+        return getattr(self._api, name)
+
+    def close(self):
+        if self._api is not None:
+            self._api.quit()
+
+def _pooled_credentials(path: str = None):
+    """The accounts to pool: those in ``path``, or those in the environment if it defines more than one. ``None`` means a single account."""
+    credentials = load_credentials(path)
+    return credentials if path or len(credentials) > 1 else None
+
+def _page_cache(ctx):
+    """The shared ``PageCache`` selected by --page-cache-ttl, or ``None``."""
+    params = ctx.params
+    if not params.get("page_cache_ttl"):
+        return None
+    if "page_cache" not in ctx.meta:
+        ctx.meta["page_cache"] = PageCache(params["page_cache_path"], ttl=params["page_cache_ttl"])
+        ctx.call_on_close(ctx.meta["page_cache"].close)
+    return ctx.meta["page_cache"]
 
 @click.group(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option("--metrics-port", type=int, help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running.")
+@click.option("--metrics-file", type=click.Path(dir_okay=False), help="Write Prometheus metrics to this file on exit.")
+@click.option("--profile", is_flag=True, help="Print a per-phase time breakdown to stderr on exit.")
+@click.option("--profile-output", type=click.Path(dir_okay=False), help="With --profile, also write a cProfile dump (.prof) or a phase timeline (*.speedscope.json).")
+@click.option("--transport", type=click.Choice(["browser", "http"]), default="browser", envvar="TRUTHBRUSH_TRANSPORT", show_default=True, help="Issue requests from a logged-in browser, or directly over HTTP.")
+@click.option("--base-url", default=BASE_URL, envvar="TRUTHBRUSH_BASE_URL", show_default=True, help="Truth Social instance to talk to.")
+@click.option("--socket", "socket_path", default=DEFAULT_SOCKET, envvar="TRUTHBRUSH_SOCKET", show_default=True, help="Unix socket of a `truthbrush serve` daemon.")
+@click.option("--no-daemon", is_flag=True, help="Log in directly even if a daemon is running.")
+@click.option("--credentials", "credentials_path", type=click.Path(exists=True, dir_okay=False), envvar="TRUTHBRUSH_CREDENTIALS", help="JSON file of accounts to spread requests over (see README). Numbered TRUTHSOCIAL_USERNAME_N/TRUTHSOCIAL_PASSWORD_N variables also form a pool.")
+@click.option("--retries", type=click.IntRange(min=0), default=3, envvar="TRUTHBRUSH_RETRIES", show_default=True, help="Retry a request failing with 429, 5xx or a network error this many times, with jittered exponential backoff.")
+@click.option("--rate", type=float, envvar="TRUTHBRUSH_RATE", help="Cap API requests per second, shared by all workers (and all sessions of `serve`).")
+@click.option("--archive", "archive_path", default=DEFAULT_ARCHIVE, envvar="TRUTHBRUSH_ARCHIVE", show_default=True, type=click.Path(dir_okay=False), help="Local archive used by `archive`, `query` and --cache-ttl.")
+@click.option("--cache-ttl", type=float, envvar="TRUTHBRUSH_CACHE_TTL", help="Answer `statuses` and `search` from the archive when the same pull completed within this many seconds, and store what is pulled.")
+@click.option("--page-cache", "page_cache_path", default=DEFAULT_PAGE_CACHE, envvar="TRUTHBRUSH_PAGE_CACHE", show_default=True, type=click.Path(dir_okay=False), help="On-disk cache of search result pages used by --page-cache-ttl.")
+@click.option("--page-cache-ttl", type=float, envvar="TRUTHBRUSH_PAGE_CACHE_TTL", help="Reuse search result pages fetched within this many seconds instead of fetching them again.")
 @click.pass_context
-def cli(ctx):
+def cli(ctx, metrics_port: int, metrics_file: str, profile: bool, profile_output: str, transport: str, base_url: str, socket_path: str, no_daemon: bool, credentials_path: str, retries: int, rate: float, archive_path: str, cache_ttl: float, page_cache_path: str, page_cache_ttl: float):
     """
     TruthBrush-Modified: A re-engineered API client for Truth Social.
     Requires a .env file in the run directory.
     """
-    ctx.obj = Api()
+    if profile or profile_output:
+        _start_profiling(ctx, profile_output)
+    if metrics_port:
+        server = REGISTRY.serve(metrics_port)
+        ctx.call_on_close(server.shutdown)
+    if metrics_file:
+        ctx.call_on_close(lambda: REGISTRY.write_textfile(metrics_file))
+    logging.basicConfig(level=logging.INFO)
+    if ctx.invoked_subcommand != "serve" and not no_daemon and DaemonClient.available(socket_path):
+        ctx.obj = DaemonClient(socket_path)
+    else:
+        ctx.obj = LazyApi(credentials_path, transport=transport, base_url=base_url, rate_limiter=RateLimiter(rate) if rate else None, page_cache=_page_cache(ctx), retry_policy=RetryPolicy(attempts=retries + 1))
+        ctx.call_on_close(ctx.obj.close)
+    if cache_ttl:
+        archive = Archive(archive_path)
+        ctx.call_on_close(archive.close)
+        ctx.obj = ArchiveCache(ctx.obj, archive, max_age=cache_ttl)
+
+@cli.command()
+@click.option("--sessions", default=1, show_default=True, help="Number of warm sessions to keep logged in.")
+@click.pass_context
+def serve(ctx, sessions: int):
+    """Keep sessions logged in and serve other truthbrush commands over a Unix socket."""
+    params = ctx.parent.params
+    rate_limiter = RateLimiter(params["rate"]) if params["rate"] else None
+    page_cache = _page_cache(ctx.parent)
+    credentials = _pooled_credentials(params["credentials_path"])
+    apis = []
+    for i in range(sessions):
+        credential = credentials[i % len(credentials)] if credentials else None  # spread the sessions over the pooled accounts
+        apis.append(Api(credential and credential.username, credential and credential.password, transport=params["transport"], base_url=params["base_url"], rate_limiter=rate_limiter, page_cache=page_cache, retry_policy=RetryPolicy(attempts=params["retries"] + 1)))
+        click.echo(f"Session {i + 1}/{sessions} ready.", err=True)
+    try:
+        daemon = SessionDaemon(apis, params["socket_path"])
+    except Exception:
+        for api in apis:
+            api.quit()
+        raise
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    click.echo(f"Listening on {params['socket_path']}. Press Ctrl+C to stop.", err=True)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+
+@cli.command()
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--workers", type=int, help="Processes used to parse each file.  [default: one per CPU]")
+@click.pass_context
+def archive(ctx, files, workers: int):
+    """Add the statuses in crawl output FILES to the local archive."""
+    with Archive(ctx.parent.params["archive_path"]) as store:
+        for path in files:
+            read, added = store.ingest_file(path, workers=workers)
+            click.echo(f"{path}: {read} statuses read, {added} new.", err=True)
+        click.echo(f"{len(store)} statuses in {store.path}.", err=True)
+
+@cli.command()
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--out", "out_dir", type=click.Path(file_okay=False), default=DEFAULT_MEDIA_DIR, show_default=True, help="Directory the files are stored in, named by their SHA-256.")
+@click.option("--workers", default=8, show_default=True, help="Number of concurrent downloads.")
+def media(files, out_dir: str, workers: int):
+    """Download the attachments, card images, avatars and headers referenced in crawl output FILES."""
+    statuses = (status for path in files for status in iter_jsonl(path))
+    downloaded = cached = failed = 0
+    with MediaStore(out_dir) as store:
+        for url, record in MediaDownloader(store, workers=workers).download_all(unique_media_urls(statuses)):
+            if isinstance(record, Exception):
+                failed += 1
+                continue
+            cached += record["cached"]
+            downloaded += not record["cached"]
+            _emit({"url": url, "sha256": record["sha256"], "path": record["path"], "size": record["size"]})
+        click.echo(f"{downloaded} downloaded, {cached} already stored, {failed} failed; {len(store)} files in {out_dir}.", err=True)
 
 @cli.command()
-@click.argument("group_id")
+@click.argument("text", required=False)
+@click.option("--account", help="Only statuses by this account.")
+@click.option("--tag", help="Only statuses with this hashtag.")
+@click.option("--created-after", type=click.DateTime(), help="Only statuses on or after this date (YYYY-MM-DD).")
+@click.option("--created-before", type=click.DateTime(), help="Only statuses on or before this date (YYYY-MM-DD).")
+@click.option("--replies/--no-replies", default=True, help="Include replies.")
+@click.option("--limit", type=int, help="Maximum number of statuses to return.")
+@raw_option
+@click.pass_context
+def query(ctx, text: str, account: str, tag: str, created_after: datetime, created_before: datetime, replies: bool, limit: int, raw: bool):
+    """
+    Search the local archive, newest first. TEXT is a full-text query: words,
+    "exact phrases", OR, and prefix* terms.
+    """
+    if created_after and created_after.tzinfo is None:
+        created_after = created_after.replace(tzinfo=timezone.utc)
+    if created_before and created_before.tzinfo is None:
+        created_before = created_before.replace(tzinfo=timezone.utc)
+    with Archive(ctx.parent.params["archive_path"]) as store:
+        try:
+            statuses = store.query(text, acct=account, tag=tag, created_after=created_after, created_before=created_before, replies=replies, limit=limit, raw=raw)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="TEXT")
+        for status in statuses:
+            _emit(status)
+
+snapshots_option = click.option(
+    "--db",
+    "db_path",
+    default=DEFAULT_SNAPSHOTS,
+    envvar="TRUTHBRUSH_SNAPSHOTS",
+    show_default=True,
+    type=click.Path(dir_okay=False),
+    help="Snapshot store.",
+)
+
+
+@cli.command()
+@snapshots_option
+@click.option("--endpoints", callback=_split_fields, help=f"Comma-separated endpoints to poll.  [default: {','.join(ENDPOINTS)}]")
+@click.option("--interval", type=float, default=300, show_default=True, help="Seconds between polls.")
+@click.option("--rounds", type=int, help="Stop after this many polls.  [default: run until interrupted]")
+@click.pass_context
+def snapshot(ctx, db_path: str, endpoints: list, interval: float, rounds: int):
+    """Poll trends, tags, ads and suggestions, storing only what changed."""
+    with SnapshotStore(db_path) as store:
+        try:
+            collector = SnapshotCollector(ctx.obj, store, endpoints)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--endpoints")
+        try:
+            collector.run(interval, rounds)
+        except KeyboardInterrupt:
+            pass
+
+@cli.command("snapshot-history")
+@click.argument("endpoint", type=click.Choice(list(ENDPOINTS)))
+@snapshots_option
+@click.option("--at", type=click.DateTime(), help="Rebuild the list as it was at this time (UTC) instead of the latest one.")
+@click.option("--events", is_flag=True, help="Write the recorded changes instead of a rebuilt list.")
+def snapshot_history(endpoint: str, db_path: str, at: datetime, events: bool):
+    """Rebuild a stored snapshot, or list its changes."""
+    until = (at if at.tzinfo else at.replace(tzinfo=timezone.utc)).timestamp() if at else None
+    with SnapshotStore(db_path) as store:
+        for item in store.events(endpoint, until) if events else store.replay(endpoint, until):
+            _emit(item)
+
+def _group_ids(listing) -> list:
+    """IDs of the groups in a ``trending_groups``/``suggested_groups`` response (errors give none)."""
+    groups = listing if isinstance(listing, list) else []
+    return [str(g["id"]) for g in groups if isinstance(g, dict) and g.get("id")]
+
+
+def _newest_id(item) -> str:
+    return str((json.loads(item) if isinstance(item, str) else item)["id"])
+
+
+@cli.command("groups-crawl")
+@click.option("--trending/--no-trending", default=True, help="Crawl the trending groups.")
+@click.option("--suggested/--no-suggested", default=True, help="Crawl the suggested groups.")
+@click.option("--group", "group_ids", multiple=True, help="Also crawl this group ID (repeatable).")
+@click.option("--state", type=click.Path(dir_okay=False), help="JSON file of per-group watermarks. Only posts newer than the last crawl are pulled, and each group's mark is saved as soon as it finishes.")
+@click.option("--limit", default=20, help="Number of posts per page.", type=int)
+@click.option("--workers", default=8, show_default=True, help="Number of groups to pull concurrently.")
+@autoscale_option
+@fields_option
+@raw_option
+@accounts_option
+@click.pass_context
+def groups_crawl(ctx, trending: bool, suggested: bool, group_ids: tuple, state: str, limit: int, workers: int, fields: list, raw: bool, accounts_file: str):
+    """Pull the timelines of the trending and suggested groups concurrently."""
+    api = ctx.obj
+    targets = list(group_ids)
+    if trending:
+        targets += _group_ids(api.trending_groups())
+    if suggested:
+        targets += _group_ids(api.suggested_groups())
+    targets = list(dict.fromkeys(targets))
+    if not targets:
+        raise click.UsageError("No groups to crawl.")
+    click.echo(f"Crawling {len(targets)} groups.", err=True)
+    watermarks = Watermarks(state)
+
+    def fetch(group_id):
+        newest = []
+
+        def track(post):
+            if not newest:
+                newest.append(_newest_id(post))
+
+        posts = api.groupposts(group_id, limit=limit, fields=fields, raw=raw, since_id=watermarks.get(group_id))
+        error = yield from _tap(posts, track)
+        if error:
+            # Older posts were not pulled, so the mark stays put and the next run pulls them all again.
+            raise RuntimeError(f"stopped after {error.get('error')}")
+        if newest:
+            watermarks.advance(group_id, newest[0])
+
+    failures = _run_batch(targets, _normalized(ctx, fetch, accounts_file, raw), workers)
+    if failures:
+        click.echo(f"{failures} of {len(targets)} groups failed.", err=True)
+        ctx.exit(1)
+
+@cli.command()
+@click.argument("group_id", required=False)
 @click.option("--limit", default=20, help="Limit the number of items returned", type=int)
+@fields_option
+@raw_option
+@accounts_option
+@batch_options
 @click.pass_context
-def groupposts(ctx, group_id: str, limit: int):
+def groupposts(ctx, group_id: str, limit: int, fields: list, raw: bool, accounts_file: str, from_file, workers: int):
     """Pull posts from a group's timeline."""
     api = ctx.obj
-    for post in api.groupposts(group_id, limit=limit):
-        print(json.dumps(post))
+    fetch = _normalized(ctx, lambda target: api.groupposts(target, limit=limit, fields=fields, raw=raw), accounts_file, raw)
+    _run(ctx, group_id, from_file, workers, fetch)
 
 @cli.command()
 @click.pass_context
@@ -30,35 +492,35 @@ def trends(ctx):
     trending_posts = api.trending_truths()
     if trending_posts:
         for post in trending_posts:
-            print(json.dumps(post))
+            _emit(post)
 
 @cli.command()
 @click.pass_context
 def tags(ctx):
     """Pull trendy tags."""
     api = ctx.obj
-    print(json.dumps(api.tags()))
+    _emit(api.tags())
 
 @cli.command()
 @click.pass_context
 def grouptags(ctx):
     """Pull group tags."""
     api = ctx.obj
-    print(json.dumps(api.group_tags()))
+    _emit(api.group_tags())
 
 @cli.command()
 @click.pass_context
 def grouptrends(ctx):
     """Pull group trends."""
     api = ctx.obj
-    print(json.dumps(api.trending_groups()))
+    _emit(api.trending_groups())
 
 @cli.command()
 @click.pass_context
 def groupsuggestions(ctx):
     """Pull group suggestions."""
     api = ctx.obj
-    print(json.dumps(api.suggested_groups()))
+    _emit(api.suggested_groups())
 
 @cli.command()
 @click.argument("handle")
@@ -66,10 +528,10 @@ def groupsuggestions(ctx):
 def user(ctx, handle: str):
     """Pull a user's metadata."""
     api = ctx.obj
-    print(json.dumps(api.lookup(handle)))
+    _emit(api.lookup(handle))
 
 @cli.command()
-@click.argument("query")
+@click.argument("query", required=False)
 @click.option("--searchtype", type=click.Choice(["statuses", "accounts", "hashtags", "groups"]), default="statuses", help="Type of content to search for.")
 @click.option("--limit", default=40, help="Number of results per page.")
 @click.option("--created-after", type=click.DateTime(), help="Filter posts on or after this date (YYYY-MM-DD).")
@@ -77,17 +539,29 @@ def user(ctx, handle: str):
 @click.option("--resolve", type=bool, default=False, help="Resolve URLs in search.")
 @click.option("--include-comments", is_flag=True, help="Include comments in the output for status searches.")
 @click.option("--comment-limit", default=50, help="Maximum number of comments to fetch per post.")
+@click.option("--max-items", type=int, default=1000, help="Stop after this many results (0 for no cap).")
+@click.option("--offset", type=int, default=0, help="Skip this many results, e.g. to continue a search stopped by --max-items.")
+@click.option("--windows", type=int, default=0, help="Split the date range into this many windows searched concurrently on --workers threads, so large topics are pulled completely (statuses only; needs --created-after).")
+@fields_option
+@accounts_option
+@batch_options
 @click.pass_context
-def search(ctx, query: str, searchtype: str, limit: int, created_after: datetime, created_before: datetime, resolve: bool, include_comments: bool, comment_limit: int):
+def search(ctx, query: str, searchtype: str, limit: int, created_after: datetime, created_before: datetime, resolve: bool, include_comments: bool, comment_limit: int, max_items: int, offset: int, windows: int, fields: list, accounts_file: str, from_file, workers: int):
     """Search for posts, accounts, or hashtags by a keyword."""
     api = ctx.obj
     if created_after and created_after.tzinfo is None:
         created_after = created_after.replace(tzinfo=timezone.utc)
     if created_before and created_before.tzinfo is None:
         created_before = created_before.replace(tzinfo=timezone.utc)
+    if windows and (searchtype != "statuses" or not created_after):
+        raise click.UsageError("--windows needs --searchtype statuses and --created-after.")
 
-    for item in api.search(searchtype=searchtype, query=query, limit=limit, created_after=created_after, created_before=created_before, resolve=resolve, include_comments=include_comments, comment_limit=comment_limit):
-        print(json.dumps(item))
+    def fetch(target):
+        if windows:
+            return api.search_windows(query=target, created_after=created_after, created_before=created_before, limit=limit, windows=windows, workers=workers, resolve=resolve, include_comments=include_comments, comment_limit=comment_limit, fields=fields)
+        return api.search(searchtype=searchtype, query=target, limit=limit, created_after=created_after, created_before=created_before, resolve=resolve, include_comments=include_comments, comment_limit=comment_limit, fields=fields, max_items=max_items or None, offset=offset)
+
+    _run(ctx, query, from_file, workers, _normalized(ctx, fetch, accounts_file))
 
 @cli.command()
 @click.pass_context
@@ -97,45 +571,66 @@ def suggestions(ctx):
     suggested_users = api.suggestions()
     if suggested_users:
         for user in suggested_users:
-            print(json.dumps(user))
+            _emit(user)
 
 @cli.command()
 @click.pass_context
 def ads(ctx):
     """Pull ads."""
     api = ctx.obj
-    print(json.dumps(api.ads()))
+    _emit(api.ads())
 
 @cli.command()
-@click.argument("username")
+@click.argument("username", required=False)
 @click.option("--replies/--no-replies", default=False, help="Include replies.")
 @click.option("--created-after", type=click.DateTime(), help="Scrape posts on or after this date (YYYY-MM-DD).")
 @click.option("--created-before", type=click.DateTime(), help="Scrape posts on or before this date (YYYY-MM-DD).")
 @click.option("--pinned/--all", default=False, help="Only pull pinned posts.")
+@click.option("--max-pages", type=int, help="Fetch at most this many pages of the timeline.")
+@click.option("--sample", type=int, help="Output a random sample of this many posts from across the user's history, reading at most --max-pages pages (default 10).")
+@click.option("--backfill", is_flag=True, help="Split the timeline into ID ranges pulled concurrently by --workers sessions, for the full history of high-volume accounts.")
+@fields_option
+@raw_option
+@accounts_option
+@batch_options
 @click.pass_context
-def statuses(ctx, username: str, replies: bool, created_after: datetime, created_before: datetime, pinned: bool):
+def statuses(ctx, username: str, replies: bool, created_after: datetime, created_before: datetime, pinned: bool, max_pages: int, sample: int, backfill: bool, fields: list, raw: bool, accounts_file: str, from_file, workers: int):
     """Pull a user's posts (statuses)."""
     api = ctx.obj
     if created_after and created_after.tzinfo is None:
         created_after = created_after.replace(tzinfo=timezone.utc)
     if created_before and created_before.tzinfo is None:
         created_before = created_before.replace(tzinfo=timezone.utc)
+    if sample and (raw or pinned or created_after or created_before):
+        raise click.UsageError("--sample can't be combined with --raw, --pinned or a date range.")
+    if backfill and (sample or pinned or max_pages):
+        raise click.UsageError("--backfill can't be combined with --sample, --pinned or --max-pages.")
+
+    def fetch(target):
+        if backfill:
+            return backfill_statuses([api] * workers, target, replies=replies, created_after=created_after, created_before=created_before, fields=fields, raw=raw)
+        if sample:
+            return api.sample_statuses(target, sample, replies=replies, max_pages=max_pages or 10, fields=fields)
+        return api.pull_statuses(target, replies=replies, created_after=created_after, created_before=created_before, pinned=pinned, fields=fields, raw=raw, max_pages=max_pages)
 
-    for post in api.pull_statuses(username, replies=replies, created_after=created_after, created_before=created_before, pinned=pinned):
-        print(json.dumps(post))
+    _run(ctx, username, from_file, workers, _normalized(ctx, fetch, accounts_file, raw))
 
 @cli.command()
-@click.argument("post_id")
+@click.argument("post_id", required=False)
 @click.option("--limit", default=40, help="Number of likers per page.")
+@click.option("--max-items", type=int, help="Stop after this many likers.")
+@click.option("--sample-pages", type=int, default=0, help="Instead of paging through every liker, read the first page and this many pages from random points of the list.")
+@fields_option
+@raw_option
+@batch_options
 @click.pass_context
-def likes(ctx, post_id: str, limit: int):
+def likes(ctx, post_id: str, limit: int, max_items: int, sample_pages: int, fields: list, raw: bool, from_file, workers: int):
     """Pull the list of users who liked a post."""
     api = ctx.obj
-    for liker in api.user_likes(post_id, limit=limit):
-        print(json.dumps(liker))
+    _run(ctx, post_id, from_file, workers, lambda target: api.user_likes(target, limit=limit, fields=fields, raw=raw, max_items=max_items, sample_pages=sample_pages))
 
 @cli.command()
-@click.argument("post")
+@click.argument("post", required=False)
 @click.option(
     "--includeall", is_flag=True, help="return all comments on post. Overrides top_num."
 )
@@ -149,9 +644,13 @@ def likes(ctx, post_id: str, limit: int):
     help="Sort comments by a specific order.",
 )
 @click.argument("top_num", default=40)
+@fields_option
+@raw_option
+@accounts_option
+@batch_options
 @click.pass_context
-def comments(ctx, post, includeall, onlyfirst, top_num, sort):
+def comments(ctx, post, includeall, onlyfirst, top_num, sort, fields, raw, accounts_file, from_file, workers):
     """Pull the list of comments on a post"""
     api = ctx.obj
-    for page in api.pull_comments(post, includeall, onlyfirst, top_num, sort):
-        print(json.dumps(page))
\ No newline at end of file
+    fetch = _normalized(ctx, lambda target: api.pull_comments(target, includeall, onlyfirst, top_num, sort, fields=fields, raw=raw), accounts_file, raw)
+    _run(ctx, post, from_file, workers, fetch)
\ No newline at end of file
@@ -0,0 +1,206 @@
+import inspect
+import json
+import os
+import queue
+import socket
+import socketserver
+from datetime import datetime
+from typing import List
+
+from loguru import logger
+
+DEFAULT_SOCKET = os.getenv("TRUTHBRUSH_SOCKET") or os.path.join(os.path.expanduser("~"), ".truthbrush", "daemon.sock")
+
+# Api methods a daemon will run on behalf of clients.
+PUBLIC_METHODS = {
+    "search",
+    "search_windows",
+    "pull_statuses",
+    "sample_statuses",
+    "timeline_span",
+    "lookup",
+    "trending",
+    "pull_comments",
+    "suggestions",
+    "ads",
+    "user_likes",
+    "groupposts",
+    "trending_truths",
+    "tags",
+    "group_tags",
+    "trending_groups",
+    "suggested_groups",
+}
+
+
+class DaemonError(RuntimeError):
+    """An error raised by the daemon while running a request."""
+
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        return {"__datetime__": obj.isoformat()}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _object_hook(obj):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _encode(message: dict) -> bytes:
+    return json.dumps(message, default=_default).encode("utf-8") + b"\n"
+
+
+def _decode(line: bytes) -> dict:
+    return json.loads(line, object_hook=_object_hook)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def _send(self, message: dict):
+        self.wfile.write(_encode(message))
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = _decode(line)
+        method = request.get("method")
+        if method not in PUBLIC_METHODS:
+            self._send({"error": f"Unknown method '{method}'", "type": "ValueError"})
+            return
+
+        api = self.server.sessions.get()
+        try:
+            result = getattr(api, method)(*request.get("args", []), **request.get("kwargs", {}))
+            if inspect.isgenerator(result):
+                self._send({"stream": True})
+                try:
+                    while True:
+                        try:
+                            item = next(result)
+                        except StopIteration as stop:
+                            returned = stop.value  # a paginator's ApiError if it stopped early
+                            break
+                        self._send({"item": item})
+                finally:
+                    result.close()
+                self._send({"done": True, "result": returned})
+            else:
+                self._send({"result": result})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading; the session is still fine
+        except Exception as e:
+            logger.warning(f"Daemon request {method} failed: {e}")
+            try:
+                self._send({"error": str(e), "type": type(e).__name__})
+            except OSError:
+                pass
+        finally:
+            self.server.sessions.put(api)
+
+
+class SessionDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves ``Api`` methods to local clients over a Unix socket.
+
+    Each connection carries one request (a JSON line naming the method and its
+    arguments) and borrows one of the warm sessions for as long as it runs;
+    results stream back as JSON lines. Requests beyond the number of sessions
+    wait for a session to free up.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, sessions: List, socket_path: str = DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self.sessions = queue.Queue()
+        for api in sessions:
+            self.sessions.put(api)
+        self._all_sessions = list(sessions)
+
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+        if os.path.exists(socket_path):
+            if DaemonClient.available(socket_path):
+                raise RuntimeError(f"A daemon is already listening on {socket_path}")
+            os.unlink(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        for api in self._all_sessions:
+            api.quit()
+
+
+class DaemonClient:
+    """
+    Drop-in stand-in for ``Api`` that forwards calls to a running ``SessionDaemon``.
+
+    Generator methods (``pull_statuses``, ``search``, ...) return generators
+    that stream items as the daemon produces them.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET):
+        self.socket_path = socket_path
+
+    @staticmethod
+    def available(socket_path: str = DEFAULT_SOCKET) -> bool:
+        if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+            return False
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(0.5)
+                sock.connect(socket_path)
+            return True
+        except OSError:
+            return False
+
+    def __getattr__(self, name):
+        if name not in PUBLIC_METHODS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._call(name, args, kwargs)
+
+    def quit(self):
+        """Sessions belong to the daemon; nothing to close here."""
+
+    def _call(self, method: str, args, kwargs):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        reader = sock.makefile("rb")
+        try:
+            sock.sendall(_encode({"method": method, "args": list(args), "kwargs": kwargs}))
+            first = self._read(reader)
+        except BaseException:
+            reader.close()
+            sock.close()
+            raise
+        if "stream" not in first:
+            reader.close()
+            sock.close()
+            return first.get("result")
+        return self._stream(sock, reader)
+
+    def _stream(self, sock, reader):
+        try:
+            while True:
+                message = self._read(reader)
+                if "done" in message:
+                    return message.get("result")
+                yield message["item"]
+        finally:
+            reader.close()
+            sock.close()
+
+    @staticmethod
+    def _read(reader) -> dict:
+        line = reader.readline()
+        if not line:
+            raise DaemonError("Daemon closed the connection unexpectedly")
+        message = _decode(line)
+        if "error" in message:
+            raise DaemonError(f"{message.get('type', 'Error')}: {message['error']}")
+        return message
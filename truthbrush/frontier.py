@@ -0,0 +1,185 @@
+import heapq
+import math
+import random
+from itertools import count
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MODES = ("fifo", "yield", "unbiased")
+
+
+class FrontierScheduler:
+    """
+    Queue of users waiting to be crawled by the snowball scrapers.
+
+    ``fifo`` pops users in discovery order, ``unbiased`` pops a uniformly
+    random user (for research-sampling runs) and ``yield`` pops the user with
+    the highest expected number of on-topic posts, exploring a random user
+    with probability ``epsilon``.
+
+    The expected yield of a user is estimated from cheap signals only: the
+    smoothed hit rate of the user who led us to them and how many relevant
+    posts they liked.
+    """
+
+    def __init__(
+        self,
+        mode: str = "fifo",
+        epsilon: float = 0.1,
+        like_weight: float = 0.5,
+        prior_strength: float = 20.0,
+        rng: Optional[random.Random] = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown scheduler mode '{mode}'. Expected one of {MODES}.")
+        self.mode = mode
+        self.epsilon = epsilon
+        self.like_weight = like_weight
+        self.prior_strength = prior_strength
+        self.rng = rng or random.Random()
+
+        # username -> [likes, referrer, version]
+        self._queued: Dict[str, list] = {}
+        # Flat list + index map so random pops are O(1).
+        self._members: List[str] = []
+        self._index: Dict[str, int] = {}
+        # (key, seq, username, version); stale entries are skipped on pop.
+        self._heap: List[Tuple] = []
+        self._seq = count()
+        # username -> (hits, checked) for users that have been crawled
+        self._stats: Dict[str, Tuple[int, int]] = {}
+        self._totals = [0, 0]
+        # referrer -> users queued before the referrer's stats were known
+        self._children: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def __bool__(self) -> bool:
+        return bool(self._queued)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._queued
+
+    def __iter__(self) -> Iterator[str]:
+        if self.mode != "fifo":
+            return iter(list(self._members))
+        live = [e for e in self._heap if e[2] in self._queued and self._queued[e[2]][2] == e[3]]
+        return iter([e[2] for e in sorted(live)])
+
+    def add(self, username: str, referrer: Optional[str] = None) -> bool:
+        """
+        Queue a user, or strengthen the signal for an already queued one.
+
+        Every call for the same user counts as one more relevant post liked.
+        Returns True if the user was newly queued.
+        """
+        entry = self._queued.get(username)
+        if entry is not None:
+            entry[0] += 1
+            if entry[1] is None:
+                entry[1] = referrer
+            if self.mode == "yield":
+                self._push(username)
+            return False
+
+        self._queued[username] = [1, referrer, 0]
+        self._index[username] = len(self._members)
+        self._members.append(username)
+        if referrer is not None and referrer not in self._stats:
+            self._children.setdefault(referrer, []).append(username)
+        self._push(username)
+        return True
+
+    def extend(self, usernames, referrer: Optional[str] = None):
+        for username in usernames:
+            self.add(username, referrer=referrer)
+
+    def pop(self) -> str:
+        """Remove and return the next user to crawl."""
+        if not self._queued:
+            raise IndexError("pop from an empty frontier")
+
+        if self.mode == "unbiased" or (self.mode == "yield" and self.rng.random() < self.epsilon):
+            username = self._members[self.rng.randrange(len(self._members))]
+            self._remove(username)
+            return username
+
+        while True:
+            _, _, username, version = heapq.heappop(self._heap)
+            entry = self._queued.get(username)
+            if entry is not None and entry[2] == version:
+                self._remove(username)
+                return username
+
+    def record(self, username: str, hits: int, checked: int):
+        """Feed back how many of the posts checked for a crawled user were relevant."""
+        prev_hits, prev_checked = self._stats.get(username, (0, 0))
+        self._stats[username] = (prev_hits + hits, prev_checked + checked)
+        self._totals[0] += hits
+        self._totals[1] += checked
+        for child in self._children.pop(username, []):
+            if child in self._queued and self.mode == "yield":
+                self._push(child)
+
+    def shuffle(self):
+        """Randomize the crawl order. Only meaningful in ``fifo`` mode."""
+        if self.mode != "fifo":
+            return
+        order = list(self)
+        self.rng.shuffle(order)
+        self._heap = []
+        for username in order:
+            self._push(username)
+
+    def score(self, username: str) -> float:
+        """Expected relevant posts per post checked for a queued user."""
+        likes, referrer, _ = self._queued[username]
+        return self._referrer_rate(referrer) * (1 + self.like_weight * math.log1p(likes - 1))
+
+    def to_state(self) -> dict:
+        return {
+            "mode": self.mode,
+            "queued": [[u, self._queued[u][0], self._queued[u][1]] for u in self],
+            "stats": {u: list(s) for u, s in self._stats.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, **kwargs) -> "FrontierScheduler":
+        kwargs.setdefault("mode", state.get("mode", "fifo"))
+        scheduler = cls(**kwargs)
+        for username, (hits, checked) in state.get("stats", {}).items():
+            scheduler.record(username, hits, checked)
+        for username, likes, referrer in state.get("queued", []):
+            scheduler.add(username, referrer=referrer)
+            scheduler._queued[username][0] = likes
+            if scheduler.mode == "yield":
+                scheduler._push(username)
+        return scheduler
+
+    def _referrer_rate(self, referrer: Optional[str]) -> float:
+        total_hits, total_checked = self._totals
+        mean = (total_hits + 1) / (total_checked + 2)
+        if referrer is None or referrer not in self._stats:
+            return mean
+        hits, checked = self._stats[referrer]
+        return (hits + mean * self.prior_strength) / (checked + self.prior_strength)
+
+    def _push(self, username: str):
+        entry = self._queued[username]
+        entry[2] += 1
+        seq = next(self._seq)
+        if self.mode == "yield":
+            key = -self.score(username)
+        elif self.mode == "fifo":
+            key = seq
+        else:
+            return
+        heapq.heappush(self._heap, (key, seq, username, entry[2]))
+
+    def _remove(self, username: str):
+        del self._queued[username]
+        i = self._index.pop(username)
+        last = self._members.pop()
+        if last != username:
+            self._members[i] = last
+            self._index[last] = i
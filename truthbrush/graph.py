@@ -0,0 +1,249 @@
+import glob
+import json
+import os
+import sys
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+AUTHORED = 0
+LIKED = 1
+EDGE_KINDS = {"authored": AUTHORED, "liked": LIKED}
+
+NODES_FILE = "nodes.txt"
+CHUNK_PATTERN = "edges-*.u32"
+CSR_MANIFEST = "csr.json"
+
+
+def _user_key(acct: str) -> str:
+    return f"u:{acct}"
+
+
+def _post_key(post_id: str) -> str:
+    return f"p:{post_id}"
+
+
+def _write_u32(values: array, path: str):
+    if sys.byteorder == "big":
+        values = array("I", values)
+        values.byteswap()
+    with open(path, "wb") as f:
+        values.tofile(f)
+
+
+def _read_u32(path: str) -> array:
+    values = array("I")
+    with open(path, "rb") as f:
+        data = f.read()
+    values.frombytes(data[: len(data) - len(data) % values.itemsize])  # a write cut short by a crash
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _load_nodes(directory: str) -> List[str]:
+    path = os.path.join(directory, NODES_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f]
+
+
+class EngagementGraphWriter:
+    """
+    Append-only store for the user -> post -> liker edges seen while crawling.
+
+    Users and posts are interned to integer IDs (``nodes.txt``, one key per
+    line, line number = ID). Edges are buffered as ``(src, dst, kind)`` uint32
+    triples and flushed to ``edges-NNNNNN.u32`` every ``chunk_size`` edges, so
+    a crash loses at most one chunk. Re-opening a directory resumes it.
+    Safe to share between threads.
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 65536):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._names = _load_nodes(directory)
+        self._ids: Dict[str, int] = {name: i for i, name in enumerate(self._names)}
+        self._flushed_nodes = len(self._names)
+        self._chunk_index = len(glob.glob(os.path.join(directory, CHUNK_PATTERN)))
+        self._buffer = array("I")
+        self._seen = set()
+
+    def _intern(self, key: str) -> int:
+        node_id = self._ids.get(key)
+        if node_id is None:
+            node_id = len(self._names)
+            self._ids[key] = node_id
+            self._names.append(key)
+        return node_id
+
+    def _add_edge(self, src_key: str, dst_key: str, kind: int):
+        src = self._intern(src_key)
+        dst = self._intern(dst_key)
+        edge = (src, dst, kind)
+        if edge in self._seen:
+            return
+        self._seen.add(edge)
+        self._buffer.extend(edge)
+        if len(self._buffer) >= 3 * self.chunk_size:
+            self._flush()
+
+    def add_like(self, post_id: str, liker: str, author: Optional[str] = None):
+        """Record that ``liker`` liked ``post_id`` (and, if given, that ``author`` wrote it)."""
+        with self._lock:
+            if author:
+                self._add_edge(_user_key(author), _post_key(post_id), AUTHORED)
+            self._add_edge(_user_key(liker), _post_key(post_id), LIKED)
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._flushed_nodes < len(self._names):
+            with open(os.path.join(self.directory, NODES_FILE), "a", encoding="utf-8") as f:
+                for name in self._names[self._flushed_nodes:]:
+                    f.write(name + "\n")
+            self._flushed_nodes = len(self._names)
+        if self._buffer:
+            path = os.path.join(self.directory, f"edges-{self._chunk_index:06d}.u32")
+            _write_u32(self._buffer, path)
+            self._chunk_index += 1
+            self._buffer = array("I")
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EngagementGraph:
+    """
+    Read-only CSR view over a directory written by ``EngagementGraphWriter``.
+
+    Both directions are indexed: ``out`` goes from users to the posts they
+    authored or liked, ``in`` from posts back to their authors and likers.
+    The CSR arrays are cached next to the edge chunks and reused as long as
+    no new chunks have been written.
+    """
+
+    def __init__(self, names: List[str], csr: Dict[str, Dict[str, array]]):
+        self._names = names
+        self._ids = {name: i for i, name in enumerate(names)}
+        self._csr = csr
+
+    @classmethod
+    def load(cls, directory: str, cache: bool = True) -> "EngagementGraph":
+        names = _load_nodes(directory)
+        chunks = sorted(glob.glob(os.path.join(directory, CHUNK_PATTERN)))
+        manifest_path = os.path.join(directory, CSR_MANIFEST)
+
+        if cache and os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("chunks") == len(chunks) and manifest.get("nodes") == len(names):
+                csr = {
+                    direction: {
+                        part: _read_u32(os.path.join(directory, f"csr-{direction}.{part}.u32"))
+                        for part in ("indptr", "indices", "kinds")
+                    }
+                    for direction in ("out", "in")
+                }
+                return cls(names, csr)
+
+        # Chunks written by different runs may repeat an edge; drop duplicates.
+        # A chunk cut short by a crash loses its trailing partial triple, and
+        # edges to nodes whose names were never written are skipped.
+        edges = array("I")
+        seen = set()
+        for chunk in chunks:
+            raw = _read_u32(chunk)
+            for i in range(0, len(raw) - len(raw) % 3, 3):
+                edge = (raw[i], raw[i + 1], raw[i + 2])
+                if edge[0] >= len(names) or edge[1] >= len(names):
+                    continue
+                if edge not in seen:
+                    seen.add(edge)
+                    edges.extend(edge)
+        csr = {
+            "out": cls._build_csr(edges, len(names), src_offset=0, dst_offset=1),
+            "in": cls._build_csr(edges, len(names), src_offset=1, dst_offset=0),
+        }
+        if cache:
+            for direction, parts in csr.items():
+                for part, values in parts.items():
+                    _write_u32(values, os.path.join(directory, f"csr-{direction}.{part}.u32"))
+            with open(manifest_path, "w") as f:
+                json.dump({"chunks": len(chunks), "nodes": len(names)}, f)
+        return cls(names, csr)
+
+    @staticmethod
+    def _build_csr(edges: array, num_nodes: int, src_offset: int, dst_offset: int) -> Dict[str, array]:
+        num_edges = len(edges) // 3
+        indptr = array("I", bytes(4 * (num_nodes + 1)))
+        for i in range(src_offset, len(edges), 3):
+            indptr[edges[i] + 1] += 1
+        for node in range(num_nodes):
+            indptr[node + 1] += indptr[node]
+
+        cursor = array("I", indptr[:-1]) if num_nodes else array("I")
+        indices = array("I", bytes(4 * num_edges))
+        kinds = array("I", bytes(4 * num_edges))
+        for i in range(0, len(edges), 3):
+            src = edges[i + src_offset]
+            pos = cursor[src]
+            indices[pos] = edges[i + dst_offset]
+            kinds[pos] = edges[i + 2]
+            cursor[src] = pos + 1
+        return {"indptr": indptr, "indices": indices, "kinds": kinds}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self._csr["out"]["indices"])
+
+    def node_id(self, key: str) -> int:
+        return self._ids[key]
+
+    def node_name(self, node_id: int) -> str:
+        return self._names[node_id]
+
+    def user(self, acct: str) -> int:
+        return self.node_id(_user_key(acct))
+
+    def post(self, post_id: str) -> int:
+        return self.node_id(_post_key(post_id))
+
+    def _range(self, node_id: int, direction: str):
+        indptr = self._csr[direction]["indptr"]
+        return indptr[node_id], indptr[node_id + 1]
+
+    def degree(self, node_id: int, direction: str = "out", kind: Optional[str] = None) -> int:
+        start, end = self._range(node_id, direction)
+        if kind is None:
+            return end - start
+        kinds = self._csr[direction]["kinds"]
+        wanted = EDGE_KINDS[kind]
+        return sum(1 for i in range(start, end) if kinds[i] == wanted)
+
+    def neighbors(self, node_id: int, direction: str = "out", kind: Optional[str] = None) -> Iterator[int]:
+        start, end = self._range(node_id, direction)
+        indices = self._csr[direction]["indices"]
+        kinds = self._csr[direction]["kinds"]
+        wanted = None if kind is None else EDGE_KINDS[kind]
+        for i in range(start, end):
+            if wanted is None or kinds[i] == wanted:
+                yield indices[i]
+
+    def likers(self, post_id: str) -> List[str]:
+        """Accounts recorded as having liked a post."""
+        return [self.node_name(n)[2:] for n in self.neighbors(self.post(post_id), "in", "liked")]
@@ -0,0 +1,53 @@
+"""
+JSON helpers for raw output, where items are passed through as the server sent them.
+
+orjson is used for re-encoding when it is installed (``pip install truthbrush[fast]``).
+"""
+import json
+import re
+from typing import Any, Iterator, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+_decoder = json.JSONDecoder()
+_SEPARATOR = re.compile(r"[\s,]*")
+
+
+def dumps(obj: Any) -> str:
+    """Compact single-line JSON, via orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def loads(data):
+    """Decode ``str`` or ``bytes``, via orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def iter_array(text: str) -> Iterator[Tuple[Any, str]]:
+    """
+    Yield ``(item, source)`` for each element of the JSON array in ``text``,
+    where ``source`` is the element's exact text. Emitting ``source`` instead
+    of ``json.dumps(item)`` skips re-encoding; the decoded ``item`` is still
+    there for paging and filtering.
+    """
+    pos = _SEPARATOR.match(text).end()
+    if not text.startswith("[", pos):
+        raise ValueError(f"Expected a JSON array, got {text[pos:pos + 40]!r}")
+    pos += 1
+    while True:
+        pos = _SEPARATOR.match(text, pos).end()
+        if text.startswith("]", pos) or pos >= len(text):
+            return
+        item, end = _decoder.raw_decode(text, pos)
+        source = text[pos:end]
+        if "\n" in source:  # pretty-printed response; keep JSONL one item per line
+            source = dumps(item)
+        yield item, source
+        pos = end
@@ -0,0 +1,270 @@
+"""
+Media archiving: attachment, card, avatar and header files referenced by statuses.
+
+Files are stored content-addressed under their SHA-256, so an image
+reshared under many URLs (or an avatar seen on every post) is kept once.
+Downloads run on a bounded thread pool, stream to a partial file, and are
+resumed with a ``Range`` request if a previous run was interrupted and
+the remote file is unchanged.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from .api import _thread_session
+from .metrics import QUEUE_DEPTH
+from .normalize import NESTED_STATUS_KEYS
+from .profiling import phase
+
+DEFAULT_MEDIA_DIR = os.getenv("TRUTHBRUSH_MEDIA") or os.path.join(os.path.expanduser("~"), ".truthbrush", "media")
+ACCOUNT_MEDIA_KEYS = ("avatar", "avatar_static", "header", "header_static")
+CHUNK_SIZE = 256 * 1024
+_CONTENT_RANGE = re.compile(r"bytes (?:(\d+)-\d+|\*)/(\d+)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    content_type TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS media_sha256 ON media (sha256);
+"""
+
+
+def media_urls(status: dict) -> Iterator[str]:
+    """Yield the media URLs in a status: attachments, link card image, and the author's avatar and header, recursing into reblogs and quotes."""
+    if not isinstance(status, dict):
+        return
+    for attachment in status.get("media_attachments") or []:
+        if isinstance(attachment, dict) and (attachment.get("url") or attachment.get("remote_url")):
+            yield attachment.get("url") or attachment.get("remote_url")
+    card = status.get("card")
+    if isinstance(card, dict) and card.get("image"):
+        yield card["image"]
+    account = status.get("account")
+    if isinstance(account, dict):
+        for key in ACCOUNT_MEDIA_KEYS:
+            if account.get(key):
+                yield account[key]
+    for key in NESTED_STATUS_KEYS:
+        yield from media_urls(status.get(key))
+
+
+def unique_media_urls(statuses: Iterable[dict]) -> Iterator[str]:
+    """``media_urls`` of every status, each URL once. Works on a live generator as well as a file."""
+    seen = set()
+    for status in statuses:
+        for url in media_urls(status):
+            if url.startswith(("http://", "https://")) and url not in seen:
+                seen.add(url)
+                yield url
+
+
+class MediaStore:
+    """
+    Content-addressed media files under ``root``: ``ab/cd/abcd...ef.jpg``
+    named by SHA-256, with an SQLite index from URL to file. Safe to share
+    between threads.
+    """
+
+    def __init__(self, root: str = DEFAULT_MEDIA_DIR):
+        self.root = root
+        self.partial_dir = os.path.join(root, ".partial")
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(DISTINCT sha256) FROM media").fetchone()[0]
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """The stored record for ``url`` if its file is still on disk."""
+        with self._lock:
+            row = self._db.execute("SELECT sha256, path, size, content_type FROM media WHERE url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(os.path.join(self.root, row[1])):
+            return None
+        return dict(url=url, sha256=row[0], path=row[1], size=row[2], content_type=row[3])
+
+    def partial_path(self, url: str) -> str:
+        return os.path.join(self.partial_dir, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def commit(self, url: str, partial: str, content_type: str = None) -> dict:
+        """Move a finished download into place under its hash (or drop it if those bytes are already stored) and index it."""
+        digest = hashlib.sha256()
+        with phase("media_hash"), open(partial, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        size = os.path.getsize(partial)
+        path = os.path.join(sha256[:2], sha256[2:4], sha256 + _extension(url, content_type))
+        target = os.path.join(self.root, path)
+        with self._lock:
+            existing = self._db.execute("SELECT path FROM media WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+            if existing and os.path.exists(os.path.join(self.root, existing[0])):
+                path = existing[0]
+                os.remove(partial)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(partial, target)
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO media (url, sha256, path, size, content_type, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, sha256, path, size, content_type, time.time()),
+                )
+        return dict(url=url, sha256=sha256, path=path, size=size, content_type=content_type)
+
+
+def _content_range(header: str) -> Tuple[Optional[int], Optional[int]]:
+    """``(first byte, total size)`` from a ``Content-Range`` header; either is ``None`` if not given."""
+    match = _CONTENT_RANGE.fullmatch((header or "").strip())
+    if not match:
+        return None, None
+    return (int(match.group(1)) if match.group(1) else None), int(match.group(2))
+
+
+def _discard(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _extension(url: str, content_type: str = None) -> str:
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    if ext and len(ext) <= 6 and ext[1:].isalnum():
+        return ext
+    guessed = mimetypes.guess_extension((content_type or "").split(";")[0].strip()) if content_type else None
+    return guessed or ""
+
+
+class MediaDownloader:
+    """
+    Download media into a ``MediaStore`` on ``workers`` threads. URLs already
+    in the store are skipped. An interrupted download resumes from its
+    partial file, with the ``ETag`` (or ``Last-Modified``) it started under
+    sent as ``If-Range``, so a file that changed since is fetched again from
+    the start; without either, it always starts over.
+    """
+
+    def __init__(self, store: MediaStore, workers: int = 8, timeout: float = 120):
+        self.store = store
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._http = threading.local()
+
+    def _session(self):
+        return _thread_session(self._http)
+
+    def download(self, url: str) -> dict:
+        """
+        Fetch one URL (unless already stored) and return its record. Raises
+        ``IOError`` on HTTP errors and on responses shorter than announced.
+        """
+        record = self.store.lookup(url)
+        if record is not None:
+            return dict(record, cached=True)
+        partial = self.store.partial_path(url)
+        validator_path = partial + ".validator"
+        validator = None
+        if os.path.exists(validator_path):
+            with open(validator_path, "r", encoding="utf-8") as f:
+                validator = f.read().strip() or None
+        offset = os.path.getsize(partial) if validator and os.path.exists(partial) else 0
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+        with phase("media_download"):
+            response = self._session().get(url, headers=headers, stream=True, timeout=self.timeout)
+            try:
+                content_type = response.headers.get("Content-Type")
+                if response.status_code == 416 and offset:
+                    total = _content_range(response.headers.get("Content-Range"))[1]
+                    if total != offset:  # the partial file is not the whole of the current file
+                        return self._restart(url, partial, validator_path)
+                elif response.status_code in (200, 206):
+                    if response.status_code == 206:
+                        start, total = _content_range(response.headers.get("Content-Range"))
+                        if start != offset:
+                            if not offset:
+                                raise IOError(f"Unexpected Content-Range for {url}: {response.headers.get('Content-Range')}")
+                            return self._restart(url, partial, validator_path)
+                        mode = "ab"
+                    else:  # a fresh download, a changed file, or a server that ignores Range
+                        length = response.headers.get("Content-Length")
+                        total = int(length) if length and length.isdigit() and not response.headers.get("Content-Encoding") else None
+                        mode = "wb"
+                        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                        if validator:
+                            with open(validator_path, "w", encoding="utf-8") as f:
+                                f.write(validator)
+                        else:
+                            _discard(validator_path)
+                    with open(partial, mode) as f:
+                        for chunk in response.iter_content():
+                            f.write(chunk)
+                    size = os.path.getsize(partial)
+                    if total is not None and size != total:
+                        if size > total:
+                            _discard(partial, validator_path)
+                        raise IOError(f"Download of {url} stopped at {size} of {total} bytes")
+                else:
+                    raise IOError(f"HTTP error! status: {response.status_code} for {url}")
+            finally:
+                response.close()
+        record = self.store.commit(url, partial, content_type)
+        _discard(validator_path)
+        return dict(record, cached=False)
+
+    def _restart(self, url: str, partial: str, validator_path: str) -> dict:
+        logger.info(f"Partial download of {url} does not match the remote file; starting over")
+        _discard(partial, validator_path)
+        return self.download(url)
+
+    def download_all(self, urls: Iterable[str]) -> Iterator[Tuple[str, object]]:
+        """
+        Download every URL and yield ``(url, record)``, or ``(url, exception)``
+        for failures, as downloads finish. ``urls`` is consumed lazily, with
+        at most twice ``workers`` downloads in flight.
+        """
+        urls = iter(urls)
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="truthbrush-media") as executor:
+            while True:
+                while len(pending) < 2 * self.workers:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+                    pending[executor.submit(self.download, url)] = url
+                QUEUE_DEPTH.set(len(pending), queue="media")
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = pending.pop(future)
+                    try:
+                        yield url, future.result()
+                    except Exception as e:
+                        logger.warning(f"Could not download {url}: {e}")
+                        yield url, e
@@ -0,0 +1,267 @@
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Sequence, Tuple
+
+from .profiling import phase
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_label(url: str) -> str:
+    """Collapse numeric path segments so ``/v1/accounts/123/statuses`` becomes ``/v1/accounts/:id/statuses``."""
+    return _ID_SEGMENT.sub("/:id", url.split("?", 1)[0])
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> str:
+        return f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        """Every label combination and its value."""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> str:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+        return self.header() + "".join(line + "\n" for line in lines)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def sum(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return state[1] if state else 0.0
+
+    def totals(self) -> Tuple[float, int]:
+        """Sum and count of observations across every label combination."""
+        with self._lock:
+            return sum(v[1] for v in self._values.values()), sum(v[2] for v in self._values.values())
+
+    def render(self) -> str:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, bucket_counts):
+                cumulative += n
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return self.header() + "".join(line + "\n" for line in lines)
+
+
+class Registry:
+    """A named collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        uptime = f"# HELP truthbrush_uptime_seconds Seconds since metrics collection started.\n" \
+                 f"# TYPE truthbrush_uptime_seconds gauge\n" \
+                 f"truthbrush_uptime_seconds {_format_value(round(time.time() - self.started_at, 3))}\n"
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return uptime + "".join(metric.render() for metric in metrics)
+
+    def write_textfile(self, path: str):
+        """Atomically write the current metrics, e.g. for node_exporter's textfile collector."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Expose ``/metrics`` over HTTP from a daemon thread. Returns the server so callers can shut it down."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        threading.Thread(target=server.serve_forever, name="truthbrush-metrics", daemon=True).start()
+        return server
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "truthbrush_request_duration_seconds", "Latency of API requests, including the WebDriver round-trip.", ["endpoint"]
+)
+REQUESTS = REGISTRY.counter("truthbrush_requests_total", "API requests by endpoint and HTTP status.", ["endpoint", "status"])
+REQUEST_ERRORS = REGISTRY.counter("truthbrush_request_errors_total", "Failed API requests by endpoint and status.", ["endpoint", "status"])
+PAGES = REGISTRY.counter("truthbrush_pages_total", "Result pages received.", ["endpoint"])
+ITEMS = REGISTRY.counter("truthbrush_items_total", "Items received across all pages.", ["endpoint"])
+RETRIES = REGISTRY.counter("truthbrush_retries_total", "Requests retried after a transient failure, by endpoint and status.", ["endpoint", "status"])
+CIRCUIT_OPENS = REGISTRY.counter("truthbrush_circuit_opens_total", "Times a session's circuit breaker opened.", ["name"])
+ACCOUNT_REQUESTS = REGISTRY.counter("truthbrush_account_requests_total", "Requests routed to each pooled account.", ["account"])
+ACCOUNT_COOLDOWNS = REGISTRY.counter("truthbrush_account_cooldowns_total", "Times a pooled account was throttled and cooled down.", ["account"])
+CONCURRENCY_LIMIT = REGISTRY.gauge("truthbrush_concurrency_limit", "Work items allowed in flight by the concurrency controller.", ["name"])
+CONCURRENCY_IN_FLIGHT = REGISTRY.gauge("truthbrush_concurrency_in_flight", "Work items in flight under the concurrency controller.", ["name"])
+SLEEP_SECONDS = REGISTRY.counter("truthbrush_sleep_seconds_total", "Time spent deliberately sleeping.", ["reason"])
+QUEUE_DEPTH = REGISTRY.gauge("truthbrush_queue_depth", "Current number of queued work items.", ["queue"])
+
+
+def timed_sleep(seconds: float, reason: str = "pagination"):
+    """``time.sleep`` that is accounted for in ``truthbrush_sleep_seconds_total``."""
+    if seconds <= 0:
+        return
+    with phase("sleep"):
+        time.sleep(seconds)
+    SLEEP_SECONDS.inc(seconds, reason=reason)
+
+
+def request_totals() -> Dict[str, float]:
+    """
+    Requests made by this process so far: ``requests``, ``throttled`` (429),
+    ``errors`` (5xx and network failures) and ``latency`` (total seconds).
+    """
+    totals = dict(requests=0.0, throttled=0.0, errors=0.0)
+    status_index = REQUESTS.labelnames.index("status")
+    for key, n in REQUESTS.snapshot().items():
+        status = key[status_index]
+        totals["requests"] += n
+        if status == "429":
+            totals["throttled"] += n
+        elif status == "network" or status.startswith("5"):
+            totals["errors"] += n
+    totals["latency"] = REQUEST_LATENCY.totals()[0]
+    return totals
+
+
+def record_request(url: str, elapsed: float, status, result=None):
+    endpoint = endpoint_label(url)
+    REQUEST_LATENCY.observe(elapsed, endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, status=status)
+    if str(status) == "304":
+        return
+    if str(status) != "200":
+        REQUEST_ERRORS.inc(endpoint=endpoint, status=status)
+        return
+    if isinstance(result, list):
+        record_page(url, len(result))
+    elif isinstance(result, dict):
+        lists = [v for v in result.values() if isinstance(v, list)]
+        if lists:
+            record_page(url, sum(len(v) for v in lists))
+
+
+def record_page(url: str, items: int):
+    """Count a page of ``items`` results; raw pages are counted once split, as ``record_request`` never sees their items."""
+    endpoint = endpoint_label(url)
+    PAGES.inc(endpoint=endpoint)
+    ITEMS.inc(items, endpoint=endpoint)
@@ -1,24 +1,64 @@
+import itertools
 import json
 import os
-import time
 import random
 import threading
+from contextlib import nullcontext
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from collections import deque
 from truthbrush.api import Api, LoginErrorException
+from truthbrush.autoscale import ConcurrencyController
+from truthbrush.frontier import FrontierScheduler
+from truthbrush.graph import EngagementGraphWriter
+from truthbrush.metrics import QUEUE_DEPTH, REGISTRY, timed_sleep
+from truthbrush.normalize import AccountNormalizer
+from truthbrush.pagecache import PageCache
+from truthbrush.pipeline import Pipeline, match_statuses
+from truthbrush.pool import PooledApi, load_credentials
 
 # --- Configuration ---
 TOPIC = "Ukraine"
 TARGET_POST_COUNT = 10000
 MAX_POSTS_TO_CHECK_PER_USER = 500 
+MAX_PAGES_PER_USER = 25  # Timeline pages fetched per user, however many posts they have
 OUTPUT_FILE = f"{TOPIC}_snowball_posts.jsonl"
+# Fields to fetch for each status while checking timelines. None keeps whole
+# posts in OUTPUT_FILE; ["id", "created_at", "content", "account.acct"] is all
+# the keyword filter itself needs and moves several times less data per page.
+POST_FIELDS = None
+# Set to a path (e.g. f"{TOPIC}_accounts.jsonl") to write each distinct account
+# there once and store only its account_id in the posts written to OUTPUT_FILE.
+ACCOUNTS_FILE = None
 
 # --- Unbiased Performance Optimizations ---
 MAX_CONCURRENT_SESSIONS = 3  # Parallel sessions for speed
+# Use between 1 and MAX_CONCURRENT_SESSIONS sessions at a time, starting with 2:
+# more while requests stay fast and error-free, fewer on throttling, errors or
+# memory pressure. False always uses every session.
+AUTOSCALE = True
+# JSON file of accounts ([{"username", "password", "rate"}, ...]) to spread
+# requests over. None uses TRUTHSOCIAL_USERNAME/PASSWORD, plus any numbered
+# TRUTHSOCIAL_USERNAME_N/PASSWORD_N pairs, from the environment or .env.
+CREDENTIALS_FILE = None
+ACCOUNT_RATE = 0.5  # Requests per second per account, unless its credentials set a rate
+# Fetch timelines on one thread per session, match posts against TOPIC in a
+# process pool and write results on the main thread, with no batch barrier
+# between users. False uses the batch-at-a-time workers below.
+PIPELINE = True
+CPU_WORKERS = None  # Processes matching posts; None uses one per CPU
+PIPELINE_ROUND = 200  # Users per pipeline round; seeds are expanded between rounds
 BATCH_SIZE = 30  # Users per batch (smaller to maintain randomness)
 USER_SHUFFLE_FREQUENCY = 100  # Reshuffle user queue every N users
 RANDOM_SEED_EXPANSION = True  # Continuously discover new seed users
 DIVERSE_SEARCH_TERMS = [TOPIC, f"#{TOPIC}", f"{TOPIC.lower()}", f"@{TOPIC}"]  # Multiple search variations
+LIKER_SAMPLE_PAGES = 2  # Pages of likers read from random points of each like list, after the first
+SEED_RESULTS_PER_ROUND = 500  # Search results read per term in each seed expansion round
+# Search result pages are cached here for SEARCH_CACHE_TTL seconds, so seed
+# rounds and reruns on other topics never fetch the same page twice.
+SEARCH_CACHE_TTL = 6 * 3600
+# "unbiased" pops users uniformly at random; switch to "yield" to crawl the
+# most promising users first when representativeness is not required.
+SCHEDULER_MODE = "unbiased"
 
 # --- State Files ---
 STATE_DIR = "scraper_state"
@@ -26,37 +66,68 @@ USERS_TO_SCRAPE_FILE = os.path.join(STATE_DIR, f"{TOPIC}_users_to_scrape.json")
 SCRAPED_USERS_FILE = os.path.join(STATE_DIR, f"{TOPIC}_scraped_users.json")
 COLLECTED_POST_IDS_FILE = os.path.join(STATE_DIR, f"{TOPIC}_collected_post_ids.json")
 SEED_SEARCH_OFFSET_FILE = os.path.join(STATE_DIR, f"{TOPIC}_search_offset.json")
+SEARCH_CACHE_FILE = os.path.join(STATE_DIR, "search_pages.db")  # shared by all topics
+FRONTIER_FILE = os.path.join(STATE_DIR, f"{TOPIC}_frontier.json")
+GRAPH_DIR = os.path.join(STATE_DIR, f"{TOPIC}_graph")  # user -> post -> liker edges
+
+# --- Metrics ---
+METRICS_PORT = None  # e.g. 9108 to expose http://127.0.0.1:9108/metrics
+METRICS_FILE = os.path.join(STATE_DIR, f"{TOPIC}_metrics.prom")
+
+POSTS_COLLECTED = REGISTRY.counter("truthbrush_posts_collected_total", "Relevant posts written by the scraper.", ["topic"])
+USERS_SCRAPED = REGISTRY.counter("truthbrush_users_scraped_total", "Users whose timelines were checked.", ["topic"])
+
+
+def classify_chunk(target, chunk):
+    """CPU stage of the pipeline: the posts about TOPIC in a chunk of a timeline, or a random few of a post's likers"""
+    if target[0] == "likers":
+        likers = [liker['acct'] for liker in chunk if liker.get('acct')]
+        return random.sample(likers, min(5, len(likers)))
+    return match_statuses([TOPIC], target, chunk)
+
 
 class UnbiasedSnowballScraper:
     def __init__(self):
-        self.users_to_scrape = deque()
+        self.users_to_scrape = FrontierScheduler(mode=SCHEDULER_MODE)
         self.scraped_users = set()
         self.collected_post_ids = set()
-        self.search_offset = 0  # Track search pagination for diverse seeds
+        self.search_offsets = {}  # Results already read per seed search term
+        self.page_cache = None
         self.lock = threading.Lock()
         self.session_pool = []
+        self.concurrency = ConcurrencyController(name="scraper", maximum=MAX_CONCURRENT_SESSIONS) if AUTOSCALE else None
+        self.graph = None
+        self.accounts = None
         
     def initialize_state(self):
         if not os.path.exists(STATE_DIR): 
             os.makedirs(STATE_DIR)
         print(f"✅ State directory: '{STATE_DIR}'")
+        self.graph = EngagementGraphWriter(GRAPH_DIR)
+        if ACCOUNTS_FILE:
+            self.accounts = AccountNormalizer.open(ACCOUNTS_FILE)
+        if SEARCH_CACHE_TTL:
+            self.page_cache = PageCache(SEARCH_CACHE_FILE, ttl=SEARCH_CACHE_TTL)
         
         # Load existing state
-        self.users_to_scrape = deque(self.load_state_list(USERS_TO_SCRAPE_FILE))
+        frontier_state = self.load_state_dict(FRONTIER_FILE)
+        if frontier_state:
+            self.users_to_scrape = FrontierScheduler.from_state(frontier_state, mode=SCHEDULER_MODE)
+        else:
+            self.users_to_scrape.extend(self.load_state_list(USERS_TO_SCRAPE_FILE))
         self.scraped_users = self.load_state_set(SCRAPED_USERS_FILE)
         self.collected_post_ids = self.load_state_set(COLLECTED_POST_IDS_FILE)
-        self.search_offset = self.load_state_dict(SEED_SEARCH_OFFSET_FILE).get('offset', 0)
+        offset_state = self.load_state_dict(SEED_SEARCH_OFFSET_FILE)
+        self.search_offsets = offset_state.get('offsets') or {term: offset_state.get('offset', 0) for term in DIVERSE_SEARCH_TERMS}
         
         # Immediately randomize existing users to remove any previous bias
         if self.users_to_scrape:
-            user_list = list(self.users_to_scrape)
-            random.shuffle(user_list)
-            self.users_to_scrape = deque(user_list)
-            print(f"🎲 Randomized {len(self.users_to_scrape)} existing users")
+            self.users_to_scrape.shuffle()
+            print(f"🎲 Loaded {len(self.users_to_scrape)} existing users ({SCHEDULER_MODE} order)")
 
     def save_state(self, data, filepath):
         with open(filepath, 'w') as f: 
-            json.dump(list(data) if isinstance(data, (set, deque)) else data, f)
+            json.dump(list(data) if isinstance(data, (set, deque, FrontierScheduler)) else data, f)
 
     def load_state_set(self, filepath):
         if not os.path.exists(filepath): return set()
@@ -72,13 +143,25 @@ class UnbiasedSnowballScraper:
 
     def create_session_pool(self):
         """Create browser session pool for parallel processing"""
+        credentials = load_credentials(CREDENTIALS_FILE)
+        if len(credentials) > 1:
+            print(f"🔄 Logging in {len(credentials)} accounts...")
+            try:
+                pool = PooledApi(credentials, page_cache=self.page_cache, account_rate=ACCOUNT_RATE)
+            except LoginErrorException as e:
+                print(f"  ⚠️ {e}")
+                return
+            # Every worker shares the pool; each request goes to the account with the most budget left
+            self.session_pool = [pool] * MAX_CONCURRENT_SESSIONS
+            print(f"  ✅ {len(pool.accounts)} accounts ready")
+            return
         print(f"🔄 Creating {MAX_CONCURRENT_SESSIONS} browser sessions...")
         for i in range(MAX_CONCURRENT_SESSIONS):
             try:
-                api = Api()
+                api = Api(page_cache=self.page_cache)
                 self.session_pool.append(api)
                 print(f"  ✅ Session {i+1} ready")
-                time.sleep(1)  # Stagger session creation
+                timed_sleep(1, reason="scraper")  # Stagger session creation
             except Exception as e:
                 print(f"  ⚠️ Failed to create session {i+1}: {e}")
 
@@ -97,18 +180,24 @@ class UnbiasedSnowballScraper:
                     posts = api_session.search(
                         searchtype="statuses", 
                         query=search_term,
-                        limit=500,
-                        offset=self.search_offset  # Paginate through results
+                        limit=40,
+                        max_items=SEED_RESULTS_PER_ROUND,
+                        offset=self.search_offsets.get(search_term, 0),  # Continue where the last round stopped
+                        fields=["account.acct"],
                     )
                     
+                    read = found = 0
                     for post in posts:
+                        read += 1
                         if 'account' in post and 'acct' in post['account']:
+                            found += 1
                             username = post['account']['acct']
                             if username not in self.scraped_users:
                                 new_users.add(username)
+                    self.search_offsets[search_term] = self.search_offsets.get(search_term, 0) + read
                                 
-                    print(f"  🔍 '{search_term}': found {len([p for p in posts if 'account' in p])} users")
-                    time.sleep(0.5)  # Respectful delay between searches
+                    print(f"  🔍 '{search_term}': found {found} users")
+                    timed_sleep(0.5, reason="scraper")  # Respectful delay between searches
                     
                 except Exception as e:
                     print(f"  ⚠️ Search failed for '{search_term}': {e}")
@@ -120,7 +209,8 @@ class UnbiasedSnowballScraper:
                 recent_posts = api_session.search(
                     searchtype="statuses",
                     query=TOPIC,
-                    limit=300
+                    limit=300,
+                    fields=["account.acct"],
                 )
                 
                 for post in recent_posts:
@@ -132,17 +222,16 @@ class UnbiasedSnowballScraper:
             except Exception as e:
                 print(f"  ⚠️ Recent posts search failed: {e}")
             
-            # Update search offset for next round (pagination)
-            self.search_offset += 500
-            self.save_state({'offset': self.search_offset}, SEED_SEARCH_OFFSET_FILE)
+            # Save search offsets for the next round (pagination)
+            self.save_state({'offsets': self.search_offsets}, SEED_SEARCH_OFFSET_FILE)
             
             # Randomize and add new users
             new_users_list = list(new_users)
             random.shuffle(new_users_list)
             
             for user in new_users_list:
-                if user not in [u for u in self.users_to_scrape]:
-                    self.users_to_scrape.append(user)
+                if user not in self.users_to_scrape:
+                    self.users_to_scrape.add(user)
             
             print(f"🌱 Added {len(new_users_list)} diverse seed users (total queue: {len(self.users_to_scrape)})")
             
@@ -151,31 +240,29 @@ class UnbiasedSnowballScraper:
 
     def randomize_user_queue(self):
         """Periodically randomize user queue to prevent order bias"""
-        if len(self.users_to_scrape) > 10:
-            user_list = list(self.users_to_scrape)
-            random.shuffle(user_list)
-            self.users_to_scrape = deque(user_list)
-            print(f"🎲 Randomized user queue ({len(user_list)} users)")
+        if len(self.users_to_scrape) > 10 and self.users_to_scrape.mode == "fifo":
+            self.users_to_scrape.shuffle()
+            print(f"🎲 Randomized user queue ({len(self.users_to_scrape)} users)")
 
     def scrape_user_batch_unbiased(self, api_session, users_batch, session_id):
         """Scrape users with randomized post sampling for unbiased data"""
         local_posts = []
         local_new_users = []
+        local_stats = []
         
         for username in users_batch:
             if username in self.scraped_users or len(self.collected_post_ids) >= TARGET_POST_COUNT:
                 continue
                 
+            posts_checked = 0
+            hits = 0
             try:
                 print(f"  [Session {session_id}] 🔍 @{username}")
                 
-                # Get user posts
-                user_posts = list(api_session.pull_statuses(username=username, replies=True))
+                # A random sample of the user's posts, already in random order to avoid temporal bias.
+                # Prolific accounts are sampled across their whole history from a fixed number of pages.
+                user_posts = api_session.sample_statuses(username, MAX_POSTS_TO_CHECK_PER_USER, replies=True, max_pages=MAX_PAGES_PER_USER, fields=POST_FIELDS)
                 
-                # CRITICAL: Randomize post order to avoid temporal bias
-                random.shuffle(user_posts)
-                
-                posts_checked = 0
                 for post in user_posts:
                     if posts_checked >= MAX_POSTS_TO_CHECK_PER_USER:
                         break
@@ -188,12 +275,12 @@ class UnbiasedSnowballScraper:
                     post_content = post.get('content', '').lower()
                     if TOPIC.lower() in post_content:
                         local_posts.append(post)
+                        hits += 1
                         
                         # Unbiased user discovery: sample from ALL interactions, not just top
                         try:
-                            # Get likers but randomize the limit to avoid bias toward highly-liked posts
-                            random_limit = random.randint(5, 20)
-                            likers = list(api_session.user_likes(post_id=post_id, limit=random_limit))
+                            # Sample pages from across the like list instead of paging through all of it
+                            likers = list(api_session.user_likes(post_id=post_id, limit=20, sample_pages=LIKER_SAMPLE_PAGES, fields=["acct"]))
                             
                             # Randomly sample from likers instead of taking first N
                             if len(likers) > 5:
@@ -201,21 +288,23 @@ class UnbiasedSnowballScraper:
                             
                             for liker in likers:
                                 liker_username = liker.get('acct')
-                                if (liker_username and 
-                                    liker_username not in self.scraped_users and 
-                                    liker_username not in [u for u in self.users_to_scrape]):
-                                    local_new_users.append(liker_username)
+                                if not liker_username:
+                                    continue
+                                self.graph.add_like(post_id, liker=liker_username, author=username)
+                                if liker_username not in self.scraped_users:
+                                    local_new_users.append((liker_username, username))
                                     
                         except Exception:
                             pass  # Don't let engagement discovery block main scraping
                 
             except Exception as e:
                 print(f"  [Session {session_id}] ⚠️ Error with @{username}: {e}")
-                continue
+            finally:
+                local_stats.append((username, hits, posts_checked))
                 
         # Randomize new users before returning
         random.shuffle(local_new_users)
-        return local_posts, local_new_users
+        return local_posts, local_new_users, local_stats
 
     def process_users_parallel_unbiased(self):
         """Process users in parallel while maintaining randomness and diversity"""
@@ -245,8 +334,11 @@ class UnbiasedSnowballScraper:
                     break
                     
                 user_batches = []
-                sessions_to_use = min(len(self.session_pool), 
+                sessions_available = min(len(self.session_pool), self.concurrency.update()) if self.concurrency else len(self.session_pool)
+                sessions_to_use = min(sessions_available, 
                                     (current_batch_size // (BATCH_SIZE // len(self.session_pool))) + 1)
+                if self.concurrency and sessions_to_use >= sessions_available:
+                    self.concurrency.mark_saturated()
                 
                 for i in range(sessions_to_use):
                     batch = []
@@ -254,7 +346,7 @@ class UnbiasedSnowballScraper:
                     
                     for _ in range(batch_size):
                         if self.users_to_scrape:
-                            batch.append(self.users_to_scrape.popleft())
+                            batch.append(self.users_to_scrape.pop())
                     
                     if batch:
                         user_batches.append((batch, i))
@@ -277,7 +369,7 @@ class UnbiasedSnowballScraper:
                 # Collect results as they complete
                 for future in as_completed(future_to_session, timeout=300):
                     try:
-                        posts, new_users = future.result()
+                        posts, new_users, stats = future.result()
                         session_id = future_to_session[future]
                         
                         # Thread-safe updates
@@ -286,18 +378,20 @@ class UnbiasedSnowballScraper:
                             with open(OUTPUT_FILE, 'a') as f:
                                 for post in posts:
                                     if post['id'] not in self.collected_post_ids:
+                                        if self.accounts:
+                                            post = self.accounts.normalize(post)
                                         f.write(json.dumps(post) + '\n')
                                         self.collected_post_ids.add(post['id'])
+                                        POSTS_COLLECTED.inc(topic=TOPIC)
                             
-                            # Add new users in random order
-                            for user in new_users:
+                            # Queue new users; the scheduler decides their crawl order
+                            for user, referrer in new_users:
                                 if user not in self.scraped_users:
-                                    # Insert at random position to maintain randomness
-                                    if len(self.users_to_scrape) > 0:
-                                        random_pos = random.randint(0, len(self.users_to_scrape))
-                                        self.users_to_scrape.insert(random_pos, user)
-                                    else:
-                                        self.users_to_scrape.append(user)
+                                    self.users_to_scrape.add(user, referrer=referrer)
+                            for user, hits, checked in stats:
+                                self.users_to_scrape.record(user, hits, checked)
+                                USERS_SCRAPED.inc(topic=TOPIC)
+                            QUEUE_DEPTH.set(len(self.users_to_scrape), queue="frontier")
                         
                         users_processed += len([batch for batch, _ in user_batches if future_to_session.get(future) == _][0])
                         
@@ -312,16 +406,115 @@ class UnbiasedSnowballScraper:
                 
                 print(f"📊 Progress: {len(self.collected_post_ids)}/{TARGET_POST_COUNT} posts | "
                       f"{len(self.users_to_scrape)} users queued | "
-                      f"{users_processed} total processed")
+                      f"{users_processed} total processed | "
+                      f"{sessions_to_use} sessions in use")
                 
                 # Periodic state save
                 if users_processed % 50 == 0:
                     self.save_periodic_state()
 
+    def process_users_pipeline(self):
+        """Crawl users through a fetch/match/write pipeline until the target is met or the frontier runs dry"""
+        print(f"\n[Pipeline: {len(self.session_pool)} fetch threads, {CPU_WORKERS or os.cpu_count()} matching processes]")
+        sessions = itertools.cycle(self.session_pool)
+        local = threading.local()
+        started = set()  # Users fetched or being fetched in this run
+        found = {}  # username -> [hits, posts checked] until the user is done
+        users_processed = 0
+
+        def fetch(target):
+            if not hasattr(local, "api"):
+                with self.lock:
+                    local.api = next(sessions)  # Each fetch thread keeps to one session
+            with self.concurrency.slot() if self.concurrency else nullcontext():
+                if target[0] == "likers":
+                    # Sample pages from across the like list instead of paging through all of it
+                    return list(local.api.user_likes(post_id=target[1], limit=20, sample_pages=LIKER_SAMPLE_PAGES, fields=["acct"]))
+                print(f"  🔍 @{target[1]}")
+                return local.api.sample_statuses(target[1], MAX_POSTS_TO_CHECK_PER_USER, replies=True, max_pages=MAX_PAGES_PER_USER, fields=POST_FIELDS)
+
+        def write(target, result):
+            if target[0] == "likers":
+                _, post_id, author = target
+                for liker in result:
+                    self.graph.add_like(post_id, liker=liker, author=author)
+                    if liker not in self.scraped_users and liker not in started:
+                        self.users_to_scrape.add(liker, referrer=author)
+                return []
+            username = target[1]
+            checked, posts = result
+            stats = found.setdefault(username, [0, 0])
+            stats[1] += checked
+            likers_to_fetch = []
+            with open(OUTPUT_FILE, 'a') as f:
+                for post in posts:
+                    post_id = post.get('id')
+                    if not post_id or post_id in self.collected_post_ids:
+                        continue
+                    stats[0] += 1
+                    likers_to_fetch.append(("likers", post_id, username))
+                    if self.accounts:
+                        post = self.accounts.normalize(post)
+                    f.write(json.dumps(post) + '\n')
+                    self.collected_post_ids.add(post_id)
+                    POSTS_COLLECTED.inc(topic=TOPIC)
+            return likers_to_fetch
+
+        def done(target):
+            nonlocal users_processed
+            if target[0] != "user":
+                return
+            username = target[1]
+            hits, checked = found.pop(username, (0, 0))
+            self.scraped_users.add(username)
+            self.users_to_scrape.record(username, hits, checked)
+            USERS_SCRAPED.inc(topic=TOPIC)
+            QUEUE_DEPTH.set(len(self.users_to_scrape), queue="frontier")
+            users_processed += 1
+            if users_processed % 50 == 0:
+                print(f"📊 Progress: {len(self.collected_post_ids)}/{TARGET_POST_COUNT} posts | "
+                      f"{len(self.users_to_scrape)} users queued | "
+                      f"{users_processed} total processed")
+                self.save_periodic_state()
+
+        def next_user():
+            while (self.users_to_scrape and len(started) < round_end
+                   and len(self.collected_post_ids) < TARGET_POST_COUNT):
+                username = self.users_to_scrape.pop()
+                if username not in self.scraped_users and username not in started:
+                    started.add(username)
+                    return ("user", username)
+            return None
+
+        pipeline = Pipeline(fetch, classify_chunk, write, done, io_workers=len(self.session_pool), cpu_workers=CPU_WORKERS)
+        round_end = 0
+        while self.users_to_scrape and len(self.collected_post_ids) < TARGET_POST_COUNT:
+            # All fetch threads are idle between rounds, so the first session is free for seed searches
+            if round_end and RANDOM_SEED_EXPANSION:
+                try:
+                    self.discover_diverse_seed_users(self.session_pool[0])
+                except Exception as e:
+                    print(f"⚠️ Seed expansion failed: {e}")
+            self.randomize_user_queue()
+            round_end = len(started) + PIPELINE_ROUND
+            stats = pipeline.run(next_user)
+            print(f"📊 Round done: {len(self.collected_post_ids)}/{TARGET_POST_COUNT} posts | "
+                  f"{len(self.users_to_scrape)} users queued | "
+                  f"{stats['targets']} users and like lists fetched, {stats['failed']} failed")
+            if not stats['targets']:
+                break
+
     def save_periodic_state(self):
         """Save state periodically"""
         print("💾 Saving state...")
         self.save_state(self.users_to_scrape, USERS_TO_SCRAPE_FILE)
+        self.save_state(self.users_to_scrape.to_state(), FRONTIER_FILE)
+        if self.graph:
+            self.graph.flush()
+        if self.accounts:
+            self.accounts.flush()
+        if METRICS_FILE:
+            REGISTRY.write_textfile(METRICS_FILE)
         self.save_state(self.scraped_users, SCRAPED_USERS_FILE)
         self.save_state(self.collected_post_ids, COLLECTED_POST_IDS_FILE)
 
@@ -342,6 +535,8 @@ class UnbiasedSnowballScraper:
             print(f"🎲 Random seed: {random.seed()}")
             
             self.initialize_state()
+            if METRICS_PORT:
+                REGISTRY.serve(METRICS_PORT)
             self.create_session_pool()
             
             if not self.session_pool:
@@ -359,7 +554,10 @@ class UnbiasedSnowballScraper:
             self.randomize_user_queue()
             
             print(f"🚀 Beginning parallel processing of {len(self.users_to_scrape)} randomized users")
-            self.process_users_parallel_unbiased()
+            if PIPELINE:
+                self.process_users_pipeline()
+            else:
+                self.process_users_parallel_unbiased()
             
         except Exception as e:
             print(f"\n❌ Critical error: {e}")
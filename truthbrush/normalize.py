@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+from typing import Dict, TextIO
+
+from .ingest import read_jsonl
+
+# Keys under which a status embeds another status, whose account is normalized too.
+NESTED_STATUS_KEYS = ("reblog", "quote", "in_reply_to")
+
+
+class AccountNormalizer:
+    """
+    Replace the ``account`` object embedded in every status with its
+    ``account_id``, writing each distinct account once to a separate JSONL
+    stream. An account is written again only when it has changed since it
+    was last written, so the last line for an ID is its current version.
+    Safe to share between threads.
+    """
+
+    def __init__(self, out: TextIO, known: Dict[str, dict] = None):
+        self.out = out
+        self._known = dict(known or {})
+        self._lock = threading.Lock()
+        self.accounts_written = 0
+
+    @classmethod
+    def open(cls, path: str) -> "AccountNormalizer":
+        """Append to the accounts file at ``path``, skipping the accounts it already holds."""
+        known = {}
+        if os.path.exists(path):
+            known = {account["id"]: account for account in read_jsonl(path, workers=1) if isinstance(account, dict) and "id" in account}
+        return cls(open(path, "a", encoding="utf-8"), known)
+
+    def flush(self):
+        with self._lock:
+            self.out.flush()
+
+    def close(self):
+        self.out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _account_id(self, account: dict) -> str:
+        account_id = account.get("id")
+        with self._lock:
+            if self._known.get(account_id) != account:
+                self._known[account_id] = account
+                self.out.write(json.dumps(account) + "\n")
+                self.accounts_written += 1
+        return account_id
+
+    def normalize(self, status):
+        """Return ``status`` with ``account`` (and the accounts of nested statuses) replaced by ``account_id``."""
+        if not isinstance(status, dict):
+            return status
+        account = status.get("account")
+        if not isinstance(account, dict) or "id" not in account:
+            return status
+        normalized = {}
+        for key, value in status.items():
+            if key == "account":
+                normalized["account_id"] = self._account_id(value)
+            elif key in NESTED_STATUS_KEYS and isinstance(value, dict):
+                normalized[key] = self.normalize(value)
+            else:
+                normalized[key] = value
+        return normalized
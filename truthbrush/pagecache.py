@@ -0,0 +1,70 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlencode
+
+DEFAULT_PAGE_CACHE = os.getenv("TRUTHBRUSH_PAGE_CACHE") or os.path.join(os.path.expanduser("~"), ".truthbrush", "pages.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+class PageCache:
+    """
+    On-disk cache of API response pages, keyed by URL, query parameters and
+    field projection. Pages older than ``ttl`` seconds are treated as missing
+    and pruned when the cache is opened. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_PAGE_CACHE, ttl: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        with self._db:
+            self._db.execute("DELETE FROM pages WHERE fetched_at < ?", (time.time() - ttl,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def key(url: str, params: dict = None, fields: dict = None) -> str:
+        key = url + "?" + urlencode(sorted((params or {}).items()))
+        if fields:
+            key += "#" + json.dumps(fields, sort_keys=True)
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        """The cached page for ``key``, or ``None`` if it is missing or stale."""
+        with self._lock:
+            row = self._db.execute("SELECT body FROM pages WHERE key = ? AND fetched_at >= ?", (key, time.time() - self.ttl)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, body: str):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO pages (key, body, fetched_at) VALUES (?, ?, ?)", (key, body, time.time()))
@@ -1,5 +1,6 @@
 import json
 from truthbrush.api import Api
+from truthbrush.autoscale import ConcurrencyController
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -9,6 +10,9 @@ OUTPUT_FILE = "all_topics_parallel_data.jsonl"
 SEARCH_TYPE = "statuses"
 SEARCH_LIMIT_PER_TOPIC = 100 
 MAX_WORKERS = 5 
+# Start with 2 topics at a time and adjust between 1 and MAX_WORKERS while
+# running: more while requests stay fast and error-free, fewer on throttling.
+AUTOSCALE = True
 
 def scrape_topic(api_session, topic):
     """
@@ -54,8 +58,10 @@ def main():
         return
 
     all_posts = []
+    controller = ConcurrencyController(maximum=MAX_WORKERS) if AUTOSCALE else None
+    run = controller.run if controller else (lambda fn, *args: fn(*args))
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_topic = {executor.submit(scrape_topic, api, topic): topic for topic in topics_to_scrape}
+        future_to_topic = {executor.submit(run, scrape_topic, api, topic): topic for topic in topics_to_scrape}
         
         for future in as_completed(future_to_topic):
             topic_posts = future.result()
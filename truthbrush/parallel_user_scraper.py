@@ -1,5 +1,6 @@
 import json
 from truthbrush.api import Api
+from truthbrush.autoscale import ConcurrencyController
 import logging
 from datetime import datetime, timezone
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -9,6 +10,9 @@ USERS_FILE = "users.txt"
 OUTPUT_FILE = "all_users_parallel_data.jsonl"
 # How many users to scrape at the same time
 MAX_WORKERS = 5 
+# Start with 2 users at a time and adjust between 1 and MAX_WORKERS while
+# running: more while requests stay fast and error-free, fewer on throttling.
+AUTOSCALE = True
 CREATED_AFTER_DATE = datetime(2025, 8, 1, tzinfo=timezone.utc)
 CREATED_BEFORE_DATE = datetime(2025, 8, 10, tzinfo=timezone.utc)
 
@@ -59,9 +63,11 @@ def main():
 
     # 3. Scrape all users in parallel using a ThreadPool
     all_posts = []
+    controller = ConcurrencyController(maximum=MAX_WORKERS) if AUTOSCALE else None
+    run = controller.run if controller else (lambda fn, *args: fn(*args))
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         # Create a future for each user 
-        future_to_user = {executor.submit(scrape_user, api, user): user for user in users_to_scrape}
+        future_to_user = {executor.submit(run, scrape_user, api, user): user for user in users_to_scrape}
         
         # As each future completes, process the results
         for future in as_completed(future_to_user):
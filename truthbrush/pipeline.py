@@ -0,0 +1,246 @@
+"""
+Staged crawl pipeline: I/O threads, a CPU process pool, and a writer.
+
+Fetching is network-bound and runs on threads, which share logged-in
+sessions. Decoding, HTML stripping and keyword matching are CPU-bound and
+run in a process pool, where the GIL does not serialize them. Results are
+written on the calling thread, which can feed new targets back in (e.g.
+likers to expand). Bounded queues between the stages hold fetching back
+when the CPU stage or the writer falls behind.
+"""
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, List, Sequence, Tuple, Union
+
+from loguru import logger
+
+from .archive import status_text
+from .metrics import QUEUE_DEPTH
+
+_STOP = object()
+
+
+def match_statuses(keywords: Sequence[str], target, chunk: list) -> Tuple[int, List[dict]]:
+    """
+    CPU stage for topic crawls: decode the statuses in ``chunk`` (JSON text
+    or dicts) and keep those whose plain text contains any of ``keywords``,
+    ignoring case. Returns ``(statuses checked, matches)``. Bind ``keywords``
+    with ``functools.partial`` to use it as a ``Pipeline`` ``process``.
+    """
+    keywords = [k.lower() for k in keywords]
+    matches = []
+    for item in chunk:
+        status = json.loads(item) if isinstance(item, str) else item
+        text = status_text(status).lower()
+        if any(k in text for k in keywords):
+            matches.append(status)
+    return len(chunk), matches
+
+
+class Pipeline:
+    """
+    Run ``fetch(target)`` on ``io_workers`` threads, ``process(target,
+    chunk)`` on ``cpu_workers`` processes (default one per CPU; 0 runs it on
+    a thread instead), and ``write(target, result)`` on the thread calling
+    ``run``.
+
+    ``fetch`` yields items, which are grouped into chunks of ``chunk_size``
+    for ``process``. ``process`` must be a module-level function (or a
+    ``functools.partial`` of one) so it can be sent to the workers. ``write``
+    may return new targets, which are fetched before any further ones from
+    the source. ``done(target)``, if given, is called on the writer thread
+    once all of a target's chunks are written; it is not called for targets
+    whose fetch or any chunk failed. At most ``queue_size`` chunks wait for
+    or sit in the process pool; fetch threads block beyond that.
+
+    If a worker process dies (killed for memory, a crash), the chunks in the
+    pool at the time fail and the pool is replaced, up to ``pool_restarts``
+    times; after that ``run`` raises ``BrokenProcessPool``.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable,
+        process: Callable,
+        write: Callable,
+        done: Callable = None,
+        io_workers: int = 4,
+        cpu_workers: int = None,
+        queue_size: int = 32,
+        chunk_size: int = 100,
+        pool_restarts: int = 3,
+    ):
+        self.fetch = fetch
+        self.process = process
+        self.write = write
+        self.done = done
+        self.io_workers = max(1, io_workers)
+        self.cpu_workers = (os.cpu_count() or 1) if cpu_workers is None else cpu_workers
+        self.queue_size = max(1, queue_size)
+        self.chunk_size = max(1, chunk_size)
+        self.pool_restarts = pool_restarts
+
+    def run(self, targets: Union[Iterable, Callable]) -> dict:
+        """
+        Crawl ``targets``: an iterable, or a callable returning the next target
+        (``None`` when there is nothing to do right now), which is polled
+        whenever a fetch thread is free. Returns counts of ``targets``,
+        ``items``, ``chunks`` written, ``failed`` fetches and chunks, and
+        ``restarts`` of the process pool.
+        """
+        next_target = targets if callable(targets) else _next_of(iter(targets))
+        todo = queue.Queue()
+        fetched = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue()
+        in_cpu = threading.Semaphore(self.queue_size)
+        stop = threading.Event()
+        lock = threading.Lock()
+        outstanding = {}  # target -> its fetch plus its chunks not yet written
+        stats = dict(targets=0, items=0, chunks=0, failed=0, restarts=0)
+        units = [0]
+        failed = set()  # targets with a failed fetch or chunk, which get no done()
+        pool = [ProcessPoolExecutor(max_workers=self.cpu_workers) if self.cpu_workers else None]
+
+        def add(target):
+            with lock:
+                outstanding[target] = outstanding.get(target, 0) + 1
+                units[0] += 1
+                stats["targets"] += 1
+            todo.put(target)
+
+        def fill():
+            while todo.qsize() < self.io_workers:
+                target = next_target()
+                if target is None:
+                    return
+                add(target)
+
+        def put(q, message) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(message, timeout=0.5)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def send(target, chunk) -> bool:
+            with lock:
+                outstanding[target] += 1
+                units[0] += 1
+                stats["items"] += len(chunk)
+            QUEUE_DEPTH.set(fetched.qsize(), queue="pipeline")
+            return put(fetched, (target, chunk))
+
+        def fetch_worker():
+            while True:
+                target = todo.get()
+                if target is _STOP or stop.is_set():
+                    return
+                error = None
+                try:
+                    chunk = []
+                    for item in self.fetch(target):
+                        chunk.append(item)
+                        if len(chunk) >= self.chunk_size:
+                            if not send(target, chunk):
+                                return
+                            chunk = []
+                    if chunk and not send(target, chunk):
+                        return
+                except Exception as e:
+                    error = e
+                results.put(("fetched", target, error))
+
+        def submit(target, chunk):
+            while True:
+                try:
+                    future = pool[0].submit(self.process, target, chunk)
+                    break
+                except BrokenProcessPool:
+                    if stats["restarts"] >= self.pool_restarts or stop.is_set():
+                        raise
+                    # A worker died; the chunks it took down fail through their futures.
+                    stats["restarts"] += 1
+                    logger.error(f"A pipeline worker process died; starting a new pool ({stats['restarts']} of {self.pool_restarts})")
+                    pool[0].shutdown(wait=False)
+                    pool[0] = ProcessPoolExecutor(max_workers=self.cpu_workers)
+            future.add_done_callback(lambda f: results.put(("processed", target, f.exception() or f.result())))
+
+        def dispatch():
+            try:
+                while True:
+                    message = fetched.get()
+                    if message is _STOP:
+                        return
+                    while not in_cpu.acquire(timeout=0.5):
+                        if stop.is_set():
+                            return
+                    target, chunk = message
+                    if pool[0] is not None:
+                        submit(target, chunk)
+                        continue
+                    try:
+                        value = self.process(target, chunk)
+                    except Exception as e:
+                        value = e
+                    results.put(("processed", target, value))
+            except BaseException as e:
+                results.put(("aborted", None, e))  # the writer raises it; nothing else would drain the queues
+
+        threads = [threading.Thread(target=fetch_worker, name=f"truthbrush-fetch-{i}", daemon=True) for i in range(self.io_workers)]
+        threads.append(threading.Thread(target=dispatch, name="truthbrush-dispatch", daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            fill()
+            while units[0]:
+                kind, target, value = results.get()
+                if kind == "aborted":
+                    raise value
+                if kind == "processed":
+                    in_cpu.release()
+                    if isinstance(value, Exception):
+                        stats["failed"] += 1
+                        failed.add(target)
+                        logger.error(f"Processing a chunk of {target} failed: {value!r}")
+                    else:
+                        stats["chunks"] += 1
+                        for new_target in self.write(target, value) or ():
+                            add(new_target)
+                elif value is not None:
+                    stats["failed"] += 1
+                    failed.add(target)
+                    logger.error(f"Fetching {target} failed: {value}")
+                with lock:
+                    outstanding[target] -= 1
+                    finished = not outstanding[target]
+                    if finished:
+                        del outstanding[target]
+                    units[0] -= 1
+                if finished and target in failed:
+                    failed.discard(target)
+                elif finished and self.done:
+                    self.done(target)
+                fill()
+                QUEUE_DEPTH.set(fetched.qsize(), queue="pipeline")
+        finally:
+            stop.set()
+            for _ in range(self.io_workers):
+                todo.put(_STOP)
+            try:
+                fetched.put_nowait(_STOP)
+            except queue.Full:
+                pass  # the dispatcher sees ``stop`` instead
+            if pool[0] is not None:
+                pool[0].shutdown(wait=True, cancel_futures=True)
+            QUEUE_DEPTH.set(0, queue="pipeline")
+        return stats
+
+
+def _next_of(iterator):
+    return lambda: next(iterator, None)
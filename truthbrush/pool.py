@@ -0,0 +1,228 @@
+"""
+Several Truth Social accounts behind one ``Api``.
+
+A single account's rate budget caps throughput however many sessions log
+into it. ``PooledApi`` logs into every configured account and sends each
+request through whichever healthy account has the most budget left, cooling
+an account down when it gets throttled.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import List, Sequence
+
+from loguru import logger
+
+from .api import BASE_URL, Api, LoginErrorException, credentials_from_env
+from .metrics import ACCOUNT_COOLDOWNS, ACCOUNT_REQUESTS, RETRIES, endpoint_label, timed_sleep
+from .ratelimit import RateLimiter
+from .retry import ApiError, RetryPolicy
+
+DEFAULT_CREDENTIALS = os.getenv("TRUTHBRUSH_CREDENTIALS")
+_NUMBERED_USERNAME = re.compile(r"TRUTHSOCIAL_USERNAME_(\d+)$")
+
+
+class Credential:
+    """One account: its login, and optionally its own budget of ``rate`` requests per second (bursts of ``burst``)."""
+
+    def __init__(self, username: str, password: str, rate: float = None, burst: int = 1):
+        self.username = username
+        self.password = password
+        self.rate = rate
+        self.burst = burst
+
+    def __repr__(self):
+        return f"Credential({self.username!r}, rate={self.rate})"
+
+
+def load_credentials(path: str = DEFAULT_CREDENTIALS) -> List[Credential]:
+    """
+    The configured accounts. ``path`` is a JSON file holding a list of
+    ``{"username", "password", "rate", "burst"}`` objects (only the first two
+    are required). Without one, accounts come from the environment (or a
+    ``.env`` file): ``TRUTHSOCIAL_USERNAME``/``TRUTHSOCIAL_PASSWORD`` and any
+    numbered pairs such as ``TRUTHSOCIAL_USERNAME_2``/``TRUTHSOCIAL_PASSWORD_2``,
+    each with an optional ``TRUTHSOCIAL_RATE_2``.
+    """
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        return [Credential(e["username"], e["password"], e.get("rate"), e.get("burst", 1)) for e in entries]
+    username, password = credentials_from_env()  # also loads .env
+    credentials = [Credential(username, password, _env_rate("TRUTHSOCIAL_RATE"))] if username and password else []
+    numbers = sorted(int(m.group(1)) for m in map(_NUMBERED_USERNAME.match, os.environ) if m)
+    for n in numbers:
+        username, password = os.getenv(f"TRUTHSOCIAL_USERNAME_{n}"), os.getenv(f"TRUTHSOCIAL_PASSWORD_{n}")
+        if username and password:
+            credentials.append(Credential(username, password, _env_rate(f"TRUTHSOCIAL_RATE_{n}")))
+    return credentials
+
+
+def _env_rate(name: str):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+class _Account:
+    def __init__(self, api: Api):
+        self.api = api
+        self.name = api.circuit_breaker.name
+        self.in_flight = 0
+        self.requests = 0
+        self.cooling_until = 0.0
+        self.throttled = 0  # consecutive throttled requests
+        self.disabled = False
+
+    def headroom(self) -> float:
+        return self.api.rate_limiter.available() if self.api.rate_limiter else float("inf")
+
+
+class PooledApi(Api):
+    """
+    An ``Api`` backed by several accounts. Every request goes to the usable
+    account with the most budget left (then the fewest requests in flight),
+    so a crawl's throughput grows with the number of accounts. An account is
+    unusable while its circuit breaker is open, while it cools down after a
+    429 (for ``Retry-After``, else ``cooldown`` seconds, doubling while it
+    stays throttled, up to ``max_cooldown``), and for good if it can no
+    longer log in. A throttled request is retried at once on another account.
+
+    ``account_rate`` is the per-account budget for credentials without their
+    own ``rate``; ``rate_limiter`` still caps the pool as a whole. With the
+    browser transport each account serves one request at a time.
+    """
+
+    def __init__(self, credentials: Sequence[Credential], base_url: str = BASE_URL, transport: str = "browser", page_delay=(1.0, 2.0), rate_limiter=None, page_cache=None, retry_policy: RetryPolicy = None, account_rate: float = None, cooldown: float = 60.0, max_cooldown: float = 900.0):
+        self.base_url = base_url.rstrip("/")
+        self.api_base_url = self.base_url + "/api"
+        self.transport = transport
+        self.page_delay = page_delay
+        self.rate_limiter = rate_limiter
+        self.page_cache = page_cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_in_flight = 1 if transport == "browser" else None
+        self._cond = threading.Condition()
+        self._closed = False
+        self.accounts = []
+        for credential in credentials:
+            rate = credential.rate or account_rate
+            try:
+                api = Api(
+                    credential.username,
+                    credential.password,
+                    base_url=base_url,
+                    transport=transport,
+                    page_delay=None,
+                    rate_limiter=RateLimiter(rate, credential.burst) if rate else None,
+                    retry_policy=RetryPolicy(attempts=1),  # the pool retries, on another account if need be
+                )
+            except Exception as e:
+                logger.error(f"Could not log in as {credential.username}: {e}")
+                continue
+            self.accounts.append(_Account(api))
+        if not self.accounts:
+            raise LoginErrorException("No account in the pool could log in.")
+        logger.info(f"Credential pool ready with {len(self.accounts)} accounts")
+
+    def quit(self):
+        if self._closed:
+            return
+        self._closed = True
+        for account in self.accounts:
+            account.api.quit()
+
+    def status(self) -> List[dict]:
+        """Requests, requests in flight, remaining cooldown and health of every account."""
+        now = time.monotonic()
+        with self._cond:
+            return [
+                dict(
+                    account=a.name,
+                    requests=a.requests,
+                    in_flight=a.in_flight,
+                    cooling_for=round(max(0.0, a.cooling_until - now), 3),
+                    circuit=a.api.circuit_breaker.state,
+                    disabled=a.disabled,
+                )
+                for a in self.accounts
+            ]
+
+    def _acquire(self) -> _Account:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                usable = [a for a in self.accounts if not a.disabled]
+                if not usable:
+                    raise LoginErrorException("No account in the pool can log in any more.")
+                ready = [
+                    a
+                    for a in usable
+                    if a.cooling_until <= now
+                    and a.api.circuit_breaker.state != "open"
+                    and (self.max_in_flight is None or a.in_flight < self.max_in_flight)
+                ]
+                if ready:
+                    account = max(ready, key=lambda a: (a.headroom() - a.in_flight, -a.in_flight))
+                    account.in_flight += 1
+                    return account
+                wake = min((a.cooling_until for a in usable if a.cooling_until > now), default=now + 1.0)
+                self._cond.wait(timeout=max(0.01, min(wake - now, 1.0)))
+
+    def _release(self, account: _Account, result):
+        if isinstance(result, tuple):  # from conditional_get
+            result = result[0]
+        with self._cond:
+            account.in_flight -= 1
+            account.requests += 1
+            if isinstance(result, ApiError) and str(result.status) == "429":
+                account.throttled += 1
+                cooldown = min(self.max_cooldown, max(result.get("retry_after") or 0, self.cooldown * 2 ** (account.throttled - 1)))
+                account.cooling_until = time.monotonic() + cooldown
+                ACCOUNT_COOLDOWNS.inc(account=account.name)
+                logger.warning(f"Account {account.name} was throttled; cooling it down for {cooldown:.0f}s")
+            elif not isinstance(result, ApiError):
+                account.throttled = 0
+            self._cond.notify_all()
+        ACCOUNT_REQUESTS.inc(account=account.name)
+
+    def _on_account(self, call):
+        """Run ``call(api)`` on the best account. An account that can no longer log in is dropped from the pool."""
+        account = self._acquire()
+        result = None
+        try:
+            result = call(account.api)
+        except LoginErrorException as e:
+            logger.error(f"Dropping account {account.name} from the pool: {e}")
+            account.disabled = True
+            result = ApiError(str(e), "login")
+        finally:
+            self._release(account, result)
+        return result
+
+    def _get(self, url: str, params: dict = None, fields: dict = None, raw: bool = False, etag: str = None):
+        attempts = self.retry_policy.attempts_for(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            result = self._on_account(lambda api: api._get(url, params, fields=fields, raw=raw, etag=etag))
+            if not isinstance(result, ApiError):
+                return result
+            if result.status == "login":
+                attempt -= 1  # the account is gone, not the request
+                continue
+            result["attempts"] = attempt
+            if not result.retryable or attempt >= attempts:
+                return result
+            RETRIES.inc(endpoint=endpoint_label(url), status=result.status)
+            if str(result.status) != "429":  # a throttled account is cooling down, so another one can retry now
+                timed_sleep(self.retry_policy.delay(attempt - 1, result.get("retry_after")), reason="retry")
+
+    def conditional_get(self, url: str, etag: str = None):
+        result = self._on_account(lambda api: api.conditional_get(url, etag))
+        return result if isinstance(result, tuple) else (result, None)
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Tuple
+
+_DISABLED = nullcontext()
+
+
+class PhaseTimer:
+    """
+    Accumulates wall time per named phase (browser launch, WebDriver round-trip,
+    JSON decoding, ...). Disabled by default, in which case ``phase`` costs a
+    single attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.started_at = None
+        self.totals: Dict[str, List[float]] = {}
+        self.events: List[Tuple[int, str, float, float]] = []
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+        self.started_at = time.perf_counter()
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return _DISABLED
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                total = self.totals.setdefault(name, [0.0, 0])
+                total[0] += end - start
+                total[1] += 1
+                self.events.append((threading.get_ident(), name, start, end))
+
+    def summary(self) -> str:
+        wall = time.perf_counter() - self.started_at if self.started_at else 0.0
+        rows = sorted(self.totals.items(), key=lambda item: item[1][0], reverse=True)
+        lines = [f"{'phase':<20} {'calls':>8} {'total s':>10} {'mean ms':>10} {'% wall':>8}"]
+        for name, (seconds, calls) in rows:
+            share = 100 * seconds / wall if wall else 0.0
+            lines.append(f"{name:<20} {calls:>8} {seconds:>10.3f} {1000 * seconds / calls:>10.2f} {share:>7.1f}%")
+        lines.append(f"{'wall':<20} {'':>8} {wall:>10.3f}")
+        return "\n".join(lines)
+
+    def write_speedscope(self, path: str, name: str = "truthbrush"):
+        """Write the recorded phases as an evented speedscope profile, one lane per thread."""
+        frames: Dict[str, int] = {}
+        by_thread: Dict[int, list] = {}
+        for thread_id, phase_name, start, end in self.events:
+            frames.setdefault(phase_name, len(frames))
+            by_thread.setdefault(thread_id, []).append((start - self.started_at, end - self.started_at, phase_name))
+
+        end_value = time.perf_counter() - self.started_at
+        profiles = []
+        for lane, (thread_id, intervals) in enumerate(sorted(by_thread.items())):
+            events, stack = [], []
+            for start, end, phase_name in sorted(intervals, key=lambda i: (i[0], -i[1])):
+                while stack and stack[-1][0] <= start:
+                    closed_end, frame = stack.pop()
+                    events.append({"type": "C", "frame": frame, "at": closed_end})
+                frame = frames[phase_name]
+                events.append({"type": "O", "frame": frame, "at": start})
+                stack.append((end, frame))
+            while stack:
+                closed_end, frame = stack.pop()
+                events.append({"type": "C", "frame": frame, "at": closed_end})
+            profiles.append({
+                "type": "evented",
+                "name": f"thread {lane}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": end_value,
+                "events": events,
+            })
+
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "shared": {"frames": [{"name": n} for n in frames]},
+            "profiles": profiles,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f)
+
+
+PROFILER = PhaseTimer()
+
+
+def phase(name: str):
+    """Time a block under ``name`` when profiling is enabled (``truthbrush --profile``)."""
+    return PROFILER.phase(name)
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from .metrics import timed_sleep
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread that calls ``acquire``.
+
+    Allows ``rate`` requests per second on average with bursts of up to
+    ``burst``. Callers reserve a token under the lock and sleep outside it,
+    so waiting threads are served in arrival order without holding the lock.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be made."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        timed_sleep(wait, reason="rate_limit")
+
+    def available(self) -> float:
+        """Tokens that could be taken now without waiting; negative while callers are queued."""
+        with self._lock:
+            return min(self.burst, self._tokens + (time.monotonic() - self._updated) * self.rate)
@@ -0,0 +1,154 @@
+"""
+Retrying failed requests, and pausing a session when failures spike.
+
+``Api._get`` retries transient failures (429, 5xx, network errors) with
+jittered exponential backoff according to a ``RetryPolicy``, and reports
+every outcome to a ``CircuitBreaker`` that holds back the session's
+requests for a while once too many of them fail.
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from loguru import logger
+
+from .metrics import CIRCUIT_OPENS, endpoint_label, timed_sleep
+
+RETRYABLE_STATUSES = {"network", "429", "500", "502", "503", "504"}
+
+
+class ApiError(dict):
+    """
+    A failed request: ``{"error": message, "status": status, "url": url,
+    "attempts": n}``, plus ``retry_after`` when the server sent one. It is a
+    dict so code checking ``"error" in result`` keeps working.
+    """
+
+    def __init__(self, error: str, status, url: str = None, attempts: int = 1, retry_after: float = None):
+        super().__init__(error=error, status=status, url=url, attempts=attempts)
+        if retry_after is not None:
+            self["retry_after"] = retry_after
+
+    @classmethod
+    def from_result(cls, result: dict, url: str):
+        return cls(str(result.get("error")), result.get("status", "error"), url, retry_after=result.get("retry_after"))
+
+    @property
+    def status(self):
+        return self["status"]
+
+    @property
+    def retryable(self) -> bool:
+        return str(self["status"]) in RETRYABLE_STATUSES
+
+
+class RetryPolicy:
+    """
+    How often to retry a transient failure and how long to wait in between:
+    a random delay of up to ``base * 2**retry`` seconds, capped at ``cap``
+    ("full jitter"), or the server's ``Retry-After`` if that is longer.
+    ``endpoints`` overrides ``attempts`` per endpoint label, e.g.
+    ``{"/v2/search": 2}``. ``RetryPolicy(attempts=1)`` disables retries.
+    """
+
+    def __init__(self, attempts: int = 4, base: float = 1.0, cap: float = 60.0, endpoints: Dict[str, int] = None, rng: random.Random = None):
+        self.attempts = max(1, attempts)
+        self.base = base
+        self.cap = cap
+        self.endpoints = dict(endpoints or {})
+        self.rng = rng or random.Random()
+
+    def attempts_for(self, url: str) -> int:
+        return max(1, self.endpoints.get(endpoint_label(url), self.attempts))
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry number ``retry`` (from 0)."""
+        delay = self.rng.uniform(0, min(self.cap, self.base * 2 ** retry))
+        return max(delay, min(retry_after or 0, self.cap))
+
+
+class CircuitBreaker:
+    """
+    Pause a session's requests when its failures spike. After ``threshold``
+    transient failures within ``window`` seconds the breaker opens, and
+    ``wait`` holds every request back for ``cooldown`` seconds. Then a single
+    request goes out as a probe while the others keep waiting: if it fails
+    too, the breaker opens again for twice as long (up to ``max_cooldown``);
+    if it succeeds, it closes. A probe that reports nothing within
+    ``probe_timeout`` seconds is given up and another request probes instead.
+    Safe to share between threads; ``wait`` and ``record`` for one request
+    must be called from the same thread.
+    """
+
+    def __init__(self, threshold: int = 5, window: float = 30.0, cooldown: float = 30.0, max_cooldown: float = 600.0, name: str = "session", probe_timeout: float = 120.0):
+        self.threshold = max(1, threshold)
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.name = name
+        self.probe_timeout = probe_timeout
+        self._failures = deque()
+        self._open_until = 0.0
+        self._next_cooldown = cooldown
+        self._probing = False
+        self._probe = None  # (thread ident, monotonic start) of the request probing a half-open breaker
+        self._lock = threading.Condition()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if time.monotonic() < self._open_until:
+                return "open"
+            return "half_open" if self._probing else "closed"
+
+    def wait(self):
+        """Block while the breaker is open, and while another request probes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                remaining = self._open_until - now
+                if remaining <= 0:
+                    if not self._probing:
+                        return
+                    if self._probe is None or now - self._probe[1] >= self.probe_timeout:
+                        self._probe = (threading.get_ident(), now)
+                        return
+                    self._lock.wait(timeout=self._probe[1] + self.probe_timeout - now)
+                    continue
+            timed_sleep(remaining, reason="circuit_breaker")
+
+    def release(self):
+        """Give up this thread's probe without an outcome, e.g. to replay the request; it probes again on its next ``wait``."""
+        with self._lock:
+            if self._probe is not None and self._probe[0] == threading.get_ident():
+                self._probe = None
+                self._lock.notify_all()
+
+    def record(self, ok: bool):
+        """Report the outcome of a request. Only transient failures should count as not ``ok``."""
+        with self._lock:
+            now = time.monotonic()
+            if self._probe is not None and self._probe[0] == threading.get_ident():
+                self._probe = None
+            self._lock.notify_all()  # waiters recheck: the probe is back, or the breaker closed
+            if ok:
+                if self._probing:
+                    logger.info(f"Circuit breaker for {self.name} closed")
+                self._probing = False
+                self._next_cooldown = self.cooldown
+                return
+            self._failures.append(now)
+            while self._failures and self._failures[0] < now - self.window:
+                self._failures.popleft()
+            if now < self._open_until or not (self._probing or len(self._failures) >= self.threshold):
+                return
+            cooldown = self._next_cooldown
+            self._open_until = now + cooldown
+            self._next_cooldown = min(self.max_cooldown, cooldown * 2)
+            self._probing = True
+            self._probe = None
+            self._failures.clear()
+        CIRCUIT_OPENS.inc(name=self.name)
+        logger.warning(f"Circuit breaker for {self.name} opened: pausing requests for {cooldown:.0f}s")
@@ -0,0 +1,48 @@
+"""
+Random sampling helpers for crawls that should not favour recent or prolific content.
+"""
+import random
+from typing import Callable, Iterable, Iterator, Optional
+
+
+def reservoir_sample(items: Iterable, k: int, rng: random.Random = None) -> list:
+    """
+    A uniform random sample of ``k`` items from a stream of unknown length,
+    in random order, holding at most ``k`` items in memory (Algorithm R).
+    """
+    rng = rng or random
+    reservoir = []
+    for seen, item in enumerate(items):
+        if seen < k:
+            reservoir.append(item)
+        else:
+            slot = rng.randint(0, seen)
+            if slot < k:
+                reservoir[slot] = item
+    rng.shuffle(reservoir)
+    return reservoir
+
+
+def sample_id_range(fetch_below: Callable[[int], Optional[list]], low: int, high: int, pages: int, rng: random.Random = None) -> Iterator[dict]:
+    """
+    Yield items spread over the ID range ``(low, high]`` using at most
+    ``pages`` calls to ``fetch_below(cursor)``, which returns the page of
+    items just below ``cursor``, newest first (``None`` stops early).
+
+    The range is walked newest first in equal strata. Each stratum reads one
+    page below a random cursor and keeps the items inside the stratum. A
+    page with nothing inside its stratum shows where the next older item
+    is, so the pages left are spread over the range below that item
+    instead of being spent on empty time.
+    """
+    rng = rng or random
+    while pages > 0 and low < high:
+        floor = high - max(1, (high - low) // pages)
+        cursor = rng.randint(floor + 1, high)
+        items = fetch_below(cursor)
+        pages -= 1
+        if not items:
+            return
+        kept = [item for item in items if int(item["id"]) > floor]
+        yield from kept
+        high = floor if kept else int(items[0]["id"]) + 1
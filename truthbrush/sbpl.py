@@ -1,24 +1,54 @@
 import json
 import os
 import time
+import threading
 import multiprocessing
+from contextlib import nullcontext
+from itertools import islice
 from truthbrush.api import Api, LoginErrorException # Assuming your api.py is in truthbrush/api.py
+from truthbrush.autoscale import ConcurrencyController
+from truthbrush.graph import EngagementGraphWriter
+from truthbrush.metrics import request_totals
+from truthbrush.normalize import AccountNormalizer
+from truthbrush.pipeline import Pipeline, match_statuses
 
 # --- Configuration ---
 TOPIC = "Europe"
 TARGET_POST_COUNT = 10000
 MAX_POSTS_TO_CHECK_PER_USER = 500
 OUTPUT_FILE = f"{TOPIC}_snowball_posts.jsonl"
+# Fields to fetch for each status while checking timelines. None keeps whole
+# posts in OUTPUT_FILE; ["id", "created_at", "content", "account.acct"] is all
+# the keyword filter itself needs and moves several times less data per page.
+POST_FIELDS = None
+# Set to a path (e.g. f"{TOPIC}_accounts.jsonl") to write each distinct account
+# there once and store only its account_id in the posts written to OUTPUT_FILE.
+ACCOUNTS_FILE = None
 
 # --- KEY CHANGE: Number of parallel browser instances ---
-# Start with 2 or 3 and increase based on your PC's performance.
+# Start with 2 or 3 and increase based on your PC's performance. With
+# AUTOSCALE this is a ceiling: as many browsers fetch at once as recent
+# requests and free memory allow, between 1 and NUM_WORKERS (one more while
+# healthy, half as many after throttling, errors or memory pressure). In the
+# pipeline the limit holds the fetch threads; with PIPELINE = False it sizes
+# each batch of browser processes.
 NUM_WORKERS = 3
+AUTOSCALE = True
+# Instead of a fresh browser per user, share logged-in sessions between the
+# NUM_WORKERS fetch threads (a browser is launched only when all the others
+# are busy, so with AUTOSCALE no more run than the controller allows), decode
+# and match the raw timelines in a pool of CPU_WORKERS processes (None: one
+# per CPU) and write results on the main thread as they arrive. False runs
+# the batches of browser processes above.
+PIPELINE = True
+CPU_WORKERS = None
 
 # --- State Files ---
 STATE_DIR = "scraper_state"
 USERS_TO_SCRAPE_FILE = os.path.join(STATE_DIR, f"{TOPIC}_users_to_scrape.json")
 SCRAPED_USERS_FILE = os.path.join(STATE_DIR, f"{TOPIC}_scraped_users.json")
 COLLECTED_POST_IDS_FILE = os.path.join(STATE_DIR, f"{TOPIC}_collected_post_ids.json")
+GRAPH_DIR = os.path.join(STATE_DIR, f"{TOPIC}_graph")  # user -> post -> liker edges
 
 # --- Helper Functions (unchanged) ---
 def initialize_state():
@@ -40,16 +70,18 @@ def scrape_worker(username):
     A self-contained worker that scrapes one user and returns the results.
     """
     print(f"[Worker {os.getpid()}] Starting to scrape @{username}")
+    requests_before = request_totals()
     api = None
     found_posts = []
     found_users = []
+    like_edges = []
     
     try:
         # Each worker creates its own browser session.
         api = Api() 
         
         # 1. Scrape user for posts with the topic
-        user_posts_generator = api.pull_statuses(username=username, replies=True)
+        user_posts_generator = api.pull_statuses(username=username, replies=True, fields=POST_FIELDS)
         posts_checked = 0
         for post in user_posts_generator:
             if posts_checked >= MAX_POSTS_TO_CHECK_PER_USER:
@@ -62,11 +94,12 @@ def scrape_worker(username):
 
                 # 2. Find new users from the likes of relevant posts
                 try:
-                    likers = api.user_likes(post_id=post.get('id'), limit=10)
+                    likers = api.user_likes(post_id=post.get('id'), limit=10, max_items=10, fields=["acct"])
                     for liker in likers:
                         liker_username = liker.get('acct')
                         if liker_username:
                             found_users.append(liker_username)
+                            like_edges.append((post.get('id'), liker_username))
                 except Exception:
                     pass # Ignore errors on finding likers
                     
@@ -82,9 +115,102 @@ def scrape_worker(username):
     return {
         "scraped_user": username,
         "found_posts": found_posts,
-        "newly_found_users": found_users
+        "newly_found_users": found_users,
+        "like_edges": like_edges,
+        "requests": {key: value - requests_before[key] for key, value in request_totals().items()},
     }
 
+def classify_chunk(target, chunk):
+    """CPU stage of the pipeline: the posts about TOPIC in a chunk of raw timeline, or the accounts in a chunk of likers."""
+    if target[0] == "likers":
+        return [liker['acct'] for liker in chunk if liker.get('acct')]
+    return match_statuses([TOPIC], target, chunk)
+
+def run_pipeline_scraper(users_to_scrape, scraped_users, collected_post_ids, graph, accounts):
+    """Crawl through a fetch/match/write pipeline until the target is met or the queue runs dry."""
+    concurrency = ConcurrencyController(name="sbpl", maximum=NUM_WORKERS) if AUTOSCALE else None
+    sessions = []
+    idle = []  # Sessions not fetching right now; only as many are launched as run at once
+    sessions_lock = threading.Lock()
+    queued = set(users_to_scrape)
+    started = set()  # Users fetched or being fetched in this run
+
+    def fetch(target):
+        with concurrency.slot() if concurrency else nullcontext():
+            with sessions_lock:
+                api = idle.pop() if idle else None
+            if api is None:
+                api = Api()  # A browser is launched only when every existing one is busy
+                with sessions_lock:
+                    sessions.append(api)
+            try:
+                if target[0] == "likers":
+                    return list(api.user_likes(post_id=target[1], limit=10, max_items=10, fields=["acct"]))
+                print(f"[{threading.current_thread().name}] Scraping @{target[1]}")
+                return list(islice(api.pull_statuses(username=target[1], replies=True, fields=POST_FIELDS, raw=True), MAX_POSTS_TO_CHECK_PER_USER))
+            finally:
+                with sessions_lock:
+                    idle.append(api)
+
+    def write(target, result):
+        if target[0] == "likers":
+            _, post_id, author = target
+            for liker_username in result:
+                graph.add_like(post_id, liker=liker_username, author=author)
+                if liker_username not in scraped_users and liker_username not in queued and liker_username not in started:
+                    queued.add(liker_username)
+                    users_to_scrape.append(liker_username)
+            return []
+        likers_to_fetch = []
+        for post in result[1]:
+            post_id = post.get('id')
+            if post_id and post_id not in collected_post_ids:
+                likers_to_fetch.append(("likers", post_id, target[1]))
+                if accounts:
+                    post = accounts.normalize(post)
+                with open(OUTPUT_FILE, 'a') as f:
+                    f.write(json.dumps(post) + '\n')
+                collected_post_ids.add(post_id)
+        return likers_to_fetch
+
+    def done(target):
+        if target[0] != "user":
+            return
+        scraped_users.add(target[1])
+        if len(scraped_users) % 20 == 0:
+            print("💾 Saving progress...")
+            save_state(users_to_scrape, USERS_TO_SCRAPE_FILE)
+            save_state(scraped_users, SCRAPED_USERS_FILE)
+            save_state(collected_post_ids, COLLECTED_POST_IDS_FILE)
+            graph.flush()
+            if accounts:
+                accounts.flush()
+            print(f"--- Progress: {len(collected_post_ids)}/{TARGET_POST_COUNT} posts --- ({len(users_to_scrape)} users in queue) ---")
+
+    def next_user():
+        while users_to_scrape and len(collected_post_ids) < TARGET_POST_COUNT:
+            username = users_to_scrape.pop(0)
+            queued.discard(username)
+            if username not in scraped_users and username not in started:
+                started.add(username)
+                return ("user", username)
+        return None
+
+    print(f"\n[Phase 2: Starting pipeline with {NUM_WORKERS} fetch threads and {CPU_WORKERS or os.cpu_count()} matching processes]")
+    try:
+        stats = Pipeline(fetch, classify_chunk, write, done, io_workers=NUM_WORKERS, cpu_workers=CPU_WORKERS).run(next_user)
+        print(f"Fetched {stats['targets']} timelines and like lists ({stats['failed']} failed).")
+    finally:
+        for api in sessions:
+            api.quit()
+    save_state(users_to_scrape, USERS_TO_SCRAPE_FILE)
+    save_state(scraped_users, SCRAPED_USERS_FILE)
+    save_state(collected_post_ids, COLLECTED_POST_IDS_FILE)
+    graph.flush()
+    if accounts:
+        accounts.flush()
+    print("\n✨ Target post count reached or no users left. Done.")
+
 # --- KEY CHANGE: The Main Orchestrator ---
 def run_parallel_scraper():
     initialize_state()
@@ -92,6 +218,8 @@ def run_parallel_scraper():
     users_to_scrape = load_state_list(USERS_TO_SCRAPE_FILE)
     scraped_users = load_state_set(SCRAPED_USERS_FILE)
     collected_post_ids = load_state_set(COLLECTED_POST_IDS_FILE)
+    graph = EngagementGraphWriter(GRAPH_DIR)
+    accounts = AccountNormalizer.open(ACCOUNTS_FILE) if ACCOUNTS_FILE else None
     
     # Initial seeding if the scraper is brand new
     if not users_to_scrape and not scraped_users:
@@ -99,7 +227,7 @@ def run_parallel_scraper():
         temp_api = None
         try:
             temp_api = Api()
-            seed_posts = temp_api.search(searchtype="statuses", query=TOPIC, limit=100)
+            seed_posts = temp_api.search(searchtype="statuses", query=TOPIC, limit=100, fields=["account.acct"])
             for post in seed_posts:
                 username = post.get('account', {}).get('acct')
                 if username and username not in scraped_users and username not in users_to_scrape:
@@ -116,12 +244,18 @@ def run_parallel_scraper():
         print("❌ No users to scrape. The initial seed search may have failed. Exiting.")
         return
 
-    print(f"\n[Phase 2: Starting main scraping loop with {NUM_WORKERS} parallel workers]")
+    if PIPELINE:
+        run_pipeline_scraper(users_to_scrape, scraped_users, collected_post_ids, graph, accounts)
+        return
+
+    concurrency = ConcurrencyController(name="sbpl", maximum=NUM_WORKERS, watch_metrics=False) if AUTOSCALE else None
+    print(f"\n[Phase 2: Starting main scraping loop with up to {NUM_WORKERS} parallel workers]")
     
     # The main loop continues as long as we have users and haven't met the target
     while users_to_scrape and len(collected_post_ids) < TARGET_POST_COUNT:
         # Take a batch of users to process in parallel
-        batch_size = NUM_WORKERS * 2 # Give the pool a bit of work to chew on
+        workers = concurrency.limit if concurrency else NUM_WORKERS
+        batch_size = workers * 2 # Give the pool a bit of work to chew on
         users_batch = []
         
         # De-duplicate the users_to_scrape list while creating the batch
@@ -141,11 +275,17 @@ def run_parallel_scraper():
             print("No new users left to scrape in the queue. Exiting.")
             break
 
-        print(f"\n--- Processing a batch of {len(users_batch)} users ---")
+        print(f"\n--- Processing a batch of {len(users_batch)} users on {workers} workers ---")
         
         # Use a multiprocessing Pool to run scrape_worker on the batch
-        with multiprocessing.Pool(processes=NUM_WORKERS) as pool:
+        with multiprocessing.Pool(processes=workers) as pool:
             results = pool.map(scrape_worker, users_batch)
+        if concurrency:
+            for result in results:
+                concurrency.observe(**result['requests'])
+            if len(users_batch) >= workers:
+                concurrency.mark_saturated()
+            concurrency.update(force=True)  # each batch is one round of the controller
 
         # Process the results from the batch
         for result in results:
@@ -155,10 +295,15 @@ def run_parallel_scraper():
             for post in result['found_posts']:
                 post_id = post.get('id')
                 if post_id and post_id not in collected_post_ids:
+                    if accounts:
+                        post = accounts.normalize(post)
                     with open(OUTPUT_FILE, 'a') as f:
                         f.write(json.dumps(post) + '\n')
                     collected_post_ids.add(post_id)
             
+            for post_id, liker_username in result['like_edges']:
+                graph.add_like(post_id, liker=liker_username, author=result['scraped_user'])
+
             # Add newly found users to the main queue
             for new_user in result['newly_found_users']:
                 if new_user not in scraped_users and new_user not in users_to_scrape:
@@ -169,6 +314,9 @@ def run_parallel_scraper():
         save_state(users_to_scrape, USERS_TO_SCRAPE_FILE)
         save_state(scraped_users, SCRAPED_USERS_FILE)
         save_state(collected_post_ids, COLLECTED_POST_IDS_FILE)
+        graph.flush()
+        if accounts:
+            accounts.flush()
         print(f"--- Progress: {len(collected_post_ids)}/{TARGET_POST_COUNT} posts --- ({len(users_to_scrape)} users in queue) ---")
 
     print("\n✨ Target post count reached or no users left. Done.")
@@ -0,0 +1,229 @@
+"""
+Time series of the list endpoints (trends, tags, ads, suggestions, ...).
+
+Each endpoint returns a full ranked list every time it is polled, and most
+polls change little or nothing. ``SnapshotCollector`` polls with conditional
+requests, diffs each list against the previous one and ``SnapshotStore``
+keeps only what entered, left or moved, from which any past snapshot can be
+rebuilt.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from loguru import logger
+
+from .api import NOT_MODIFIED
+from .metrics import timed_sleep
+
+DEFAULT_SNAPSHOTS = os.getenv("TRUTHBRUSH_SNAPSHOTS") or os.path.join(os.path.expanduser("~"), ".truthbrush", "snapshots.db")
+
+# Api method -> API path for every snapshot endpoint. ``tags`` is the same
+# request as ``trending``, so it is not polled separately.
+ENDPOINTS = {
+    "trending": "/v1/trends",
+    "trending_truths": "/v1/truth/trending/truths",
+    "group_tags": "/v1/groups/tags",
+    "trending_groups": "/v1/truth/trends/groups",
+    "suggested_groups": "/v1/truth/suggestions/groups",
+    "suggestions": "/v2/suggestions",
+    "ads": "/v3/truth/ads",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshot_state (
+    endpoint TEXT PRIMARY KEY,
+    etag TEXT,
+    polled_at REAL NOT NULL,
+    changed_at REAL NOT NULL,
+    items TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_events (
+    endpoint TEXT NOT NULL,
+    at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    rank INTEGER,
+    old_rank INTEGER,
+    item TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshot_events_endpoint ON snapshot_events (endpoint, at);
+"""
+
+
+def item_key(item) -> str:
+    """A stable identity for a list item: its ``id``, ``name`` or account ID, else a hash of its JSON."""
+    if isinstance(item, dict):
+        account = item.get("account") if isinstance(item.get("account"), dict) else {}
+        for value in (item.get("id"), item.get("name"), account.get("id")):
+            if value not in (None, ""):
+                return str(value)
+    return hashlib.sha1(json.dumps(item, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def diff(previous: Sequence[Tuple[str, dict]], current: Sequence[Tuple[str, dict]]) -> List[dict]:
+    """Events turning the ranked ``(key, item)`` list ``previous`` into ``current``: ``entered``, ``left`` and ``moved``."""
+    old_ranks = {key: rank for rank, (key, _) in enumerate(previous)}
+    new_keys = {key for key, _ in current}
+    events = [dict(kind="left", key=key, old_rank=rank) for key, rank in old_ranks.items() if key not in new_keys]
+    for rank, (key, item) in enumerate(current):
+        if key not in old_ranks:
+            events.append(dict(kind="entered", key=key, rank=rank, item=item))
+        elif old_ranks[key] != rank:
+            events.append(dict(kind="moved", key=key, rank=rank, old_rank=old_ranks[key]))
+    return events
+
+
+def _ranked(listing) -> List[Tuple[str, dict]]:
+    items = listing if isinstance(listing, list) else [listing]
+    ranked, seen = [], set()
+    for item in items:
+        key = item_key(item)
+        if key not in seen:  # a duplicate would make the ranks ambiguous
+            seen.add(key)
+            ranked.append((key, item))
+    return ranked
+
+
+class SnapshotStore:
+    """
+    SQLite store of snapshot changes. ``snapshot_state`` holds the latest
+    list and ETag per endpoint to diff against; ``snapshot_events`` holds
+    every change. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_SNAPSHOTS):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def state(self, endpoint: str) -> Tuple[str, List[Tuple[str, dict]]]:
+        """``(etag, ranked items)`` of the last snapshot of ``endpoint``."""
+        with self._lock:
+            row = self._db.execute("SELECT etag, items FROM snapshot_state WHERE endpoint = ?", (endpoint,)).fetchone()
+        if row is None:
+            return None, []
+        return row[0], [tuple(pair) for pair in json.loads(row[1])]
+
+    def touch(self, endpoint: str, at: float):
+        """Record a poll that found nothing new."""
+        with self._lock, self._db:
+            self._db.execute("UPDATE snapshot_state SET polled_at = ? WHERE endpoint = ?", (at, endpoint))
+
+    def record(self, endpoint: str, at: float, etag: str, items: List[Tuple[str, dict]], events: List[dict]):
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO snapshot_events (endpoint, at, kind, key, rank, old_rank, item) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (endpoint, at, e["kind"], e["key"], e.get("rank"), e.get("old_rank"), json.dumps(e["item"]) if "item" in e else None)
+                    for e in events
+                ],
+            )
+            self._db.execute(
+                "INSERT INTO snapshot_state (endpoint, etag, polled_at, changed_at, items) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(endpoint) DO UPDATE SET etag = excluded.etag, polled_at = excluded.polled_at, "
+                "changed_at = CASE WHEN ? THEN excluded.changed_at ELSE changed_at END, items = excluded.items",
+                (endpoint, etag, at, at, json.dumps(items), bool(events)),
+            )
+
+    def events(self, endpoint: str, until: float = None) -> Iterator[dict]:
+        """The changes recorded for ``endpoint`` in order, up to ``until`` (a Unix time)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT at, kind, key, rank, old_rank, item FROM snapshot_events WHERE endpoint = ? AND at <= ? ORDER BY rowid",
+                (endpoint, until if until is not None else float("inf")),
+            ).fetchall()
+        for at, kind, key, rank, old_rank, item in rows:
+            event = dict(at=at, kind=kind, key=key)
+            if rank is not None:
+                event["rank"] = rank
+            if old_rank is not None:
+                event["old_rank"] = old_rank
+            if item is not None:
+                event["item"] = json.loads(item)
+            yield event
+
+    def replay(self, endpoint: str, at: float = None) -> List[dict]:
+        """
+        Rebuild the list ``endpoint`` returned at ``at`` (default: the latest
+        poll). Items are as they were when they entered the list.
+        """
+        ranked = {}
+        for event in self.events(endpoint, until=at):
+            if event["kind"] == "entered":
+                ranked[event["key"]] = (event["rank"], event["item"])
+            elif event["kind"] == "left":
+                ranked.pop(event["key"], None)
+            elif event["key"] in ranked:
+                ranked[event["key"]] = (event["rank"], ranked[event["key"]][1])
+        return [item for _, item in sorted(ranked.values(), key=lambda pair: pair[0])]
+
+
+class SnapshotCollector:
+    """
+    Poll snapshot endpoints and store what changed. Requests are conditional
+    (``If-None-Match``) when the Api supports it, so an unchanged list
+    costs a 304 and no storage.
+    """
+
+    def __init__(self, api, store: SnapshotStore, endpoints: Sequence[str] = None):
+        unknown = set(endpoints or ()) - set(ENDPOINTS)
+        if unknown:
+            raise ValueError(f"Unknown snapshot endpoints: {', '.join(sorted(unknown))}. Expected some of: {', '.join(ENDPOINTS)}")
+        self.api = api
+        self.store = store
+        self.endpoints = list(endpoints or ENDPOINTS)
+
+    def _fetch(self, endpoint: str, etag: str):
+        conditional_get = getattr(self.api, "conditional_get", None)
+        if conditional_get is None:  # e.g. a DaemonClient
+            return getattr(self.api, endpoint)(), None
+        return conditional_get(ENDPOINTS[endpoint], etag)
+
+    def poll(self, endpoint: str):
+        """Poll one endpoint. Returns the number of changes stored, or ``None`` if it could not be read."""
+        etag, previous = self.store.state(endpoint)
+        result, new_etag = self._fetch(endpoint, etag)
+        now = time.time()
+        if result is NOT_MODIFIED:
+            self.store.touch(endpoint, now)
+            return 0
+        if result is None or (isinstance(result, dict) and "error" in result):
+            logger.warning(f"Could not poll {endpoint}: {result}")
+            return None
+        current = _ranked(result)
+        events = diff(previous, current)
+        self.store.record(endpoint, now, new_etag, current, events)
+        return len(events)
+
+    def poll_all(self) -> Dict[str, int]:
+        return {endpoint: self.poll(endpoint) for endpoint in self.endpoints}
+
+    def run(self, interval: float, rounds: int = None):
+        """Poll every endpoint every ``interval`` seconds, ``rounds`` times or until interrupted."""
+        done = 0
+        while rounds is None or done < rounds:
+            started = time.monotonic()
+            changes = self.poll_all()
+            logger.info("Snapshot: " + ", ".join(f"{name} {'failed' if n is None else n}" for name, n in changes.items()))
+            done += 1
+            if rounds is None or done < rounds:
+                timed_sleep(interval - (time.monotonic() - started), reason="snapshot")
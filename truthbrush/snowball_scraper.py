@@ -1,19 +1,43 @@
 import json
 import os
-import time
 from truthbrush.api import Api, LoginErrorException
+from truthbrush.frontier import FrontierScheduler
+from truthbrush.graph import EngagementGraphWriter
+from truthbrush.metrics import QUEUE_DEPTH, REGISTRY, timed_sleep
+from truthbrush.normalize import AccountNormalizer
 
 #Configure the topics to proceed
 TOPIC = "Russia"
 TARGET_POST_COUNT = 10000
 MAX_POSTS_TO_CHECK_PER_USER = 500 
+USER_DELAY = 0.5  # seconds to wait between users
 OUTPUT_FILE = f"{TOPIC}_snowball_posts.jsonl"
+# Fields to fetch for each status while checking timelines. None keeps whole
+# posts in OUTPUT_FILE; ["id", "created_at", "content", "account.acct"] is all
+# the keyword filter itself needs and moves several times less data per page.
+POST_FIELDS = None
+# Set to a path (e.g. f"{TOPIC}_accounts.jsonl") to write each distinct account
+# there once and store only its account_id in the posts written to OUTPUT_FILE.
+ACCOUNTS_FILE = None
+# Crawl order of the frontier: "fifo" (discovery order), "yield" (most
+# promising users first) or "unbiased" (uniformly random, for sampling runs).
+SCHEDULER_MODE = "fifo"
 
 # State Files
 STATE_DIR = "scraper_state"
 USERS_TO_SCRAPE_FILE = os.path.join(STATE_DIR, f"{TOPIC}_users_to_scrape.json")
 SCRAPED_USERS_FILE = os.path.join(STATE_DIR, f"{TOPIC}_scraped_users.json")
 COLLECTED_POST_IDS_FILE = os.path.join(STATE_DIR, f"{TOPIC}_collected_post_ids.json")
+FRONTIER_FILE = os.path.join(STATE_DIR, f"{TOPIC}_frontier.json")
+# user -> post -> liker edges, loadable with truthbrush.graph.EngagementGraph
+GRAPH_DIR = os.path.join(STATE_DIR, f"{TOPIC}_graph")
+
+# Metrics: serve them on http://127.0.0.1:<port>/metrics and/or write a Prometheus text file
+METRICS_PORT = None
+METRICS_FILE = os.path.join(STATE_DIR, f"{TOPIC}_metrics.prom")
+
+POSTS_COLLECTED = REGISTRY.counter("truthbrush_posts_collected_total", "Relevant posts written by the scraper.", ["topic"])
+USERS_SCRAPED = REGISTRY.counter("truthbrush_users_scraped_total", "Users whose timelines were checked.", ["topic"])
 
 
 def initialize_state():
@@ -27,30 +51,45 @@ def load_state_set(filepath):
 def load_state_list(filepath):
     if not os.path.exists(filepath): return []
     with open(filepath, 'r') as f: return list(json.load(f))
-
-def run_robust_snowball_scraper():
+def load_frontier():
+    if os.path.exists(FRONTIER_FILE):
+        with open(FRONTIER_FILE, 'r') as f:
+            return FrontierScheduler.from_state(json.load(f), mode=SCHEDULER_MODE)
+    frontier = FrontierScheduler(mode=SCHEDULER_MODE)
+    frontier.extend(load_state_list(USERS_TO_SCRAPE_FILE))
+    return frontier
+def save_frontier(frontier):
+    save_state(frontier, USERS_TO_SCRAPE_FILE)
+    with open(FRONTIER_FILE, 'w') as f: json.dump(frontier.to_state(), f)
+
+def run_robust_snowball_scraper(tb_api=None):
+    """Run the crawl. Pass an existing ``Api`` to reuse its session; it is closed when the crawl ends."""
     initialize_state()
     
-    users_to_scrape = load_state_list(USERS_TO_SCRAPE_FILE)
+    users_to_scrape = load_frontier()
     scraped_users = load_state_set(SCRAPED_USERS_FILE)
     collected_post_ids = load_state_set(COLLECTED_POST_IDS_FILE)
+    graph = EngagementGraphWriter(GRAPH_DIR)
+    accounts = AccountNormalizer.open(ACCOUNTS_FILE) if ACCOUNTS_FILE else None
+    if METRICS_PORT:
+        REGISTRY.serve(METRICS_PORT)
     
-    tb_api = None
     try:
-        print("\n[Phase 1: Establishing a persistent browser session...]")
-        tb_api = Api()
+        if tb_api is None:
+            print("\n[Phase 1: Establishing a persistent browser session...]")
+            tb_api = Api()
 
         if not users_to_scrape and not scraped_users:
             print("\n[Phase 2: No existing state found. Discovering seed users.]")
             try:
-                seed_posts = tb_api.search(searchtype="statuses", query=TOPIC, limit=1000)
+                seed_posts = tb_api.search(searchtype="statuses", query=TOPIC, limit=1000, fields=["account.acct"])
                 for post in seed_posts:
                     if 'account' in post and 'acct' in post['account']:
                         username = post['account']['acct']
                         if username not in scraped_users and username not in users_to_scrape:
-                            users_to_scrape.append(username)
+                            users_to_scrape.add(username)
                 print(f"Discovered {len(users_to_scrape)} initial seed users.")
-                save_state(users_to_scrape, USERS_TO_SCRAPE_FILE)
+                save_frontier(users_to_scrape)
             except Exception as e:
                 print(f"Warning: Could not fetch seed users. Error: {e}")
 
@@ -60,14 +99,16 @@ def run_robust_snowball_scraper():
 
         print("\n[Phase 3: Starting the main scraping and discovery loop]")
         while users_to_scrape and len(collected_post_ids) < TARGET_POST_COUNT:
-            current_user = users_to_scrape.pop(0)
+            current_user = users_to_scrape.pop()
+            QUEUE_DEPTH.set(len(users_to_scrape), queue="frontier")
             if current_user in scraped_users: continue
 
             print(f"\n--- Scraping user: @{current_user} ({len(users_to_scrape)} left) | Progress: {len(collected_post_ids)}/{TARGET_POST_COUNT} posts ---")
 
+            posts_checked = 0
+            hits = 0
             try:
-                user_posts_generator = tb_api.pull_statuses(username=current_user, replies=True)
-                posts_checked = 0
+                user_posts_generator = tb_api.pull_statuses(username=current_user, replies=True, fields=POST_FIELDS)
                 for post in user_posts_generator:
                     if posts_checked >= MAX_POSTS_TO_CHECK_PER_USER:
                         print(f"    -> Reached check limit for @{current_user}. Moving on.")
@@ -80,28 +121,38 @@ def run_robust_snowball_scraper():
                     post_content = post.get('content', '').lower()
                     if TOPIC.lower() in post_content:
                         print(f"    -> Found relevant post! ID: {post_id}")
+                        if accounts: post = accounts.normalize(post)
                         with open(OUTPUT_FILE, 'a') as f: f.write(json.dumps(post) + '\n')
                         collected_post_ids.add(post_id)
+                        POSTS_COLLECTED.inc(topic=TOPIC)
+                        hits += 1
 
                         try:
-                            likers = tb_api.user_likes(post_id=post_id, limit=10)
+                            likers = tb_api.user_likes(post_id=post_id, limit=10, max_items=10, fields=["acct"])
                             for liker in likers:
                                 username = liker.get('acct')
-                                if username and username not in scraped_users and username not in users_to_scrape:
-                                    users_to_scrape.append(username)
+                                if not username: continue
+                                graph.add_like(post_id, liker=username, author=current_user)
+                                if username not in scraped_users:
+                                    users_to_scrape.add(username, referrer=current_user)
                         except Exception: pass
             
             except Exception as e:
                 print(f"Warning: An error occurred while scraping @{current_user}. Skipping. Error: {e}")
 
             scraped_users.add(current_user)
+            USERS_SCRAPED.inc(topic=TOPIC)
+            users_to_scrape.record(current_user, hits, posts_checked)
             if len(scraped_users) % 5 == 0:
                 print("Saving progress...")
-                save_state(users_to_scrape, USERS_TO_SCRAPE_FILE)
+                save_frontier(users_to_scrape)
                 save_state(scraped_users, SCRAPED_USERS_FILE)
                 save_state(collected_post_ids, COLLECTED_POST_IDS_FILE)
+                graph.flush()
+                if accounts: accounts.flush()
+                if METRICS_FILE: REGISTRY.write_textfile(METRICS_FILE)
             
-            time.sleep(0.5) 
+            timed_sleep(USER_DELAY, reason="scraper")
 
     except (LoginErrorException, Exception) as e:
         print(f"\A critical error occurred: {e}")
@@ -111,9 +162,12 @@ def run_robust_snowball_scraper():
             tb_api.quit()
         
         print("Performing final state save...")
-        save_state(users_to_scrape, USERS_TO_SCRAPE_FILE)
+        save_frontier(users_to_scrape)
         save_state(scraped_users, SCRAPED_USERS_FILE)
         save_state(collected_post_ids, COLLECTED_POST_IDS_FILE)
+        graph.close()
+        if accounts: accounts.close()
+        if METRICS_FILE: REGISTRY.write_textfile(METRICS_FILE)
         print("Done.")
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+
+class Watermarks:
+    """
+    The newest item ID seen per key (a group, a timeline, ...), so the next
+    run only pulls what is newer. With a ``path``, the marks are loaded from
+    and saved to a JSON file each time one advances, so an interrupted crawl
+    keeps the progress of every key that finished. Marks only move forward.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._marks: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._marks = {str(k): str(v) for k, v in json.load(f).items()}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._marks)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._marks.get(key)
+
+    def advance(self, key: str, item_id) -> bool:
+        """Raise the mark for ``key`` to ``item_id`` if it is newer. Returns whether it moved."""
+        item_id = str(item_id)
+        with self._lock:
+            current = self._marks.get(key)
+            if current is not None and int(current) >= int(item_id):
+                return False
+            self._marks[key] = item_id
+            if self.path:
+                self._save()
+            return True
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._marks, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)